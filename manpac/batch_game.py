@@ -0,0 +1,498 @@
+from manpac.utils import export
+from manpac.game import MAX_TICK_UNIT
+from manpac.game_status import GameStatus
+from manpac.entity_type import EntityType
+from manpac.entity import Entity
+from manpac.direction import Direction
+from manpac.cell import Cell
+from manpac.modifiers.swap_modifier import SwapModifier
+from manpac.modifiers.intangible_modifier import IntangibleModifier
+
+import numpy as np
+
+
+DIRECTIONS = list(Direction)
+_VECTORS_ = np.array([d.vector for d in DIRECTIONS])
+_ORTHOGONALS_ = np.array([d.rot90(1).vector for d in DIRECTIONS])
+_NO_ORDER_ = np.iinfo(np.int64).max
+
+
+class _BatchBoosts():
+    """
+    Boosts of every game of a batch stored in fixed capacity arrays.
+    A slot is free when its order is negative, the order keeps track of the insertion order.
+
+    Parameters
+    -----------
+    - *n_games*: (**int**)
+        the number of games
+    - *capacity*: (**int**)
+        the initial number of slots per game
+    """
+
+    def __init__(self, n_games, capacity=16):
+        self.loc = np.zeros((n_games, capacity, 2), dtype=np.int64)
+        self.remaining = np.zeros((n_games, capacity))
+        self.order = np.full((n_games, capacity), -1, dtype=np.int64)
+        self._counter = 0
+
+    def clear(self):
+        self.order[:, :] = -1
+
+    def _grow_(self):
+        self.loc = np.concatenate([self.loc, np.zeros_like(self.loc)], axis=1)
+        self.remaining = np.concatenate([self.remaining, np.zeros_like(self.remaining)], axis=1)
+        self.order = np.concatenate([self.order, np.full_like(self.order, -1)], axis=1)
+
+    def insert(self, games, loc, remaining):
+        """
+        Append one boost to each of the specified games, games must not contain duplicates.
+        """
+        free = self.order[games] < 0
+        while not free.any(axis=1).all():
+            self._grow_()
+            free = self.order[games] < 0
+        slots = np.argmax(free, axis=1)
+        self.loc[games, slots] = loc
+        self.remaining[games, slots] = remaining
+        self.order[games, slots] = self._counter + np.arange(len(games))
+        self._counter += len(games)
+
+    def columns(self):
+        """
+        Return the number of leading slots that can hold a boost.
+        """
+        used = np.flatnonzero(np.any(self.order >= 0, axis=0))
+        return used[-1] + 1 if used.size else 0
+
+    def first(self, mask, games):
+        """
+        Return the slot of the oldest boost selected by mask for each game.
+        """
+        return np.argmin(np.where(mask, self.order[games, :mask.shape[1]], _NO_ORDER_), axis=1)
+
+    def to_list(self, game):
+        """
+        Return the boosts of the specified game as [loc, remaining_duration] pairs, in the order Map hands them out.
+        """
+        slots = np.flatnonzero(self.order[game] >= 0)
+        slots = slots[np.argsort(self.order[game, slots])]
+        return [[self.loc[game, slot].copy(), self.remaining[game, slot]] for slot in slots]
+
+
+class _BatchEntity():
+    """
+    A view on one entity of one game of a batch that is enough for the scalar helpers of Map.
+    """
+
+    def __init__(self, batch, game, index):
+        self.pos = batch.pos[game, index]
+        self.size = batch.size[index]
+
+    @property
+    def map_position(self):
+        return np.floor(self.pos).astype(dtype=np.int64)
+
+    def teleport(self, pos):
+        self.pos[:] = pos[:]
+
+
+@export
+class BatchGame():
+    """
+    Represents N independent games played in lockstep on the same map.
+    The state of all the games is held in struct-of-arrays buffers indexed by (game, entity),
+    each game has entities of the same types in the same order.
+
+    There are no controllers, entities are driven through the ```direction``` (index in ```DIRECTIONS```),
+    ```moving``` and ```use_request``` arrays which can be changed between two calls to update.
+    An entity moves like with a HumanController and uses the modifier it holds whenever ```use_request``` is True.
+
+    Modifiers are described by the modifier factories of the map's boost generator,
+    only the effects of the modifiers shipped with manpac are supported.
+
+    Parameters
+    -----------
+    - *n_games*: (**int**)
+        the number of games played in parallel
+    - *types*: (**EntityType iterable**)
+        the types of the entities taking part in each game
+    - *seed*: (**int or numpy.random.SeedSequence**)
+        the seed of the randomness of the games, None for a random one (default: None)
+    """
+
+    def __init__(self, n_games, *types, seed=None):
+        self.n_games = n_games
+        if not isinstance(seed, np.random.SeedSequence):
+            seed = np.random.SeedSequence(seed)
+        self.seed_sequence = seed
+        self.rng = np.random.default_rng(seed)
+        self.types = list(types)
+        n_entities = len(self.types)
+        prototypes = [Entity(type) for type in self.types]
+        self.is_ghost = np.array([type is EntityType.GHOST for type in self.types], dtype=bool)
+        self.base_speed = np.array([entity.base_speed for entity in prototypes])
+        self.size = np.array([entity.size for entity in prototypes])
+        # Entities state
+        self.pos = np.zeros((n_games, n_entities, 2))
+        self.direction = np.full((n_games, n_entities), DIRECTIONS.index(Direction.LEFT), dtype=np.int64)
+        self.moving = np.zeros((n_games, n_entities), dtype=bool)
+        self.use_request = np.zeros((n_games, n_entities), dtype=bool)
+        self.alive = np.zeros((n_games, n_entities), dtype=bool)
+        # Modifiers are kind indices, -1 means no modifier
+        self.holding = np.full((n_games, n_entities), -1, dtype=np.int64)
+        self.modifiers = np.full((n_games, n_entities, 4), -1, dtype=np.int64)
+        self.modifiers_remaining = np.zeros((n_games, n_entities, 4))
+        # Map state
+        self.ghost_boosts = _BatchBoosts(n_games)
+        self.pacman_boosts = _BatchBoosts(n_games)
+        self._last_generation = np.zeros(n_games)
+        # Games state
+        self.started = False
+        self.ongoing = np.zeros(n_games, dtype=bool)
+        self.duration = np.zeros(n_games)
+        self.ghosts = np.zeros(n_games, dtype=np.int64)
+        self.winner = np.full(n_games, -1, dtype=np.int64)
+        self.map = None
+
+    @property
+    def status(self):
+        """
+        The status of the whole batch, it is finished only when all games are finished.
+        type: **GameStatus**
+        """
+        if not self.started:
+            return GameStatus.NOT_STARTED
+        if self.ongoing.any():
+            return GameStatus.ONGOING
+        return GameStatus.FINISHED
+
+    def game_status(self, game):
+        """
+        Return the status of the specified game.
+
+        Parameters
+        -----------
+        - *game*: (**int**)
+            the index of the game
+
+        Return
+        -----------
+        The status of the game.
+        type: **GameStatus**
+        """
+        if not self.started:
+            return GameStatus.NOT_STARTED
+        return GameStatus.ONGOING if self.ongoing[game] else GameStatus.FINISHED
+
+    def _register_kinds_(self, boost_generator):
+        # Kinds are described by a prototype of each factory, the last kind is neutral
+        # so that -1 can be used to index the tables.
+        factories = []
+        if boost_generator:
+            factories = boost_generator.ghost_modifier_factory + boost_generator.pacman_modifier_factory
+            n_ghost = len(boost_generator.ghost_modifier_factory)
+            odds = np.array([odds for (odds, factory) in factories], dtype=np.float64)
+            self._kind_ranges = [(0, n_ghost), (n_ghost, len(factories))]
+            self._kind_odds = [odds[:n_ghost] / np.sum(odds[:n_ghost]), odds[n_ghost:] / np.sum(odds[n_ghost:])]
+            self.boost_probability = boost_generator.boost_probability
+        prototypes = [factory() for (odds, factory) in factories]
+        self.kind_speed = np.array([m.speed_multiplier for m in prototypes] + [1], dtype=np.float64)
+        self.kind_tangible = np.array([m.is_tangible for m in prototypes] + [True], dtype=bool)
+        self.kind_ghost_collide = np.array([m.can_ghost_collide for m in prototypes] + [False], dtype=bool)
+        self.kind_duration = np.array([m.remaining_duration for m in prototypes] + [0], dtype=np.float64)
+        self.kind_swap_range = np.array([m.range if isinstance(m, SwapModifier) else np.nan
+                                         for m in prototypes] + [np.nan], dtype=np.float64)
+        self.kind_teleport_back = np.array([isinstance(m, IntangibleModifier) for m in prototypes] + [False],
+                                           dtype=bool)
+
+    def _register_locations_(self, map):
+        # Same distribution as rejection sampling with BufferedRandom.randint
+        walkable = np.argwhere(map.terrain != Cell.WALL)
+        weights = np.ones(len(walkable))
+        for axis, bound in enumerate(map.max_bounds):
+            weights[walkable[:, axis] == 0] *= .5
+            weights[walkable[:, axis] == bound] *= .5
+        self._locations = walkable
+        self._location_odds = weights / np.sum(weights)
+
+    def start(self, map):
+        """
+        Start all games on the specified map.
+
+        Parameters
+        -----------
+        - *map*: (**Map**)
+            the map all games will take place on
+        """
+        assert not self.started
+        map.reset()
+        map.compile()
+        self.map = map
+        self._register_kinds_(map.boost_generator)
+        self._register_locations_(map)
+        self.started = True
+        self.duration[:] = 0
+        self.alive[:, :] = True
+        self.holding[:, :] = -1
+        self.modifiers[:, :, :] = -1
+        self.ghost_boosts.clear()
+        self.pacman_boosts.clear()
+        self._last_generation[:] = 0
+        # Spawn entities
+        for index, type in enumerate(self.types):
+            spawn = map.spawns[type]
+            if spawn.dtype.kind == "i":
+                spawn = spawn.astype(dtype=np.float64) + .5
+            self.pos[:, index] = spawn
+        self.ghosts[:] = np.sum(self.is_ghost)
+        self.ongoing[:] = self.ghosts > 1
+        self._find_winners_(~self.ongoing)
+
+    def _find_winners_(self, games):
+        candidates = self.alive[games] & self.is_ghost
+        self.winner[games] = np.where(candidates.any(axis=1), np.argmax(candidates, axis=1), -1)
+
+    def update(self, ticks):
+        """
+        Update all ongoing games for the specified number of ticks.
+
+        Parameters
+        -----------
+        - *ticks*: (**float**)
+            the number of ticks elapsed
+        """
+        if self.status is not GameStatus.ONGOING:
+            return
+        while ticks > MAX_TICK_UNIT and self.ongoing.any():
+            self._step_(MAX_TICK_UNIT)
+            ticks -= MAX_TICK_UNIT
+        self._step_(ticks)
+
+    def _step_(self, ticks):
+        games = self.ongoing.copy()
+        if not games.any():
+            return
+        self.duration[games] += ticks
+        for index in range(len(self.types)):
+            self._update_entity_(games, index, ticks)
+        self._update_boosts_(games, ticks)
+        self._check_collisions_(games)
+        # Update status
+        finished = games & (self.ghosts <= 1)
+        self.ongoing[finished] = False
+        self._find_winners_(finished)
+
+    # =========================================================================
+    # ENTITIES
+    # =========================================================================
+    def _speed_(self, games, index):
+        speed = self.base_speed[index] * self.moving[games, index]
+        for slot in range(self.modifiers.shape[2]):
+            speed = speed * self.kind_speed[self.modifiers[games, index, slot]]
+        return speed
+
+    def _tangible_(self, games):
+        return np.all(self.kind_tangible[self.modifiers[games]], axis=-1)
+
+    def _can_collide_with_(self, games, index, other):
+        if self.types[index] is EntityType.PACMAN or other is EntityType.PACMAN:
+            return self._tangible_(games)[:, index]
+        return np.any(self.kind_ghost_collide[self.modifiers[games, index]], axis=-1)
+
+    def _update_entity_(self, games, index, ticks):
+        games = np.flatnonzero(games & self.alive[:, index])
+        if games.size == 0:
+            return
+        # Update modifiers
+        kinds = self.modifiers[games, index]
+        active = kinds >= 0
+        remaining = self.modifiers_remaining[games, index]
+        remaining[active] -= ticks
+        self.modifiers_remaining[games, index] = remaining
+        expired = active & (remaining <= 0)
+        if expired.any():
+            self.modifiers[games, index] = np.where(expired, -1, kinds)
+            for slot in range(kinds.shape[1]):
+                dead = expired[:, slot]
+                if dead.any():
+                    self._on_modifier_death_(games[dead], index, kinds[dead, slot])
+        # Use modifiers
+        use = self.use_request[games, index] & (self.holding[games, index] >= 0)
+        if use.any():
+            self._use_modifier_(games[use], index)
+        # Move
+        speed = self._speed_(games, index)
+        games, speed = games[speed > 0], speed[speed > 0]
+        if games.size == 0:
+            return
+        vectors = _VECTORS_[self.direction[games, index]]
+        distance = self.map.how_far_batch(self.pos[games, index], vectors, speed,
+                                          np.full(games.size, self.size[index]), ticks * speed,
+                                          self._tangible_(games)[:, index])
+        used_ticks = distance / speed
+        self._do_boost_pickup_(games, index, vectors, used_ticks * speed)
+        # Speed can change if a boost was used upon pickup
+        speed = self._speed_(games, index)
+        self.pos[games, index] += vectors * speed[:, None] * used_ticks[:, None]
+
+    def _on_modifier_death_(self, games, index, kinds):
+        swap = ~np.isnan(self.kind_swap_range[kinds])
+        if swap.any():
+            self._swap_(games[swap], index, self.kind_swap_range[kinds[swap]])
+        teleport = self.kind_teleport_back[kinds]
+        if teleport.any():
+            games = games[teleport]
+            self._teleport_back_(games[self._tangible_(games)[:, index]], index)
+
+    def _swap_(self, games, index, ranges):
+        # Closest tangible entity in range, on ties the last one like SwapModifier
+        d = np.sum(np.square(self.pos[games, index][:, None, :] - self.pos[games]), axis=2)
+        candidates = self.alive[games] & self._tangible_(games) & (d > 0) & (d <= (ranges * ranges)[:, None])
+        d = np.where(candidates, d, np.inf)[:, ::-1]
+        closest = d.shape[1] - 1 - np.argmin(d, axis=1)
+        found = candidates.any(axis=1)
+        games, closest = games[found], closest[found]
+        copy = self.pos[games, index].copy()
+        self.pos[games, index] = self.pos[games, closest]
+        self.pos[games, closest] = copy
+
+    def _teleport_back_(self, games, index):
+        if games.size == 0:
+            return
+        cells = self.map._batch_cells_occupied_(self.pos[games, index], np.full(games.size, self.size[index]))
+        invalid = ~np.all(self.map.are_walkable(cells), axis=1)
+        for game in games[invalid]:
+            self.map.teleport_back_on_map(_BatchEntity(self, game, index))
+
+    def _use_modifier_(self, games, index):
+        free = self.modifiers[games, index] < 0
+        if not free.any(axis=1).all():
+            self.modifiers = np.concatenate([self.modifiers, np.full_like(self.modifiers, -1)], axis=2)
+            self.modifiers_remaining = np.concatenate([self.modifiers_remaining,
+                                                       np.zeros_like(self.modifiers_remaining)], axis=2)
+            free = self.modifiers[games, index] < 0
+        slots = np.argmax(free, axis=1)
+        kinds = self.holding[games, index]
+        self.modifiers[games, index, slots] = kinds
+        self.modifiers_remaining[games, index, slots] = self.kind_duration[kinds]
+        self.holding[games, index] = -1
+
+    def _make_modifiers_(self, index, n):
+        start, end = self._kind_ranges[0 if self.is_ghost[index] else 1]
+        return start + self.rng.choice(end - start, size=n, p=self._kind_odds[0 if self.is_ghost[index] else 1])
+
+    def _do_boost_pickup_(self, games, index, vectors, distance_traveled):
+        boosts = self.ghost_boosts if self.is_ghost[index] else self.pacman_boosts
+        vx, vy = vectors[:, 0, None], vectors[:, 1, None]
+        orthogonals = _ORTHOGONALS_[self.direction[games, index]]
+        ox, oy = orthogonals[:, 0, None], orthogonals[:, 1, None]
+        size = self.size[index]
+        columns = boosts.columns()
+        if columns == 0:
+            return
+        # Same rules as Map._do_boost_pickup_, component by component
+        loc = boosts.loc[games, :columns]
+        pos = self.pos[games, index]
+        x = (loc[:, :, 0] + .5) - pos[:, 0, None]
+        y = (loc[:, :, 1] + .5) - pos[:, 1, None]
+        candidates = boosts.order[games, :columns] >= 0
+        candidates &= (np.sign(x) == vx) | (np.sign(y) == vy)
+        candidates &= ~(np.maximum(np.abs(x * ox), np.abs(y * oy)) > size + self.map.boost_size)
+        distance = np.maximum(x * vx, y * vy) - size - self.map.boost_size
+        candidates &= distance <= distance_traveled[:, None]
+        picked = candidates.any(axis=1)
+        if not picked.any():
+            return
+        games = games[picked]
+        slots = boosts.first(candidates[picked], games)
+        loc = boosts.loc[games, slots]
+        remaining = boosts.remaining[games, slots]
+        if self.map.boost_generator:
+            kinds = self._make_modifiers_(index, games.size)
+            free = self.holding[games, index] < 0
+            self.holding[games[free], index] = kinds[free]
+            if not self.is_ghost[index]:
+                self._use_modifier_(games[free], index)
+        boosts.order[games, slots] = -1
+        if self.is_ghost[index]:
+            self.pacman_boosts.insert(games, loc, remaining)
+
+    def _kill_(self, games, index):
+        self.alive[games, index] = False
+        self.moving[games, index] = False
+        self.ghosts[games] -= 1
+
+    # =========================================================================
+    # MAP
+    # =========================================================================
+    def _random_locations_(self, n):
+        return self._locations[self.rng.choice(len(self._locations), size=n, p=self._location_odds)]
+
+    def _update_boosts_(self, games, ticks):
+        games = np.flatnonzero(games)
+        boosts = self.ghost_boosts
+        active = boosts.order[games] >= 0
+        expired = active & (boosts.remaining[games] <= ticks)
+        boosts.remaining[games] -= ticks * (active & ~expired)
+        # Spawn pacman boosts in insertion order
+        while expired.any():
+            rows = np.flatnonzero(expired.any(axis=1))
+            slots = boosts.first(expired[rows], games[rows])
+            expired_games = games[rows]
+            self.pacman_boosts.insert(expired_games, boosts.loc[expired_games, slots],
+                                      boosts.remaining[expired_games, slots])
+            boosts.order[expired_games, slots] = -1
+            expired[rows, slots] = False
+        # Add new boosts
+        if not self.map.boost_generator:
+            return
+        self._last_generation[games] += ticks
+        pending = games[self._last_generation[games] > 1]
+        while pending.size:
+            spawn = pending[self.rng.random(pending.size) <= self.boost_probability]
+            if spawn.size:
+                boosts.insert(spawn, self._random_locations_(spawn.size), self.map.boost_duration)
+            self._last_generation[pending] -= 1
+            pending = pending[self._last_generation[pending] > 1]
+
+    # =========================================================================
+    # COLLISIONS
+    # =========================================================================
+    def _check_collisions_(self, games):
+        n_entities = len(self.types)
+        for i in range(n_entities):
+            for j in range(i + 1, n_entities):
+                candidates = np.flatnonzero(games & self.alive[:, i] & self.alive[:, j])
+                if candidates.size == 0:
+                    continue
+                can_collide = self._can_collide_with_(candidates, i, self.types[j]) | \
+                    self._can_collide_with_(candidates, j, self.types[i])
+                distance = np.sum(np.square(self.pos[candidates, i] - self.pos[candidates, j]), axis=1)
+                collide = can_collide & (distance < (self.size[j] + self.size[i])**2)
+                if collide.any():
+                    self._on_collision_(candidates[collide], i, j)
+
+    def _on_collision_(self, games, i, j):
+        type1, type2 = self.types[i], self.types[j]
+        if type1 is EntityType.PACMAN and type2 is EntityType.GHOST:
+            self._kill_(games, j)
+        elif type2 is EntityType.PACMAN and type1 is EntityType.GHOST:
+            self._kill_(games, i)
+        else:
+            # Same spreading as Game.on_collision
+            v1 = _VECTORS_[self.direction[games, i]]
+            v2 = _VECTORS_[self.direction[games, j]]
+            distance = np.linalg.norm(v1, axis=1) + np.linalg.norm(v2, axis=1)
+            to_spread = np.linalg.norm(self.pos[games, i] - self.pos[games, j], axis=1) - (self.size[j] + self.size[i])
+            coeff = 2 * to_spread / distance
+            # Game passes the entity instead of its type here
+            can1 = self._can_collide_with_(games, i, None)
+            can2 = self._can_collide_with_(games, j, None)
+            coeff1 = np.where(can1 & ~can2, 0, 1)
+            coeff2 = np.where(~can1 & can2, 0, 1)
+            coeff = coeff / (coeff1 + coeff2)
+            self.pos[games, i] = self.pos[games, i] + v1 * coeff1[:, None] * coeff[:, None]
+            self.pos[games, j] = self.pos[games, j] + v2 * coeff2[:, None] * coeff[:, None]
+            self._teleport_back_(games, i)
+            self._teleport_back_(games, j)
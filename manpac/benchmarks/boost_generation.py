@@ -0,0 +1,75 @@
+#!/usr/bin/env python
+"""
+Compares SimpleBoostGenerator.generate, which draws the number of boosts of an interval
+from a binomial and their locations among the walkable cells at once, with a try per tick
+and rejection sampling of the locations.
+
+Usage: python -m manpac.benchmarks.boost_generation [-r REPEATS]
+"""
+from manpac.game import Game
+from manpac.map import Map
+from manpac.cell import Cell
+from manpac.boost_generators.simple_boost_generator import SimpleBoostGenerator
+
+import argparse
+import time
+import numpy as np
+
+
+SIDE = 64
+# (ratio of walkable cells, ticks per call)
+CASES = [(1, 1), (.1, 1), (1, 100), (.1, 100)]
+PROBABILITY = .05
+
+
+def naive_generate(generator, ticks):
+    map = generator.game.map
+    locations = []
+    generator._last_generation += ticks
+    while generator._last_generation > 1:
+        if generator.rand.uniform() <= generator.boost_probability:
+            pos = np.array([-10, -10])
+            while not map.is_walkable(pos):
+                pos[0] = generator.rand.randint(0, map.width - 1)
+                pos[1] = generator.rand.randint(0, map.height - 1)
+            locations.append(pos)
+        generator._last_generation -= 1
+    return locations
+
+
+def make_generator(ratio):
+    game = Game(seed=0)
+    map = Map((SIDE, SIDE), SimpleBoostGenerator(game, PROBABILITY, [], []))
+    walls = np.random.RandomState(0).random_sample((SIDE, SIDE)) >= ratio
+    map.terrain[walls] = Cell.WALL
+    map.all_pairs_paths = False
+    map.compile()
+    game.map = map
+    return map.boost_generator
+
+
+def measure(ratio, ticks, repeats, generate):
+    generator = make_generator(ratio)
+    calls = max(repeats // ticks, 1)
+    spawned = 0
+    start = time.perf_counter()
+    for _ in range(calls):
+        spawned += len(generate(generator, ticks))
+    return (time.perf_counter() - start) / calls, spawned / (calls * ticks)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Benchmark the boost generation.')
+    parser.add_argument('-r', '--repeats', dest='repeats',
+                        action='store', default=20000, type=int,
+                        help='number of measured ticks per case (default: 20000)')
+    parameters = parser.parse_args()
+
+    print("{:>8} {:>6} {:>12} {:>12} {:>8}".format("walkable", "ticks", "naive (us)", "binomial (us)", "speedup"))
+    for ratio, ticks in CASES:
+        naive, naive_rate = measure(ratio, ticks, parameters.repeats, naive_generate)
+        binomial, binomial_rate = measure(ratio, ticks, parameters.repeats, SimpleBoostGenerator.generate)
+        # Both spawn boosts at the same rate
+        assert abs(naive_rate - binomial_rate) < .02
+        print("{:>8.0%} {:>6} {:>12.2f} {:>13.2f} {:>7.1f}x".format(ratio, ticks, naive * 1e6, binomial * 1e6,
+                                                                    naive / binomial))
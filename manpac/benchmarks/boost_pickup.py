@@ -0,0 +1,95 @@
+#!/usr/bin/env python
+"""
+Compares the boost pickup of Map._do_boost_pickup_, which only looks at the
+boosts in the cells swept by the entity, with the scan of every boost.
+
+Usage: python -m manpac.benchmarks.boost_pickup [-r REPEATS]
+"""
+from manpac.entity import Entity
+from manpac.entity_type import EntityType
+from manpac.map import Map
+from manpac.direction import Direction
+
+import argparse
+import time
+import numpy as np
+
+
+BOOSTS = [1, 10, 100, 1000]
+SIDE = 64
+MOVES = 1000
+DISTANCE = .2
+
+
+def first_pickup(map, entity, boosts):
+    # The boost Map._do_boost_pickup_ would pick up among the specified ones, without picking it up
+    v = entity.direction.vector
+    v_orth = entity.direction.rot90(1).vector
+    for boost in boosts:
+        loc = boost.loc
+        vector = (loc + .5) - entity.pos
+        if (np.sign(vector) != v).all():
+            continue
+        if np.max(np.abs(vector * v_orth)) > entity.size + map.boost_size:
+            continue
+        if np.max(vector * v) - entity.size - map.boost_size <= DISTANCE:
+            return boost
+    return None
+
+
+def naive_pickup(map, boosts, entity):
+    return first_pickup(map, entity, boosts)
+
+
+def swept_pickup(map, boosts, entity):
+    radius = entity.size + map.boost_size
+    return first_pickup(map, entity, map.boosts.swept(entity.type, entity.pos, entity.direction, DISTANCE + radius, radius))
+
+
+def make_map(n, seed):
+    rng = np.random.RandomState(seed)
+    map = Map((SIDE, SIDE))
+    map.ghost_boosts = [[rng.randint(0, SIDE, size=2), 1e9] for _ in range(n)]
+    return map
+
+
+def make_moves(seed):
+    rng = np.random.RandomState(seed)
+    directions = list(Direction)
+    moves = []
+    for _ in range(MOVES):
+        entity = Entity(EntityType.GHOST)
+        entity.teleport(rng.uniform(1, SIDE - 1, size=2))
+        entity.face(directions[rng.randint(4)])
+        moves.append(entity)
+    return moves
+
+
+def measure(n, repeats, pickup):
+    elapsed = 0
+    picked = []
+    for seed in range(repeats):
+        map = make_map(n, seed)
+        boosts = map.ghost_boosts
+        moves = make_moves(seed)
+        start = time.perf_counter()
+        for entity in moves:
+            picked.append(pickup(map, boosts, entity))
+        elapsed += time.perf_counter() - start
+    return elapsed / (repeats * MOVES), picked
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Benchmark the boost pickup.')
+    parser.add_argument('-r', '--repeats', dest='repeats',
+                        action='store', default=3, type=int,
+                        help='number of measured maps per number of boosts (default: 3)')
+    parameters = parser.parse_args()
+
+    print("{:>8} {:>12} {:>12} {:>8}".format("boosts", "naive (us)", "swept (us)", "speedup"))
+    for n in BOOSTS:
+        naive, naive_picked = measure(n, parameters.repeats, naive_pickup)
+        swept, swept_picked = measure(n, parameters.repeats, swept_pickup)
+        locations = [[boost and boost.loc.tolist() for boost in picked] for picked in [naive_picked, swept_picked]]
+        assert locations[0] == locations[1]
+        print("{:>8} {:>12.2f} {:>12.2f} {:>7.1f}x".format(n, naive * 1e6, swept * 1e6, naive / swept))
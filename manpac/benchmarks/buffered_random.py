@@ -0,0 +1,53 @@
+#!/usr/bin/env python
+"""
+Compares the draws of BufferedRandom one at a time, with the odds of choice walked
+linearly, with the draws by batches and with the odds prepared in an AliasTable.
+
+Usage: python -m manpac.benchmarks.buffered_random [-d DRAWS]
+"""
+from manpac.utils.buffered_random import BufferedRandom, AliasTable
+
+import argparse
+import time
+import numpy as np
+
+
+ODDS = [4, 16, 64]
+
+
+def measure(draws, draw):
+    start = time.perf_counter()
+    draw()
+    return (time.perf_counter() - start) / draws
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Benchmark the draws of BufferedRandom.')
+    parser.add_argument('-d', '--draws', dest='draws',
+                        action='store', default=100000, type=int,
+                        help='number of measured draws per case (default: 100000)')
+    parameters = parser.parse_args()
+    draws = parameters.draws
+    rand = BufferedRandom(100, np.random.default_rng(0))
+
+    print("{:>24} {:>12} {:>12} {:>8}".format("draw", "single (ns)", "fast (ns)", "speedup"))
+    cases = [
+        ("uniform / batch", lambda: [rand.uniform(0, 10) for _ in range(draws)],
+         lambda: rand.uniform_batch(draws, 0, 10)),
+        ("randint / batch", lambda: [rand.randint(0, 10) for _ in range(draws)],
+         lambda: rand.randint_batch(draws, 0, 10))
+    ]
+    for n in ODDS:
+        odds = list(np.random.default_rng(n).random(n))
+        sequence = list(range(n))
+        table = AliasTable(odds)
+        linear = lambda sequence=sequence, odds=odds: [rand.choice(sequence, odds) for _ in range(draws)]  # noqa: E731
+        cases.append(("choice {} / alias".format(n), linear,
+                      lambda sequence=sequence, table=table: [rand.choice(sequence, table) for _ in range(draws)]))
+        cases.append(("choice {} / alias batch".format(n), linear,
+                      lambda sequence=sequence, table=table: rand.choice_batch(np.array(sequence), table, draws)))
+    for name, single, fast in cases:
+        single_time = measure(draws, single)
+        fast_time = measure(draws, fast)
+        print("{:>24} {:>12.1f} {:>12.1f} {:>7.1f}x".format(name, single_time * 1e9, fast_time * 1e9,
+                                                            single_time / fast_time))
@@ -0,0 +1,85 @@
+#!/usr/bin/env python
+"""
+Compares the spatial hash broad phase of Game._check_collisions_ with the
+naive all pairs check.
+
+Usage: python -m manpac.benchmarks.collisions [-r REPEATS]
+"""
+from manpac.entity import Entity
+from manpac.entity_type import EntityType
+from manpac.game import Game
+from manpac.map import Map
+from manpac.direction import Direction
+from manpac.modifiers.ghost_block_modifier import GhostBlockModifier
+
+import argparse
+import time
+import numpy as np
+
+
+SIZES = [5, 10, 50, 100, 500, 1000]
+# Number of cells per entity, the map grows with the number of entities
+CELLS_PER_ENTITY = 4
+
+
+def naive_check_collisions(game):
+    cpy = game.entities[:]
+    for i, entity1 in enumerate(cpy):
+        if not entity1.alive:
+            continue
+        for entity2 in cpy[i+1:]:
+            if not entity2.alive:
+                continue
+            can_collide = entity1.can_collide_with(entity2.type) or entity2.can_collide_with(entity1.type)
+            if can_collide and entity1.squared_distance_to(entity2.pos) < (entity2.size + entity1.size)**2:
+                game.on_collision(entity1, entity2)
+                if not entity1.alive:
+                    break
+
+
+def make_map(n):
+    side = int(np.ceil(np.sqrt(n * CELLS_PER_ENTITY))) + 2
+    map = Map((side, side))
+    # Paths are not used here, skip their precomputation
+    map.all_pairs_paths = False
+    return map
+
+
+def make_game(n, map, seed):
+    rng = np.random.RandomState(seed)
+    side = map.width
+    directions = list(Direction)
+    entities = [Entity(EntityType.PACMAN)] + [Entity(EntityType.GHOST) for _ in range(n - 1)]
+    game = Game(*entities)
+    game.start(map)
+    for entity in entities:
+        entity.teleport(rng.uniform(1, side - 1, size=2))
+        entity.face(directions[rng.randint(4)])
+        if rng.rand() < .25:
+            entity.modifiers = [GhostBlockModifier(game, 10)]
+    return game
+
+
+def measure(n, repeats, check):
+    elapsed = 0
+    map = make_map(n)
+    for seed in range(repeats):
+        game = make_game(n, map, seed)
+        start = time.perf_counter()
+        check(game)
+        elapsed += time.perf_counter() - start
+    return elapsed / repeats
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Benchmark the collision broad phase.')
+    parser.add_argument('-r', '--repeats', dest='repeats',
+                        action='store', default=5, type=int,
+                        help='number of measured checks per size (default: 5)')
+    parameters = parser.parse_args()
+
+    print("{:>8} {:>12} {:>12} {:>8}".format("entities", "naive (ms)", "grid (ms)", "speedup"))
+    for n in SIZES:
+        naive = measure(n, parameters.repeats, naive_check_collisions)
+        grid = measure(n, parameters.repeats, lambda game: game._check_collisions_())
+        print("{:>8} {:>12.3f} {:>12.3f} {:>7.1f}x".format(n, naive * 1e3, grid * 1e3, naive / grid))
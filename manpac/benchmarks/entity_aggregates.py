@@ -0,0 +1,79 @@
+#!/usr/bin/env python
+"""
+Compares the cached speed, is_tangible and can_collide_with of Entity with
+the reduction over the modifiers at each read they replaced.
+
+Usage: python -m manpac.benchmarks.entity_aggregates [-r READS]
+"""
+from manpac.entity import Entity
+from manpac.entity_type import EntityType
+from manpac.game import Game
+from manpac.modifiers.speed_modifier import SpeedModifier
+from manpac.modifiers.ghost_block_modifier import GhostBlockModifier
+
+import argparse
+import operator
+import time
+from functools import reduce
+
+
+MODIFIERS = [0, 1, 2, 4]
+
+
+def naive_speed(entity):
+    return reduce(operator.mul,
+                  [modifier.speed_multiplier for modifier in entity.modifiers],
+                  entity.base_speed * entity.moving)
+
+
+def naive_is_tangible(entity):
+    return reduce(operator.and_,
+                  [modifier.is_tangible for modifier in entity.modifiers],
+                  True)
+
+
+def naive_can_collide_with(entity, other):
+    if entity.type is EntityType.PACMAN or other is EntityType.PACMAN:
+        return naive_is_tangible(entity)
+    return reduce(operator.or_,
+                  [modifier.can_ghost_collide for modifier in entity.modifiers],
+                  False)
+
+
+def make_entity(n):
+    game = Game()
+    entity = Entity(EntityType.GHOST)
+    entity.moving = True
+    entity.modifiers = [SpeedModifier(game, 10, 2) if i % 2 else GhostBlockModifier(game, 10) for i in range(n)]
+    return entity
+
+
+def measure(reads, read):
+    start = time.perf_counter()
+    for _ in range(reads):
+        read()
+    return (time.perf_counter() - start) / reads
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Benchmark the cached aggregates of the modifiers of entities.')
+    parser.add_argument('-r', '--reads', dest='reads',
+                        action='store', default=200000, type=int,
+                        help='number of measured reads per aggregate (default: 200000)')
+    parameters = parser.parse_args()
+
+    print("{:>9} {:>16} {:>12} {:>12} {:>8}".format("modifiers", "aggregate", "naive (ns)", "cached (ns)", "speedup"))
+    for n in MODIFIERS:
+        entity = make_entity(n)
+        cases = [
+            ("speed", lambda: naive_speed(entity), lambda: entity.speed),
+            ("is_tangible", lambda: naive_is_tangible(entity), lambda: entity.is_tangible),
+            ("can_collide_with", lambda: naive_can_collide_with(entity, EntityType.GHOST),
+             lambda: entity.can_collide_with(EntityType.GHOST))
+        ]
+        for name, naive, cached in cases:
+            assert naive() == cached()
+            naive_time = measure(parameters.reads, naive)
+            cached_time = measure(parameters.reads, cached)
+            print("{:>9} {:>16} {:>12.1f} {:>12.1f} {:>7.1f}x".format(n, name, naive_time * 1e9, cached_time * 1e9,
+                                                                      naive_time / cached_time))
@@ -0,0 +1,57 @@
+#!/usr/bin/env python
+"""
+Compares the size and the encode and decode times of the text and binary net codecs.
+
+Usage: python -m manpac.benchmarks.net_codec [-n NUMBER]
+"""
+from manpac.entity import Entity
+from manpac.entity_type import EntityType
+from manpac.game import Game
+from manpac.direction import Direction
+from manpac.maps.map_pacman import MapPacman
+from manpac.modifiers.speed_modifier import SpeedModifier
+from manpac.modifiers.swap_modifier import SwapModifier
+from manpac.modifiers.intangible_modifier import IntangibleModifier
+from manpac.controllers.net.net_codec import TextCodec, BinaryCodec
+from manpac.controllers.net.net_message import \
+    MsgSyncMap, MsgSyncEntity, MsgSyncClock, MsgCompound, MsgSyncMapBoosts, MsgBoostPickup, MsgSyncModifiers
+
+import argparse
+import timeit
+import numpy as np
+
+
+def make_messages():
+    game = Game(Entity(EntityType.PACMAN), *[Entity(EntityType.GHOST) for _ in range(4)])
+    map = MapPacman(game)
+    rng = np.random.RandomState(0)
+    directions = list(Direction)
+    entities = [MsgSyncEntity(pos=rng.uniform(0, 20, size=2), direction=directions[i % 4], alive=True, uid=i)
+                for i in range(5)]
+    boosts = [[rng.randint(0, 20, size=2), rng.uniform(0, 600)] for _ in range(10)]
+    modifiers = [SpeedModifier(game, 120, 2), SwapModifier(game, 10), IntangibleModifier(game, 120)]
+    return [
+        ("MsgSyncMap", MsgSyncMap(map.terrain)),
+        ("MsgSyncEntity", entities[0]),
+        ("MsgCompound", MsgCompound(*entities[1:], MsgSyncClock(1234.5))),
+        ("MsgSyncMapBoosts", MsgSyncMapBoosts(boosts[:7], boosts[7:])),
+        ("MsgBoostPickup", MsgBoostPickup(2, modifiers[0])),
+        ("MsgSyncModifiers", MsgSyncModifiers(3, modifiers))
+    ]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Benchmark the net codecs.')
+    parser.add_argument('-n', '--number', dest='number',
+                        action='store', default=2000, type=int,
+                        help='number of encodings and decodings measured per message (default: 2000)')
+    parameters = parser.parse_args()
+
+    codecs = [("text", TextCodec()), ("binary", BinaryCodec())]
+    print("{:<18} {:<7} {:>7} {:>12} {:>12}".format("message", "codec", "bytes", "encode (us)", "decode (us)"))
+    for name, msg in make_messages():
+        for codec_name, codec in codecs:
+            data = codec.encode(msg)
+            encode = timeit.timeit(lambda: codec.encode(msg), number=parameters.number) / parameters.number
+            decode = timeit.timeit(lambda: codec.decode(data), number=parameters.number) / parameters.number
+            print("{:<18} {:<7} {:>7} {:>12.2f} {:>12.2f}".format(name, codec_name, len(data), encode * 1e6, decode * 1e6))
@@ -0,0 +1,336 @@
+#!/usr/bin/env python
+"""
+Load test of the net server: bot clients play against a server hosting their rooms on the loopback interface.
+Reports the bytes per second and the latency from the tick a message is sent at to its reception by message type,
+the packet counts and the CPU time of the server, optionally through a proxy dropping and delaying packets.
+The message sizes exclude the timestamp added to measure the latency, the packet sizes include it.
+
+Usage: python -m manpac.benchmarks.net_load [-b BOTS] [-s SEATS] [-c CONTROLLER] [-w WORKERS]
+       [-l LOSS] [--latency LATENCY] [--jitter JITTER] [--codec CODEC]
+"""
+from manpac.entity import Entity
+from manpac.entity_type import EntityType
+from manpac.game import Game
+from manpac.game_status import GameStatus
+from manpac.map_cache import MapCache
+from manpac.maps.map_pacman import MapPacman
+from manpac.controllers.random_walk_controller import RandomWalkController
+from manpac.controllers.target_seeker_controller import TargetSeekerController
+from manpac.controllers.net.net_client_controller import NetClientController
+from manpac.controllers.net.net_transport import NetTransport
+from manpac.server import CODEC_DICT, Room, Matchmaker, TickScheduler
+
+from array import array
+import argparse
+import asyncio
+import multiprocessing
+import struct
+import threading
+import time
+import numpy as np
+
+
+CONTROLLER_DICT = {
+    "rw": RandomWalkController,
+    "t": TargetSeekerController
+}
+
+_STAMP_ = struct.Struct("<d")
+
+
+class StampCodec():
+    """
+    Wrap a codec to prefix each message with the time it is encoded at,
+    and record the count, the size and the latency of the messages decoded by type.
+    The clock is shared by the processes of the host.
+    """
+
+    def __init__(self, codec):
+        self.codec = codec
+        # [count, bytes, latencies] by message type
+        self.stats = {}
+
+    def encode(self, msg, tick=0):
+        return _STAMP_.pack(time.perf_counter()) + self.codec.encode(msg, tick)
+
+    def decode(self, data):
+        stamp, = _STAMP_.unpack_from(data)
+        msg = self.codec.decode(memoryview(data)[_STAMP_.size:])
+        stats = self.stats.setdefault(type(msg).__name__, [0, 0, array("d")])
+        stats[0] += 1
+        stats[1] += len(data) - _STAMP_.size
+        stats[2].append(time.perf_counter() - stamp)
+        return msg
+
+
+def merge_stats(total, stats):
+    for name, (count, size, latencies) in stats.items():
+        merged = total.setdefault(name, [0, 0, array("d")])
+        merged[0] += count
+        merged[1] += size
+        merged[2].extend(latencies)
+
+
+# =============================================================================
+#  PROXY
+# =============================================================================
+class _Upstream_(asyncio.DatagramProtocol):
+    """
+    The socket of one client towards the server, so that the server sees an address per client.
+    """
+
+    def __init__(self, proxy, client_address):
+        self.proxy = proxy
+        self.client_address = client_address
+        self.transport = None
+        # Datagrams received from the client before the socket is ready
+        self.queue = []
+
+    def connection_made(self, transport):
+        self.transport = transport
+        for data in self.queue:
+            self.proxy.forward(lambda data=data: transport.sendto(data))
+        self.queue = []
+
+    def datagram_received(self, data, address):
+        self.proxy.forward(lambda: self.proxy.transport.sendto(data, self.client_address))
+
+
+class _Proxy_(asyncio.DatagramProtocol):
+    """
+    Forward the datagrams between the clients and the server, each one is dropped with a probability
+    and delayed by a latency plus or minus a uniform jitter.
+    """
+
+    def __init__(self, loop, server_address, loss, latency, jitter, seed, counts):
+        self.loop = loop
+        self.server_address = server_address
+        self.loss = loss
+        self.latency = latency
+        self.jitter = jitter
+        self.rng = np.random.default_rng(seed)
+        # Shared forwarded and dropped counts
+        self.counts = counts
+        self.transport = None
+        self.upstreams = {}
+
+    def connection_made(self, transport):
+        self.transport = transport
+
+    def datagram_received(self, data, address):
+        upstream = self.upstreams.get(address, None)
+        if upstream is None:
+            upstream = _Upstream_(self, address)
+            self.upstreams[address] = upstream
+            self.loop.create_task(self.loop.create_datagram_endpoint(lambda: upstream,
+                                                                     remote_addr=self.server_address))
+        if upstream.transport is None:
+            upstream.queue.append(data)
+        else:
+            self.forward(lambda: upstream.transport.sendto(data))
+
+    def forward(self, send):
+        if self.rng.random() < self.loss:
+            self.counts[1] += 1
+            return
+        self.counts[0] += 1
+        delay = max(0, self.latency + self.rng.uniform(-self.jitter, self.jitter))
+        if delay > 0:
+            self.loop.call_later(delay, send)
+        else:
+            send()
+
+
+def run_proxy(address, server_address, loss, latency, jitter, seed, counts, ready):
+    loop = asyncio.new_event_loop()
+    proxy = _Proxy_(loop, server_address, loss, latency, jitter, seed, counts)
+    loop.run_until_complete(loop.create_datagram_endpoint(lambda: proxy, local_addr=address))
+    ready.set()
+    loop.run_forever()
+
+
+# =============================================================================
+#  BOTS
+# =============================================================================
+def play_bot(address, controller, codec, freq, deadline, map_cache, seed, results):
+    """
+    Join the server as a bot and play a game at the specified frequency.
+    """
+    entities = [Entity(EntityType.PACMAN)] + [Entity(EntityType.GHOST) for _ in range(4)]
+    game = Game(*entities, seed=seed)
+    client = NetClientController(CONTROLLER_DICT[controller](game), address[0], address[1], codec)
+    try:
+        entities[1].attach(client)
+        map = MapPacman(game)
+        map.cache = map_cache
+        game.start(map)
+        while game.status is GameStatus.NOT_STARTED and time.perf_counter() < deadline:
+            time.sleep(.01)
+        period = 1 / freq
+        next_tick = time.perf_counter()
+        while game.status is not GameStatus.FINISHED and time.perf_counter() < deadline:
+            game.update(1)
+            next_tick += period
+            time.sleep(max(0, next_tick - time.perf_counter()))
+    finally:
+        client.transport.close()
+        results.append((game.status is GameStatus.FINISHED, client))
+
+
+def run_bots(address, count, controller, codec_name, freq, deadline, seed, queue):
+    """
+    Play the specified number of bots on threads of this process then put their statistics in the queue.
+    """
+    map_cache = MapCache()
+    results = []
+    threads = [threading.Thread(target=play_bot,
+                                args=(address, controller, StampCodec(CODEC_DICT[codec_name]()), freq,
+                                      deadline, map_cache, bot_seed, results))
+               for bot_seed in seed.spawn(count)]
+    for thread in threads:
+        thread.daemon = True
+        thread.start()
+        # Do not flood the server with joins
+        time.sleep(.01)
+    for thread in threads:
+        thread.join(max(0, deadline - time.perf_counter()) + 1)
+    stats = {}
+    packets = [0, 0, 0, 0]
+    finished = 0
+    for done, client in results:
+        finished += done
+        merge_stats(stats, client.codec.stats)
+        transport = client.transport
+        for i, value in enumerate([transport.packets_sent, transport.packets_received,
+                                   transport.bytes_sent, transport.bytes_received]):
+            packets[i] += value
+    queue.put((finished, stats, packets))
+
+
+# =============================================================================
+#  REPORT
+# =============================================================================
+def print_stats(direction, stats, elapsed):
+    for name, (count, size, latencies) in sorted(stats.items()):
+        p50, p90, p99 = np.percentile(latencies, [50, 90, 99]) * 1e3
+        print("{:<6} {:<18} {:>9} {:>12.1f} {:>8.2f} {:>8.2f} {:>8.2f} {:>8.2f}".format(
+            direction, name, count, size / elapsed, p50, p90, p99, max(latencies) * 1e3))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Load test the net server with bot clients.')
+    parser.add_argument('-b', '--bots', dest='bots',
+                        action='store', default=8, type=int,
+                        help='number of bot clients (default: 8)')
+    parser.add_argument('-s', '--seats', dest='seats',
+                        action='store', default=4, type=int, choices=range(1, 5),
+                        help='number of ghosts of each room played by bots (default: 4)')
+    parser.add_argument('-c', '--controller', dest='controller',
+                        action='store', default="rw", type=str,
+                        choices=list(CONTROLLER_DICT.keys()),
+                        help='controller of the bots (default: "rw")')
+    parser.add_argument('-w', '--workers', dest='workers',
+                        action='store', default=1, type=int,
+                        help='number of processes the bots are spread over (default: 1)')
+    parser.add_argument('-f', '--freq', dest='freq',
+                        action='store', default=60, type=float,
+                        help='number of ticks per second of the server and the bots (default: 60)')
+    parser.add_argument('-d', '--duration', dest='duration',
+                        action='store', default=60, type=float,
+                        help='maximum duration of the test in seconds (default: 60)')
+    parser.add_argument('-l', '--loss', dest='loss',
+                        action='store', default=0, type=float,
+                        help='probability that the proxy drops a packet (default: 0)')
+    parser.add_argument('--latency', dest='latency',
+                        action='store', default=0, type=float,
+                        help='one way delay in ms added by the proxy (default: 0)')
+    parser.add_argument('--jitter', dest='jitter',
+                        action='store', default=0, type=float,
+                        help='maximum deviation in ms of the delay added by the proxy (default: 0)')
+    parser.add_argument('--codec', dest='codec',
+                        action='store', default="binary", type=str,
+                        choices=list(CODEC_DICT.keys()),
+                        help='encoding of the net messages (default: "binary")')
+    parser.add_argument('-p', '--port', dest='port',
+                        action='store', default=9999, type=int,
+                        help='port of the server, the proxy listens on the next one (default: 9999)')
+    parser.add_argument('--seed', dest='seed',
+                        action='store', default=0, type=int,
+                        help='seed of the bots and the proxy (default: 0)')
+    parameters = parser.parse_args()
+
+    seeds = np.random.SeedSequence(parameters.seed).spawn(parameters.workers + 1)
+    host = "127.0.0.1"
+    address = (host, parameters.port)
+    proxy = None
+    counts = multiprocessing.Array("l", 2)
+    if parameters.loss > 0 or parameters.latency > 0 or parameters.jitter > 0:
+        address = (host, parameters.port + 1)
+        ready = multiprocessing.Event()
+        proxy = multiprocessing.Process(target=run_proxy,
+                                        args=(address, (host, parameters.port), parameters.loss,
+                                              parameters.latency / 1e3, parameters.jitter / 1e3,
+                                              seeds[0], counts, ready))
+        proxy.daemon = True
+        proxy.start()
+        ready.wait()
+
+    start = time.perf_counter()
+    deadline = start + parameters.duration
+    queue = multiprocessing.Queue()
+    workers = []
+    for i in range(parameters.workers):
+        count = parameters.bots // parameters.workers + (i < parameters.bots % parameters.workers)
+        worker = multiprocessing.Process(target=run_bots,
+                                         args=(address, count, parameters.controller, parameters.codec,
+                                               parameters.freq, deadline, seeds[i + 1], queue))
+        worker.start()
+        workers.append(worker)
+
+    # The bots try to join until the server is up, the processes are started before its threads
+    codec = StampCodec(CODEC_DICT[parameters.codec]())
+    transport = NetTransport(codec, lambda msg, address: matchmaker.on_message(msg, address))
+    # The last room only has the seats left
+    rooms = (parameters.bots + parameters.seats - 1) // parameters.seats
+    map_cache = MapCache()
+    matchmaker = Matchmaker(rooms, lambda uid: Room(uid, min(parameters.seats, parameters.bots - uid * parameters.seats),
+                                                    transport, map_cache),
+                            rooms, transport)
+    scheduler = TickScheduler(matchmaker, parameters.freq)
+    transport.open(local_address=(host, parameters.port))
+
+    cpu = time.process_time()
+    server = threading.Thread(target=scheduler.run)
+    server.daemon = True
+    server.start()
+    server.join(parameters.duration)
+    cpu = time.process_time() - cpu
+    elapsed = time.perf_counter() - start
+
+    finished = 0
+    client_stats = {}
+    client_packets = [0, 0, 0, 0]
+    for worker in workers:
+        done, stats, packets = queue.get()
+        finished += done
+        merge_stats(client_stats, stats)
+        client_packets = [total + value for total, value in zip(client_packets, packets)]
+    for worker in workers:
+        worker.join()
+    transport.close()
+    if proxy:
+        proxy.terminate()
+
+    print("bots: {} rooms: {} finished bots: {} duration: {:.1f} s".format(parameters.bots, rooms, finished, elapsed))
+    print("server: cpu={:.2f} s ({:.1f} % of one core) ticks={} late ticks={}".format(
+        cpu, 100 * cpu / elapsed, scheduler.ticks, scheduler.late_ticks))
+    print("packets: server sent={} received={} ({:.1f} kB/s out, {:.1f} kB/s in)".format(
+        transport.packets_sent, transport.packets_received,
+        transport.bytes_sent / elapsed / 1e3, transport.bytes_received / elapsed / 1e3))
+    print("packets: clients sent={} received={}".format(*client_packets[:2]))
+    if proxy:
+        print("proxy: forwarded={} dropped={}".format(*counts[:]))
+    print("{:<6} {:<18} {:>9} {:>12} {:>8} {:>8} {:>8} {:>8}".format(
+        "to", "message", "count", "bytes/s", "p50 ms", "p90 ms", "p99 ms", "max ms"))
+    print_stats("client", client_stats, elapsed)
+    print_stats("server", codec.stats, elapsed)
@@ -0,0 +1,66 @@
+#!/usr/bin/env python
+"""
+Compares the bytes sent per tick to a client by the full state updates and by the snapshot deltas.
+
+Usage: python -m manpac.benchmarks.net_snapshot [-t TICKS] [-l LATENCY]
+"""
+from manpac.entity import Entity
+from manpac.entity_type import EntityType
+from manpac.game import Game
+from manpac.game_status import GameStatus
+from manpac.maps.map_pacman import MapPacman
+from manpac.controllers.target_seeker_controller import TargetSeekerController
+from manpac.controllers.random_walk_controller import RandomWalkController
+from manpac.controllers.net.net_codec import TextCodec, BinaryCodec
+from manpac.controllers.net.net_message import MsgSyncEntity, MsgSyncClock, MsgCompound, MsgSyncMapBoosts
+from manpac.controllers.net.net_snapshot import SnapshotHistory
+
+import argparse
+
+
+def make_game():
+    entities = [Entity(EntityType.PACMAN)] + [Entity(EntityType.GHOST) for _ in range(4)]
+    game = Game(*entities, seed=0)
+    entities[0].attach(TargetSeekerController(game))
+    for entity in entities[1:]:
+        entity.attach(RandomWalkController(game))
+    game.start(MapPacman(game))
+    for i, entity in enumerate(entities):
+        entity.uid = i
+    return game
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Benchmark the snapshot deltas.')
+    parser.add_argument('-t', '--ticks', dest='ticks',
+                        action='store', default=1000, type=int,
+                        help='maximum number of ticks played (default: 1000)')
+    parser.add_argument('-l', '--latency', dest='latency',
+                        action='store', default=5, type=int,
+                        help='number of ticks before a snapshot is acknowledged (default: 5)')
+    parameters = parser.parse_args()
+
+    game = make_game()
+    client = game.entities[1]
+    codecs = [("text", TextCodec()), ("binary", BinaryCodec())]
+    totals = {name: [0, 0] for name, codec in codecs}
+    history = SnapshotHistory()
+    ticks = 0
+    while game.status is GameStatus.ONGOING and ticks < parameters.ticks:
+        game.update(1)
+        ticks += 1
+        messages = [MsgSyncEntity(entity=e) for e in game.entities if e != client]
+        messages.append(MsgSyncClock(game.duration))
+        boosts = [[[b.loc, b.remaining_duration] for b in map_boosts]
+                  for map_boosts in [game.map.ghost_boosts, game.map.pacman_boosts]]
+        full = [MsgCompound(*messages), MsgSyncMapBoosts(*boosts)]
+        delta = history.send(history.capture(game, client))
+        history.acknowledge(history.next_snapshot - 1 - parameters.latency)
+        for name, codec in codecs:
+            totals[name][0] += sum(len(codec.encode(msg)) for msg in full)
+            totals[name][1] += len(codec.encode(delta))
+
+    print("ticks: {}, acknowledgement latency: {} ticks".format(ticks, parameters.latency))
+    print("{:<8} {:>16} {:>16} {:>8}".format("codec", "full (B/tick)", "snapshot (B/tick)", "ratio"))
+    for name, (full, delta) in totals.items():
+        print("{:<8} {:>16.1f} {:>16.1f} {:>7.1f}x".format(name, full / ticks, delta / ticks, full / delta))
@@ -0,0 +1,90 @@
+#!/usr/bin/env python
+"""
+Measures the cost of recording a game with ReplayRecorder: the time of the same seeded games
+played with and without a recorder, and the size of their recordings.
+
+Usage: python -m manpac.benchmarks.replay [-g GAMES] [-t TICKS] [-r REPEATS]
+"""
+from manpac.entity import Entity
+from manpac.entity_type import EntityType
+from manpac.game import Game
+from manpac.game_status import GameStatus
+from manpac.maps.map_pacman import MapPacman
+from manpac.map_cache import MapCache
+from manpac.controllers.random_walk_controller import RandomWalkController
+from manpac.controllers.target_seeker_controller import TargetSeekerController
+from manpac.controllers.walk_away_controller import WalkAwayController
+from manpac.replay import ReplayRecorder
+
+import argparse
+import time
+
+
+CONTROLLERS = {
+    "rw": RandomWalkController,
+    "t": TargetSeekerController,
+    "wa": lambda game: WalkAwayController(game, 10)
+}
+
+
+def make_game(controller, seed, map_cache):
+    entities = [Entity(EntityType.PACMAN)] + [Entity(EntityType.GHOST) for _ in range(4)]
+    game = Game(*entities, seed=seed)
+    entities[0].attach(TargetSeekerController(game))
+    for entity in entities[1:]:
+        entity.attach(CONTROLLERS[controller](game))
+    map = MapPacman(game)
+    map.all_pairs_paths = True
+    map.cache = map_cache
+    return game, map
+
+
+def play(controller, seed, max_ticks, record, map_cache):
+    game, map = make_game(controller, seed, map_cache)
+    recorder = ReplayRecorder(game) if record else None
+    game.start(map)
+    start = time.perf_counter()
+    while game.status is not GameStatus.FINISHED and game.duration < max_ticks:
+        game.update(1)
+    size = len(recorder.encode()) if recorder else 0
+    return time.perf_counter() - start, game.duration, size
+
+
+def measure(controller, games, max_ticks, repeats, map_cache):
+    # Each game is played with and without a recorder in turn, the best of the repeats is kept
+    plain = recorded = ticks = size = 0
+    for seed in range(games):
+        plain_times, recorded_times = [], []
+        for _ in range(repeats):
+            elapsed, duration, _ = play(controller, seed, max_ticks, False, map_cache)
+            plain_times.append(elapsed)
+            elapsed, _, game_size = play(controller, seed, max_ticks, True, map_cache)
+            recorded_times.append(elapsed)
+        plain += min(plain_times)
+        recorded += min(recorded_times)
+        ticks += duration
+        size += game_size
+    return plain / ticks, recorded / ticks, size / games
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Benchmark the recording of replays.')
+    parser.add_argument('-g', '--games', dest='games',
+                        action='store', default=20, type=int,
+                        help='number of measured games per controller (default: 20)')
+    parser.add_argument('-t', '--ticks', dest='ticks',
+                        action='store', default=5000, type=int,
+                        help='maximum number of ticks of a game (default: 5000)')
+    parser.add_argument('-r', '--repeats', dest='repeats',
+                        action='store', default=3, type=int,
+                        help='number of times each game is played, the fastest counts (default: 3)')
+    parameters = parser.parse_args()
+
+    map_cache = MapCache()
+    # Compile the map once before measuring
+    make_game("rw", 0, map_cache)[1].compile()
+    print("{:>10} {:>12} {:>14} {:>9} {:>12}".format("ghosts", "plain (us)", "recorded (us)", "overhead", "size (B)"))
+    for controller in CONTROLLERS:
+        plain, recorded, size = measure(controller, parameters.games, parameters.ticks, parameters.repeats, map_cache)
+        print("{:>10} {:>12.1f} {:>14.1f} {:>8.1%} {:>12.0f}".format(controller, plain * 1e6, recorded * 1e6,
+                                                                     recorded / plain - 1, size))
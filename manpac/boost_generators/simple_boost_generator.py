@@ -1,8 +1,9 @@
 from manpac.utils import export
 from manpac.entity_type import EntityType
-from manpac.utils.buffered_random import BufferedRandom
+from manpac.utils.buffered_random import BufferedRandom, AliasTable
 
 import numpy as np
+import math
 
 
 @export
@@ -13,7 +14,7 @@ class SimpleBoostGenerator():
     Parameters
     -----------
     - *game*: (**Game**)
-        the game this generator will be used in
+        the game this generator will be used in, it gives the random generator unless it is None
     - *boost_probability*: (**float**)
         the probability at each tick of spawning a boost
     - *ghost_modifier_factory*: (**(float, () -> AbstractModifier) list**)
@@ -25,28 +26,89 @@ class SimpleBoostGenerator():
         self.game = game
         self.boost_probability = boost_probability
         self._last_generation = 0
-        self.rand = BufferedRandom(100)
+        # The randomness of the game itself so that it does not depend on the controllers spawning theirs
+        self.rand = BufferedRandom(100, game.rng if game else None)
         self.ghost_modifier_factory = ghost_modifier_factory
         self.pacman_modifier_factory = pacman_modifier_factory
+        self._cells = None
+        self._odds = None
 
-    def _pick_boost_location_(self):
+    @property
+    def ghost_modifier_factory(self):
         """
-        Pick a boost location.
+        The (odds, factory) list of the modifiers of ghosts.
+        type: **(float, () -> AbstractModifier) list**
+        """
+        return self._ghost_modifier_factory
+
+    @ghost_modifier_factory.setter
+    def ghost_modifier_factory(self, factory):
+        self._ghost_modifier_factory = factory
+        # The alias table of its odds is built on the first pickup
+        self._ghost_modifier_odds = None
+
+    @property
+    def pacman_modifier_factory(self):
+        """
+        The (odds, factory) list of the modifiers of pacmans.
+        type: **(float, () -> AbstractModifier) list**
+        """
+        return self._pacman_modifier_factory
+
+    @pacman_modifier_factory.setter
+    def pacman_modifier_factory(self, factory):
+        self._pacman_modifier_factory = factory
+        self._pacman_modifier_odds = None
+
+    def _location_odds_(self):
+        """
+        Return the walkable cells of the map with the odds of a boost spawning on each.
+
+        Return
+        -----------
+        The flat indices of the walkable cells and their odds, None if there is no walkable cell.
+        type: (**numpy.ndarray**, **AliasTable**)
+        """
+        map = self.game.map
+        cells = map.walkable_cells
+        if self._cells is not cells:
+            # Same distribution as rejection sampling with BufferedRandom.randint which rounds:
+            # the first and last coordinates of each axis are drawn half as often
+            x, y = np.unravel_index(cells, map.terrain.shape)
+            weights = np.ones(len(cells))
+            for coordinates, bound in [(x, map.width - 1), (y, map.height - 1)]:
+                weights[coordinates == 0] *= .5
+                weights[coordinates == bound] *= .5
+            self._cells = cells
+            self._odds = AliasTable(weights) if len(cells) else None
+        return self._cells, self._odds
+
+    def _pick_boost_locations_(self, n):
+        """
+        Pick the specified number of boost locations.
+
+        Parameters
+        -----------
+        - *n*: (**int**)
+            the number of locations
 
         Return
         -----------
-        A location for a boost to spawn
-        type: **numpy.ndarray**
+        Locations for boosts to spawn
+        type: **numpy.ndarray list**
         """
-        pos = np.array([-10, -10])
-        while not self.game.map.is_walkable(pos):
-            pos[0] = self.rand.randint(0, self.game.map.width - 1)
-            pos[1] = self.rand.randint(0, self.game.map.height - 1)
-        return pos
+        if n == 0:
+            return []
+        cells, odds = self._location_odds_()
+        if len(cells) == 0:
+            return []
+        picked = self.rand.choice_batch(cells, odds, n)
+        return list(np.stack(np.unravel_index(picked, self.game.map.terrain.shape), axis=1))
 
     def generate(self, ticks):
         """
         Try to generate boosts.
+        A boost may spawn at each tick elapsed, the number of boosts is drawn at once for all of them.
 
         Parameters
         -----------
@@ -58,13 +120,16 @@ class SimpleBoostGenerator():
         A list of locations where boosts should spawn.
         type: **numpy.ndarray list**
         """
-        locations = []
         self._last_generation += ticks
-        while self._last_generation > 1:
-            if self.rand.uniform() <= self.boost_probability:
-                locations.append(self._pick_boost_location_())
-            self._last_generation -= 1
-        return locations
+        # One try for each whole tick elapsed, the remainder is kept for the next call
+        tries = max(int(math.ceil(self._last_generation - 1)), 0)
+        if tries == 0:
+            return []
+        self._last_generation -= tries
+        if tries == 1:
+            # Cheaper from the buffer than a binomial of a single try
+            return self._pick_boost_locations_(int(self.rand.uniform() <= self.boost_probability))
+        return self._pick_boost_locations_(self.rand.rng.binomial(tries, self.boost_probability))
 
     def make_modifier(self, entity, loc):
         """
@@ -82,8 +147,13 @@ class SimpleBoostGenerator():
         A modifier to give to the entity.
         type: **AbstractModifier**
         """
-        factory = self.ghost_modifier_factory
         if entity.type is EntityType.PACMAN:
-            factory = self.pacman_modifier_factory
-        odds, generator = self.rand.choice(factory, [odds for (odds, f) in factory])
+            if self._pacman_modifier_odds is None:
+                self._pacman_modifier_odds = AliasTable([odds for (odds, f) in self.pacman_modifier_factory])
+            factory, odds = self.pacman_modifier_factory, self._pacman_modifier_odds
+        else:
+            if self._ghost_modifier_odds is None:
+                self._ghost_modifier_odds = AliasTable([odds for (odds, f) in self.ghost_modifier_factory])
+            factory, odds = self.ghost_modifier_factory, self._ghost_modifier_odds
+        odds, generator = self.rand.choice(factory, odds)
         return generator()
@@ -0,0 +1,257 @@
+from manpac.utils import export
+from manpac.entity_type import EntityType
+
+import numpy as np
+import itertools
+import math
+
+
+# The kind of a slot is the entity type that picks its boost up
+_KINDS_ = [EntityType.GHOST, EntityType.PACMAN]
+_KIND_INDEX_ = {type: kind for kind, type in enumerate(_KINDS_)}
+_FREE_ = -1
+
+
+@export
+class Boost():
+    """
+    A read-only view of a boost of a BoostStore, it is the same object while the boost exists.
+    Its remaining duration is changed through the store (see BoostStore.set_remaining).
+    """
+
+    def __init__(self, store, slot, loc):
+        self._store = store
+        self.slot = slot
+        self.order = None
+        self.timer = None
+        self._loc = np.array(loc)
+        self._loc.flags.writeable = False
+
+    @property
+    def loc(self):
+        """
+        The location of this boost.
+        type: **numpy.ndarray**
+        """
+        return self._loc
+
+    @property
+    def remaining_duration(self):
+        """
+        The remaining duration of this boost in ticks, that of a ghost boost follows the clock of the timers of the store.
+        type: **float**
+        """
+        return self._store.remaining(self)
+
+    def __repr__(self):
+        return "Boost({}, {})".format(self._loc.tolist(), self.remaining_duration)
+
+
+@export
+class BoostStore():
+    """
+    The boosts of a map in arrays of slots: the location of the boost, a value and its kind.
+    The value of a ghost boost is the tick of the timers at which it expires, that of a pacman boost its remaining duration.
+    An occupancy grid aligned with the terrain counts the boosts of each kind by cell
+    so that finding the boosts an entity may pick up only looks at the cells it sweeps.
+    Boosts are handed out as Boost views which keep their identity while the boost exists.
+
+    Parameters
+    -----------
+    - *shape*: (**Tuple[int, int]**)
+        the shape of the terrain of the map
+    - *timers*: (**Timers**)
+        the timers the ghost boosts expire with
+    - *capacity*: (**int**)
+        the initial number of slots (default: 16)
+    """
+
+    def __init__(self, shape, timers, capacity=16):
+        self.shape = tuple(shape)
+        self.timers = timers
+        self.loc = np.zeros((capacity, 2), dtype=np.float64)
+        self.value = np.zeros(capacity, dtype=np.float64)
+        self.kind = np.full(capacity, _FREE_, dtype=np.int8)
+        self.grid = np.zeros((len(_KINDS_),) + self.shape, dtype=np.int32)
+        # The number of boosts of each kind by column then by row of the grid
+        self.lines = [np.zeros((len(_KINDS_), self.shape[0]), dtype=np.int32),
+                      np.zeros((len(_KINDS_), self.shape[1]), dtype=np.int32)]
+        self._boosts = [None] * capacity
+        self._free = list(range(capacity - 1, -1, -1))
+        # The boosts of each kind by order of insertion, then by cell
+        self._ordered = [{} for kind in _KINDS_]
+        self._cells = {}
+        self._counter = itertools.count()
+
+    def _grow_(self):
+        capacity = len(self._boosts)
+        self.loc = np.concatenate([self.loc, np.zeros_like(self.loc)])
+        self.value = np.concatenate([self.value, np.zeros_like(self.value)])
+        self.kind = np.concatenate([self.kind, np.full_like(self.kind, _FREE_)])
+        self._boosts += [None] * capacity
+        self._free = list(range(2 * capacity - 1, capacity - 1, -1)) + self._free
+
+    def _cell_(self, loc):
+        return (min(max(int(math.floor(loc[0])), 0), self.shape[0] - 1),
+                min(max(int(math.floor(loc[1])), 0), self.shape[1] - 1))
+
+    def count(self, type):
+        """
+        Return the number of boosts picked up by the specified entity type.
+        type: **int**
+        """
+        return len(self._ordered[_KIND_INDEX_[type]])
+
+    def boosts(self, type):
+        """
+        Return the boosts picked up by the specified entity type in the order they were added.
+
+        Return
+        -----------
+        The boosts.
+        type: **List[Boost]**
+        """
+        return list(self._ordered[_KIND_INDEX_[type]].values())
+
+    def insert(self, type, loc, duration):
+        """
+        Add a boost.
+
+        Parameters
+        -----------
+        - *type*: (**EntityType**)
+            the entity type that picks it up
+        - *loc*: (**numpy.ndarray**)
+            its location
+        - *duration*: (**float**)
+            its remaining duration, ghost boosts expire with the timers when it is over
+
+        Return
+        -----------
+        The boost.
+        type: **Boost**
+        """
+        if not self._free:
+            self._grow_()
+        slot = self._free.pop()
+        kind = _KIND_INDEX_[type]
+        boost = Boost(self, slot, loc)
+        boost.order = next(self._counter)
+        self._boosts[slot] = boost
+        self.loc[slot] = loc
+        self.kind[slot] = kind
+        if type is EntityType.GHOST:
+            boost.timer = self.timers.schedule(duration, boost)
+            self.value[slot] = boost.timer[0]
+        else:
+            self.value[slot] = duration
+        self._ordered[kind][boost.order] = boost
+        cell = self._cell_(loc)
+        self.grid[(kind,) + cell] += 1
+        self.lines[0][kind, cell[0]] += 1
+        self.lines[1][kind, cell[1]] += 1
+        self._cells.setdefault((kind,) + cell, []).append(boost)
+        return boost
+
+    def remove(self, boost):
+        """
+        Remove the specified boost, its ghost boost timer is cancelled.
+        """
+        slot = boost.slot
+        kind = int(self.kind[slot])
+        if boost.timer is not None:
+            self.timers.cancel(boost.timer)
+        del self._ordered[kind][boost.order]
+        key = (kind,) + self._cell_(self.loc[slot])
+        self.grid[key] -= 1
+        self.lines[0][kind, key[1]] -= 1
+        self.lines[1][kind, key[2]] -= 1
+        boosts = self._cells[key]
+        boosts.remove(boost)
+        if not boosts:
+            del self._cells[key]
+        self.kind[slot] = _FREE_
+        self._boosts[slot] = None
+        self._free.append(slot)
+
+    def clear(self, type):
+        """
+        Remove the boosts picked up by the specified entity type.
+        """
+        for boost in self.boosts(type):
+            self.remove(boost)
+
+    def remaining(self, boost):
+        """
+        Return the remaining duration of the specified boost.
+        type: **float**
+        """
+        if boost.timer is not None:
+            return self.timers.remaining(boost.timer)
+        return float(self.value[boost.slot])
+
+    def set_remaining(self, boost, duration):
+        """
+        Change the remaining duration of the specified boost.
+        """
+        if boost.timer is not None:
+            self.timers.cancel(boost.timer)
+            boost.timer = self.timers.schedule(duration, boost)
+            self.value[boost.slot] = boost.timer[0]
+        else:
+            self.value[boost.slot] = duration
+
+    def swept(self, type, pos, direction, reach, radius):
+        """
+        Return the boosts in the cells swept by an entity, those it may pick up, in the order they were added.
+        Besides the cells ahead, the whole line of the entity is looked at: a boost exactly aligned with it
+        is picked up even behind it.
+
+        Parameters
+        -----------
+        - *type*: (**EntityType**)
+            the type of the entity
+        - *pos*: (**numpy.ndarray**)
+            its position
+        - *direction*: (**Direction**)
+            the direction it moves in
+        - *reach*: (**float**)
+            how far ahead of its center it picks up boosts
+        - *radius*: (**float**)
+            how far aside of its center it picks up boosts
+
+        Return
+        -----------
+        The boosts that may be picked up.
+        type: **List[Boost]**
+        """
+        kind = _KIND_INDEX_[type]
+        if not self._ordered[kind]:
+            return []
+        # The axis of the movement and the one across it, a boost in cell c has its center in [c + .5, c + 1.5)
+        axis = 0 if direction.vector[0] != 0 else 1
+        side = 1 - axis
+        if direction.vector[axis] > 0:
+            start, stop = math.floor(pos[axis] - .5), math.floor(pos[axis] - .5 + reach)
+        else:
+            start, stop = math.floor(pos[axis] - .5 - reach), math.floor(pos[axis] - .5)
+        start, stop = max(start, 0), min(stop, self.shape[axis] - 1)
+        low = max(math.floor(pos[side] - radius - .5), 0)
+        high = min(math.floor(pos[side] + radius - .5), self.shape[side] - 1)
+        cells = self._cells
+        keys = []
+        for i in range(start, stop + 1):
+            for j in range(low, high + 1):
+                key = (kind, i, j) if axis == 0 else (kind, j, i)
+                if key in cells:
+                    keys.append(key)
+        line = math.floor(pos[side] - .5)
+        if 0 <= line < self.shape[side] and self.lines[side][kind, line]:
+            grid = self.grid[kind, :, line] if side == 1 else self.grid[kind, line, :]
+            for i in np.flatnonzero(grid):
+                if not start <= i <= stop:
+                    keys.append((kind, i, line) if axis == 0 else (kind, line, i))
+        boosts = [boost for key in keys for boost in cells[key]]
+        if len(keys) > 1:
+            boosts.sort(key=lambda boost: boost.order)
+        return boosts
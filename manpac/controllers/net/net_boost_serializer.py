@@ -30,3 +30,28 @@ def parse(text, game):
         return SpeedModifier(game, float(data[0]), float(data[1]))
     elif identifier == "sw":
         return SwapModifier(game, float(data[0]), float(data[1]))
+
+
+@export
+def to_fields(boost):
+    if isinstance(boost, GhostBlockModifier):
+        return 0, boost.remaining_duration, 0
+    elif isinstance(boost, IntangibleModifier):
+        return 1, boost.remaining_duration, 0
+    elif isinstance(boost, SpeedModifier):
+        return 2, boost.remaining_duration, boost.speed_multiplier
+    elif isinstance(boost, SwapModifier):
+        return 3, boost.range, boost.remaining_duration
+
+
+@export
+def from_fields(fields, game):
+    kind, first, second = fields
+    if kind == 0:
+        return GhostBlockModifier(game, first)
+    elif kind == 1:
+        return IntangibleModifier(game, first)
+    elif kind == 2:
+        return SpeedModifier(game, first, second)
+    elif kind == 3:
+        return SwapModifier(game, first, second)
@@ -0,0 +1,226 @@
+from manpac.utils import export
+
+import struct
+import time
+
+
+# Lanes of a packet
+UNRELIABLE = 0
+RELIABLE = 1
+# A packet that only carries acknowledgements
+ACK = 2
+
+_HEADER_ = struct.Struct("<IIIB")
+_RELIABLE_ = struct.Struct("<I")
+_ACK_BITS_ = 32
+_MASK_ = 2**_ACK_BITS_ - 1
+
+
+@export
+class NetChannel():
+    """
+    The packets exchanged with one peer over UDP.
+    Each packet has a sequence number and acknowledges the last packet received from the peer along with a bitfield
+    of the 32 before it, so acknowledgements ride on the regular traffic.
+    Messages go in one of two lanes: unreliable ones are sent once and the receiver drops those older than the last
+    one of the same kind it got, reliable ones are sent again until acknowledged and delivered in order.
+    Reliable messages are sent again after a timeout computed from the round trip time as TCP does.
+
+    Parameters
+    -----------
+    - *loop*: (**asyncio.AbstractEventLoop**)
+        the event loop the channel is used from
+    - *send*: (**bytes -> None**)
+        send a packet to the peer
+    - *min_timeout*: (**float**)
+        the minimum delay in seconds before a reliable message is sent again (default: .05)
+    - *max_timeout*: (**float**)
+        the maximum delay in seconds before a reliable message is sent again (default: 2)
+    - *ack_delay*: (**float**)
+        the delay in seconds after which a reliable message received is acknowledged
+        by a packet of its own if nothing was sent in between (default: .02)
+    """
+
+    def __init__(self, loop, send, min_timeout=.05, max_timeout=2, ack_delay=.02):
+        self.loop = loop
+        self._send_ = send
+        self.min_timeout = min_timeout
+        self.max_timeout = max_timeout
+        self.ack_delay = ack_delay
+        self.closed = False
+
+        # Sending
+        self.next_seq = 0
+        # Send time and reliable number of the packets not acknowledged yet by sequence number
+        self.sent = {}
+        self.next_reliable = 0
+        # Reliable messages not acknowledged yet by number
+        self.unacked = {}
+        # Round trip time estimation
+        self.srtt = None
+        self.rttvar = None
+        self.timeout = .2
+
+        # Receiving
+        self.remote_seq = -1
+        self.received_bits = 0
+        self.next_delivered = 0
+        # Reliable messages received ahead of the next to be delivered by number
+        self.pending = {}
+        # Sequence number of the last unreliable message by kind
+        self.latest = {}
+        self._ack_scheduled = False
+        self._sent_since_ack = False
+
+    @property
+    def rtt(self):
+        """
+        The smoothed round trip time in seconds, None until a packet is acknowledged.
+        type: **float**
+        """
+        return self.srtt
+
+    def _packet_(self, lane, payload=b"", reliable=None):
+        seq = self.next_seq
+        self.next_seq += 1
+        self.sent[seq] = (time.perf_counter(), reliable)
+        # Packets not acknowledged in time are lost, reliable ones are sent again in a new packet
+        self.sent.pop(seq - 4 * _ACK_BITS_, None)
+        self._sent_since_ack = True
+        header = _HEADER_.pack(seq, self.remote_seq & 0xFFFFFFFF, self.received_bits, lane)
+        if reliable is not None:
+            header += _RELIABLE_.pack(reliable)
+        return header + payload
+
+    def send(self, payload, reliable=False):
+        """
+        Send the specified encoded message.
+
+        Parameters
+        -----------
+        - *payload*: (**bytes**)
+            the encoded message
+        - *reliable*: (**bool**)
+            whether it is sent in the reliable lane
+        """
+        if self.closed:
+            return
+        if not reliable:
+            self._send_(self._packet_(UNRELIABLE, payload))
+            return
+        number = self.next_reliable
+        self.next_reliable += 1
+        self.unacked[number] = payload
+        self._send_reliable_(number, self.timeout)
+
+    def _send_reliable_(self, number, timeout):
+        if self.closed or number not in self.unacked:
+            return
+        self._send_(self._packet_(RELIABLE, self.unacked[number], number))
+        self.loop.call_later(timeout, self._send_reliable_, number, min(2 * timeout, self.max_timeout))
+
+    def _acknowledge_(self, seq, now):
+        sent = self.sent.pop(seq, None)
+        if sent is None:
+            return
+        sent_time, reliable = sent
+        if reliable is not None:
+            self.unacked.pop(reliable, None)
+        rtt = now - sent_time
+        if self.srtt is None:
+            self.srtt = rtt
+            self.rttvar = rtt / 2
+        else:
+            self.rttvar = .75 * self.rttvar + .25 * abs(self.srtt - rtt)
+            self.srtt = .875 * self.srtt + .125 * rtt
+        self.timeout = min(max(self.srtt + 4 * self.rttvar, self.min_timeout), self.max_timeout)
+
+    def _is_new_(self, seq):
+        # Update the acknowledgements to send and tell whether the packet was not received before
+        if seq > self.remote_seq:
+            shift = seq - self.remote_seq
+            if self.remote_seq >= 0:
+                self.received_bits = ((self.received_bits << shift) | (1 << (shift - 1))) & _MASK_ \
+                    if shift <= _ACK_BITS_ else 0
+            self.remote_seq = seq
+            return True
+        if seq == self.remote_seq:
+            return False
+        bit = 1 << (self.remote_seq - seq - 1)
+        if self.remote_seq - seq > _ACK_BITS_ or self.received_bits & bit:
+            # Too old to tell, only reliable messages can still be new
+            return self.remote_seq - seq > _ACK_BITS_
+        self.received_bits |= bit
+        return True
+
+    def receive(self, packet):
+        """
+        Handle the specified packet received from the peer.
+
+        Parameters
+        -----------
+        - *packet*: (**bytes**)
+            the packet
+
+        Return
+        -----------
+        The messages to deliver as (payload, seq) where seq is the sequence number of the packet
+        for unreliable messages (see is_latest) and None for reliable ones.
+        type: **List[Tuple[bytes, int]]**
+        """
+        seq, ack, ack_bits, lane = _HEADER_.unpack_from(packet)
+        now = time.perf_counter()
+        if ack != 0xFFFFFFFF:
+            self._acknowledge_(ack, now)
+            for i in range(_ACK_BITS_):
+                if ack_bits & (1 << i):
+                    self._acknowledge_(ack - 1 - i, now)
+        new = self._is_new_(seq)
+        payload = bytes(packet[_HEADER_.size:])
+        if lane == UNRELIABLE:
+            return [(payload, seq)] if new and self.remote_seq - seq <= _ACK_BITS_ else []
+        if lane != RELIABLE:
+            return []
+        number, = _RELIABLE_.unpack_from(payload)
+        # Acknowledge it even if it was received before, the previous acknowledgement may have been lost
+        self._schedule_ack_()
+        if number >= self.next_delivered:
+            self.pending[number] = payload[_RELIABLE_.size:]
+        delivered = []
+        while self.next_delivered in self.pending:
+            delivered.append((self.pending.pop(self.next_delivered), None))
+            self.next_delivered += 1
+        return delivered
+
+    def is_latest(self, kind, seq):
+        """
+        Return whether the unreliable message of the specified kind in the packet of the specified
+        sequence number is newer than any other of this kind received, it is then the latest.
+        """
+        if seq < self.latest.get(kind, -1):
+            return False
+        self.latest[kind] = seq
+        return True
+
+    def _schedule_ack_(self):
+        self._sent_since_ack = False
+        if not self._ack_scheduled:
+            self._ack_scheduled = True
+            self.loop.call_later(self.ack_delay, self._flush_ack_)
+
+    def _flush_ack_(self):
+        self._ack_scheduled = False
+        if not self._sent_since_ack:
+            self.flush()
+
+    def flush(self):
+        """
+        Send the acknowledgements now.
+        """
+        self._send_(self._packet_(ACK))
+
+    def close(self):
+        """
+        Stop sending the reliable messages.
+        """
+        self.closed = True
@@ -1,25 +1,32 @@
 from manpac.utils.export_decorator import export
 from manpac.game_status import GameStatus
 from manpac.controllers.abstract_controller import AbstractController
-from manpac.controllers.net.net_message import parse, \
+from manpac.controllers.net.net_codec import TextCodec
+from manpac.controllers.net.net_snapshot import SnapshotHistory
+from manpac.controllers.net.net_transport import NetTransport
+from manpac.controllers.net.net_prediction import InputHistory, InterpolationBuffer, apply_input
+from manpac.controllers.net.net_message import \
     MsgJoin, MsgResult, MsgSyncMap, MsgSyncEntity, MsgSyncClock, MsgSyncMapBoosts, \
     MsgEndGame, MsgBoostPickup, MsgYourEntity, MsgStartGame, MsgBoostUse, \
-    MsgSyncModifiers
+    MsgSyncModifiers, MsgSnapshot, MsgSnapshotAck, MsgInputAck
 
-import socket
+from concurrent.futures import TimeoutError
 import threading
-import time
 
 
-def _callback_result_(net_client_controller, msg, socket):
+def _callback_result_(net_client_controller, msg, transport):
     net_client_controller.has_result = True
     net_client_controller.has_ok = msg.result
+    transport.resolve(None, msg.result)
 
 
-def _callback_sync_entity_(net_client_controller, msg, socket):
+def _callback_sync_entity_(net_client_controller, msg, transport):
     entity = net_client_controller.game.entities[msg.ent_uid]
-    # Update relevant entity
-    entity.teleport(msg.pos)
+    # Update relevant entity, the others are moved once the tick of their position is known
+    if entity == net_client_controller.entity:
+        entity.teleport(msg.pos)
+    else:
+        net_client_controller.frame[msg.ent_uid] = msg.pos.copy()
     entity.face(msg.direction)
     entity.uid = msg.ent_uid
     if not msg.alive:
@@ -32,35 +39,66 @@ def _callback_sync_entity_(net_client_controller, msg, socket):
         net_client_controller._send_message_(MsgResult(True))
 
 
-def _callback_sync_map_(net_client_controller, msg, socket):
+def _callback_snapshot_(net_client_controller, msg, transport):
+    received = net_client_controller.snapshots.receive(msg)
+    # Without its baseline it can not be used, the server will send another one
+    if received is None:
+        return
+    net_client_controller._send_message_(MsgSnapshotAck(msg.snapshot))
+    snapshot, newer = received
+    if not newer:
+        return
+    snapshot.restore(net_client_controller.game, net_client_controller.entity, positions=False,
+                     previous=net_client_controller.restored)
+    net_client_controller.restored = snapshot
+    positions = snapshot.positions()
+    positions.pop(net_client_controller.entity.uid, None)
+    net_client_controller.frame.update(positions)
+    net_client_controller.ticks_since_last_upd = 0
+    _callback_sync_clock_(net_client_controller, MsgSyncClock(snapshot.ticks), transport)
+
+
+def _callback_sync_map_(net_client_controller, msg, transport):
     net_client_controller.terrain = msg.terrain
     net_client_controller._send_message_(MsgResult(True))
     net_client_controller.has_map = True
+    net_client_controller._map_received.set()
 
 
-def _callback_sync_clock_(net_client_controller, msg, socket):
+def _callback_sync_clock_(net_client_controller, msg, transport):
     net_client_controller.game.duration += net_client_controller.net_ticks
     net_client_controller.net_ticks = msg.ticks - net_client_controller.game.duration
+    # The positions received before are those at this tick
+    if net_client_controller.frame:
+        with net_client_controller._lock:
+            net_client_controller.interpolation.push(msg.ticks, net_client_controller.frame,
+                                                     net_client_controller.game.duration)
+        net_client_controller.frame = {}
+
 
+def _callback_input_ack_(net_client_controller, msg, transport):
+    with net_client_controller._lock:
+        net_client_controller.inputs.reconcile(net_client_controller.game.map, net_client_controller.entity, msg)
 
-def _callback_sync_map_boosts_(net_client_controller, msg, socket):
+
+def _callback_sync_map_boosts_(net_client_controller, msg, transport):
     if net_client_controller.game.map:
         net_client_controller.game.map.ghost_boosts = msg.ghost_boosts
         net_client_controller.game.map.pacman_boosts = msg.pacman_boosts
 
 
-def _callback_end_game_(net_client_controller, msg, socket):
+def _callback_end_game_(net_client_controller, msg, transport):
     net_client_controller.remote_game_status = GameStatus.FINISHED
     net_client_controller.game.status = GameStatus.FINISHED
 
 
-def _callback_boost_pickup_(net_client_controller, msg, socket):
+def _callback_boost_pickup_(net_client_controller, msg, transport):
     msg.parse_boost(net_client_controller.game)
     entity = net_client_controller.game.entities[msg.ent_uid]
     entity.pickup(msg.boost)
 
 
-def _callback_your_entity_(net_client_controller, msg, socket):
+def _callback_your_entity_(net_client_controller, msg, transport):
     my_uid = 1 - net_client_controller.entity.uid
     desired_uid = msg.ent_uid
     if my_uid != desired_uid:
@@ -74,18 +112,18 @@ def _callback_your_entity_(net_client_controller, msg, socket):
     net_client_controller.controller.on_attach(net_client_controller.entity)
 
 
-def _callback_start_game_(net_client_controller, msg, socket):
+def _callback_start_game_(net_client_controller, msg, transport):
     net_client_controller.remote_game_status = GameStatus.ONGOING
     if net_client_controller.ready_to_start:
         net_client_controller.game.status = GameStatus.ONGOING
 
 
-def _callback_boost_use_(net_client_controller, msg, socket):
+def _callback_boost_use_(net_client_controller, msg, transport):
     entity = net_client_controller.game.entities[msg.ent_uid]
     entity.use_modifier()
 
 
-def _callback_sync_modifiers_(net_client_controller, msg, socket):
+def _callback_sync_modifiers_(net_client_controller, msg, transport):
     msg.parse_boost(net_client_controller.game)
     entity = net_client_controller.game.entities[msg.ent_uid]
     entity.modifiers = msg.modifiers
@@ -103,6 +141,8 @@ _CALLBACKS_ = {
     MsgStartGame.uid: _callback_start_game_,
     MsgBoostUse.uid: _callback_boost_use_,
     MsgSyncModifiers.uid: _callback_sync_modifiers_,
+    MsgSnapshot.uid: _callback_snapshot_,
+    MsgInputAck.uid: _callback_input_ack_,
 }
 
 
@@ -110,6 +150,8 @@ _CALLBACKS_ = {
 class NetClientController(AbstractController):
     """
     A controller that is a client to a remote server.
+    Its entity is moved right away then corrected when the server disagrees,
+    the other entities are interpolated between the positions sent by the server.
 
     Parameters
     -----------
@@ -119,16 +161,27 @@ class NetClientController(AbstractController):
         the host ip
     - *port*: (**int**)
         the port of the host
+    - *codec*: (**TextCodec**)
+        the codec of the messages, the server must use the same (default: TextCodec)
     """
 
-    def __init__(self, controller, host="127.0.0.1", port=9999):
+    def __init__(self, controller, host="127.0.0.1", port=9999, codec=None):
         super(NetClientController, self).__init__(controller.game)
-
-        self.socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
-        self.buffer_size = 4096
+        self.codec = codec or TextCodec()
+        self.snapshots = SnapshotHistory()
+        # Last snapshot restored into the game
+        self.restored = None
+        self.inputs = InputHistory()
+        self.interpolation = InterpolationBuffer()
+        # Positions of the other entities received since the last clock sync by uid
+        self.frame = {}
+        self._lock = threading.Lock()
+
+        self.transport = NetTransport(self.codec, self._on_message_)
         self.controller = controller
 
         self.has_map = False
+        self._map_received = threading.Event()
         self.remote_game_status = GameStatus.NOT_STARTED
         self.ready_to_start = False
 
@@ -147,37 +200,33 @@ class NetClientController(AbstractController):
         for i, entity in enumerate(self.game.entities):
             entity.uid = -(i + 1)
 
-        # Bind socket
-        ret_code = self.socket.connect_ex((self.host, self.port))
-        if not ret_code == 0:
+        # Bind socket and start listening
+        try:
+            self.transport.open(remote_address=(self.host, self.port))
+        except OSError as error:
             print("Failed to connect to: host=", self.host, "port=", self.port)
-            print("Error code=", ret_code)
+            print("Error=", error)
             exit()
 
-        # Start listening
-        listen_thread = threading.Thread(target=self._listen_)
-        listen_thread.daemon = True
-        listen_thread.start()
         # Ask to join
-        result = self._notify_(MsgJoin(self.entity.type))
+        try:
+            result = self._notify_(MsgJoin(self.entity.type)).result()
+        except TimeoutError:
+            result = False
         if not result:
             print("Could not join, no room for", entity.type)
             exit()
 
-    def _listen_(self):
-        while not self.socket._closed:
-            data = self.socket.recv(self.buffer_size)
-            msg = parse(data)
-            if msg.compound:
-                for msg in msg.messages:
-                    _CALLBACKS_[msg.uid](self, msg, self.socket)
-            else:
-                _CALLBACKS_[msg.uid](self, msg, self.socket)
+    def _on_message_(self, msg, server_address):
+        if msg.compound:
+            for msg in msg.messages:
+                _CALLBACKS_[msg.uid](self, msg, self.transport)
+        else:
+            _CALLBACKS_[msg.uid](self, msg, self.transport)
 
     def on_game_start(self):
         # Wait for the map
-        while not self.has_map:
-            time.sleep(.02)
+        self._map_received.wait()
         # Update local map
         self.game.map.terrain = self.terrain
         self.game.map.boost_generator = None
@@ -195,16 +244,23 @@ class NetClientController(AbstractController):
             self.game._fired_end = False
             self.game.status = GameStatus.ONGOING
             return
-        self.socket.close()
+        self.transport.close()
         self.controller.on_game_end()
 
     def _notify_(self, msg):
-        self.has_result = False
-        self.has_ok = False
-        while not self.has_result:
-            self._send_message_(msg)
-            time.sleep(.1)
-        return self.has_ok
+        """
+        Send the specified NetMessage until the server answers it.
+        Parameters
+        -----------
+        - *msg*: (**NetMessage**)
+            the message to be sent
+
+        Return
+        -----------
+        A future of the result answered.
+        type: **concurrent.futures.Future**
+        """
+        return self.transport.request(msg, tick=self.game.duration)
 
     def _send_message_(self, msg):
         """
@@ -214,10 +270,10 @@ class NetClientController(AbstractController):
         - *msg*: (**NetMessage**)
             the message to be sent
         """
-        if self.socket._closed:
+        if self.transport.closed:
             self.entity.alive = False
             return
-        self.socket.sendall(msg.bytes())
+        self.transport.send(msg, tick=self.game.duration)
 
     def on_boost_use(self):
         self.controller.on_boost_use()
@@ -228,15 +284,22 @@ class NetClientController(AbstractController):
         if self.ticks_since_last_upd >= self.max_ticks_in_advance:
             return
 
-        # Trigger update of controller if alive
+        # Trigger update of controller if alive and send where it went, the server moves the entity the same way
         if self.entity.alive:
-            self.controller.update(ticks)
-            self._send_message_(MsgSyncEntity(entity=self.entity))
-        # If more than on tick since last update then emulate movement
-        if self.ticks_since_last_upd > 0:
-            for entity in self.game.entities:
-                if entity != self.entity:
-                    self.game.map.move(entity, ticks)
+            with self._lock:
+                before = self.entity.pos.copy()
+                self.controller.update(ticks)
+                self.entity.teleport(before)
+                apply_input(self.game.map, self.entity, ticks, self.entity.direction, self.entity.moving, pickup=False)
+                msg = self.inputs.record(self.entity, ticks)
+            self._send_message_(msg)
+        # Show the other entities between the last positions received
+        with self._lock:
+            positions = self.interpolation.sample(self.game.duration)
+        for uid, pos in positions.items():
+            entity = self.game.entities[uid]
+            if entity != self.entity:
+                entity.teleport(pos)
 
         self.ticks_since_last_upd += ticks
 
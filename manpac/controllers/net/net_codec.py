@@ -0,0 +1,74 @@
+from manpac.utils import export
+from manpac.controllers.net.net_message import parse, unpack
+
+import itertools
+import struct
+
+
+@export
+class TextCodec():
+    """
+    Encode messages in their original ASCII text form.
+    """
+    def encode(self, msg, tick=0):
+        """
+        Encode the specified message.
+
+        Parameters
+        -----------
+        - *msg*: (**NetMessage**)
+            the message to be encoded
+        - *tick*: (**float**)
+            the game tick at which the message is sent, unused by this codec
+
+        Return
+        -----------
+        The encoded message.
+        type: **bytes**
+        """
+        return msg.bytes()
+
+    def decode(self, data):
+        """
+        Decode the specified data.
+
+        Parameters
+        -----------
+        - *data*: (**bytes**)
+            the encoded message
+
+        Return
+        -----------
+        The decoded message.
+        type: **NetMessage**
+        """
+        return parse(data)
+
+
+@export
+class BinaryCodec(TextCodec):
+    """
+    Encode messages in a compact binary form.
+    Each message starts with a fixed header: the codec version, the message uid, a sequence number and the game tick,
+    then follows the fixed-width content of the message (see NetMessage.pack).
+    Decoded messages have their sequence number and tick in their *seq* and *tick* attributes.
+    """
+    version = 1
+    header = struct.Struct("<BBId")
+
+    def __init__(self):
+        # Sequence number of the next message sent
+        self._sequence = itertools.count()
+
+    def encode(self, msg, tick=0):
+        seq = next(self._sequence) & 0xFFFFFFFF
+        return self.header.pack(self.version, msg.uid, seq, tick) + msg.pack()
+
+    def decode(self, data):
+        version, uid, seq, tick = self.header.unpack_from(data)
+        if version != self.version:
+            raise ValueError("unsupported binary codec version: {}".format(version))
+        msg = unpack(uid, memoryview(data)[self.header.size:])
+        msg.seq = seq
+        msg.tick = tick
+        return msg
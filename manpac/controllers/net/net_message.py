@@ -5,6 +5,40 @@ import manpac.controllers.net.net_boost_serializer as boost_serializer
 
 from abc import ABC
 import numpy as np
+import struct
+
+
+_ENTITY_TYPES_ = list(EntityType)
+_DIRECTIONS_ = {direction.value: direction for direction in Direction}
+
+_BOOL_ = struct.Struct("<?")
+_INT_ = struct.Struct("<i")
+_DOUBLE_ = struct.Struct("<d")
+_SHAPE_ = struct.Struct("<II")
+_ENTITY_ = struct.Struct("<ddB?i")
+_COUNTS_ = struct.Struct("<II")
+_PART_ = struct.Struct("<BI")
+_BOOST_FIELDS_ = struct.Struct("<Bdd")
+_MAP_BOOST_ = np.dtype([("x", "<i4"), ("y", "<i4"), ("duration", "<f8")])
+_SNAPSHOT_ = struct.Struct("<IBf")
+_COUNT_ = struct.Struct("<H")
+_ENTITY_CHANGE_ = struct.Struct("<BB")
+_MAX_SNAPSHOT_UID_ = 2**8
+_POSITION_ = struct.Struct("<ii")
+_POSITION_DELTA_ = struct.Struct("<hh")
+_POSITION_SMALL_DELTA_ = struct.Struct("<bb")
+_SNAPSHOT_BOOST_ = struct.Struct("<Bhhi")
+_INPUT_ = struct.Struct("<iddB")
+_INPUTS_ = struct.Struct("<iB")
+_INPUT_ENTRY_ = struct.Struct("<dBB")
+
+# Fields of an entity change in a snapshot
+SNAPSHOT_POSITION = 1
+SNAPSHOT_DIRECTION = 2
+SNAPSHOT_ALIVE = 4
+# The position is a difference with the baseline small enough to fit in 16 or 8 bits
+SNAPSHOT_POSITION_DELTA = 8
+SNAPSHOT_POSITION_SMALL_DELTA = 16
 
 
 @export
@@ -18,13 +52,26 @@ def parse(message):
     return _MESSAGES_[uid].from_string(s[i+1:])
 
 
+@export
+def unpack(uid, buffer):
+    return _MESSAGES_[uid].unpack(buffer)
+
+
 class NetMessage(ABC):
     uid = 0
     compound = False
+    # Sent in the reliable lane of a NetChannel: in order and again until acknowledged
+    reliable = False
 
     def __repr__(self):
         return str(self)
 
+    def key(self):
+        """
+        Kind of this message, an unreliable one is dropped if another of the same kind sent after it was received.
+        """
+        return self.uid
+
     def __str__(self):
         return "{}:".format(self.uid)
 
@@ -35,6 +82,17 @@ class NetMessage(ABC):
     def bytes(self):
         return bytes(str(self), 'ascii')
 
+    def pack(self):
+        """
+        Binary form of the content of this message, see BinaryCodec.
+        type: **bytes**
+        """
+        return b""
+
+    @classmethod
+    def unpack(cls, buffer):
+        return cls()
+
 
 @export
 class MsgJoin(NetMessage):
@@ -53,6 +111,13 @@ class MsgJoin(NetMessage):
             return MsgJoin(EntityType.GHOST)
         return MsgJoin(EntityType.PACMAN)
 
+    def pack(self):
+        return bytes([_ENTITY_TYPES_.index(self.type)])
+
+    @classmethod
+    def unpack(cls, buffer):
+        return MsgJoin(_ENTITY_TYPES_[buffer[0]])
+
 
 @export
 class MsgResult(NetMessage):
@@ -69,6 +134,13 @@ class MsgResult(NetMessage):
     def from_string(cls, string):
         return MsgResult(string[0] == "t")
 
+    def pack(self):
+        return _BOOL_.pack(self.result)
+
+    @classmethod
+    def unpack(cls, buffer):
+        return MsgResult(_BOOL_.unpack_from(buffer)[0])
+
 
 @export
 class MsgSyncMap(NetMessage):
@@ -93,6 +165,15 @@ class MsgSyncMap(NetMessage):
                 terrain[x, y] = int(el)
         return MsgSyncMap(terrain)
 
+    def pack(self):
+        return _SHAPE_.pack(*self.terrain.shape) + self.terrain.astype(np.uint8).tobytes()
+
+    @classmethod
+    def unpack(cls, buffer):
+        shape = _SHAPE_.unpack_from(buffer)
+        cells = np.frombuffer(buffer, dtype=np.uint8, offset=_SHAPE_.size, count=shape[0] * shape[1])
+        return MsgSyncMap(cells.reshape(shape).astype(np.int64))
+
 
 @export
 class MsgSyncEntity(NetMessage):
@@ -116,6 +197,9 @@ class MsgSyncEntity(NetMessage):
         end = "t" if self.alive else "f"
         return "{}:{}/{}/{}/{}".format(self.uid, t, self.direction.value, end, self.ent_uid)
 
+    def key(self):
+        return self.uid, self.ent_uid
+
     @classmethod
     def from_string(cls, string):
         parts = string.replace("[", "").replace("]", "").split("/")
@@ -123,6 +207,14 @@ class MsgSyncEntity(NetMessage):
         direction = [d for d in Direction if d.value == int(parts[1])][0]
         return MsgSyncEntity(pos=pos, direction=direction, alive=parts[2] == "t", uid=int(parts[3]))
 
+    def pack(self):
+        return _ENTITY_.pack(self.pos[0], self.pos[1], self.direction.value, self.alive, self.ent_uid)
+
+    @classmethod
+    def unpack(cls, buffer):
+        x, y, direction, alive, uid = _ENTITY_.unpack_from(buffer)
+        return MsgSyncEntity(pos=np.array([x, y], dtype=np.float64), direction=_DIRECTIONS_[direction], alive=alive, uid=uid)
+
 
 @export
 class MsgSyncClock(NetMessage):
@@ -138,6 +230,13 @@ class MsgSyncClock(NetMessage):
     def from_string(cls, string):
         return MsgSyncClock(float(string))
 
+    def pack(self):
+        return _DOUBLE_.pack(self.ticks)
+
+    @classmethod
+    def unpack(cls, buffer):
+        return MsgSyncClock(_DOUBLE_.unpack_from(buffer)[0])
+
 
 @export
 class MsgCompound(NetMessage):
@@ -155,6 +254,27 @@ class MsgCompound(NetMessage):
     def from_string(cls, string):
         return MsgCompound(*[parse(s) for s in string.split("@")])
 
+    def pack(self):
+        # Each part is its uid, its length and its content
+        parts = [_INT_.pack(len(self.messages))]
+        for message in self.messages:
+            content = message.pack()
+            parts.append(_PART_.pack(message.uid, len(content)))
+            parts.append(content)
+        return b"".join(parts)
+
+    @classmethod
+    def unpack(cls, buffer):
+        buffer = memoryview(buffer)
+        messages = []
+        offset = _INT_.size
+        for i in range(_INT_.unpack_from(buffer)[0]):
+            uid, length = _PART_.unpack_from(buffer, offset)
+            offset += _PART_.size
+            messages.append(unpack(uid, buffer[offset:offset + length]))
+            offset += length
+        return MsgCompound(*messages)
+
 
 @export
 class MsgSyncMapBoosts(NetMessage):
@@ -188,20 +308,37 @@ class MsgSyncMapBoosts(NetMessage):
             pacmans.append(parsed)
         return MsgSyncMapBoosts(ghosts, pacmans)
 
+    def pack(self):
+        boosts = np.zeros(len(self.ghost_boosts) + len(self.pacman_boosts), dtype=_MAP_BOOST_)
+        for i, (loc, duration) in enumerate(self.ghost_boosts + self.pacman_boosts):
+            boosts[i] = (loc[0], loc[1], duration)
+        return _COUNTS_.pack(len(self.ghost_boosts), len(self.pacman_boosts)) + boosts.tobytes()
+
+    @classmethod
+    def unpack(cls, buffer):
+        ghosts, pacmans = _COUNTS_.unpack_from(buffer)
+        boosts = np.frombuffer(buffer, dtype=_MAP_BOOST_, offset=_COUNTS_.size, count=ghosts + pacmans)
+        locs = np.stack([boosts["x"], boosts["y"]], axis=1).astype(np.int64)
+        parsed = [[loc, duration] for loc, duration in zip(locs, boosts["duration"].tolist())]
+        return MsgSyncMapBoosts(parsed[:ghosts], parsed[ghosts:])
+
 
 @export
 class MsgEndGame(NetMessage):
     uid = 8
+    reliable = True
 
 
 @export
 class MsgBoostPickup(NetMessage):
     uid = 9
+    reliable = True
 
     def __init__(self, ent_uid, boost):
         self.ent_uid = ent_uid
         self.boost = boost
-        self.boost_parsed = not isinstance(self.boost, str)
+        # A boost is received either as text or as binary fields
+        self.boost_parsed = not isinstance(self.boost, (str, tuple))
 
     def __str__(self):
         return "{}:{}/{}".format(self.uid, self.ent_uid, boost_serializer.serialize(self.boost))
@@ -209,7 +346,10 @@ class MsgBoostPickup(NetMessage):
     def parse_boost(self, game):
         if self.boost_parsed:
             return
-        self.boost = boost_serializer.parse(self.boost, game)
+        if isinstance(self.boost, tuple):
+            self.boost = boost_serializer.from_fields(self.boost, game)
+        else:
+            self.boost = boost_serializer.parse(self.boost, game)
         self.boost_parsed = True
 
     @classmethod
@@ -217,10 +357,18 @@ class MsgBoostPickup(NetMessage):
         data = string.split("/")
         return MsgBoostPickup(int(data[0]), data[1])
 
+    def pack(self):
+        return _INT_.pack(self.ent_uid) + _BOOST_FIELDS_.pack(*boost_serializer.to_fields(self.boost))
+
+    @classmethod
+    def unpack(cls, buffer):
+        return MsgBoostPickup(_INT_.unpack_from(buffer)[0], _BOOST_FIELDS_.unpack_from(buffer, _INT_.size))
+
 
 @export
 class MsgYourEntity(NetMessage):
     uid = 10
+    reliable = True
 
     def __init__(self, ent_uid):
         self.ent_uid = ent_uid
@@ -232,15 +380,24 @@ class MsgYourEntity(NetMessage):
     def from_string(cls, string):
         return MsgYourEntity(int(string))
 
+    def pack(self):
+        return _INT_.pack(self.ent_uid)
+
+    @classmethod
+    def unpack(cls, buffer):
+        return MsgYourEntity(_INT_.unpack_from(buffer)[0])
+
 
 @export
 class MsgStartGame(NetMessage):
     uid = 11
+    reliable = True
 
 
 @export
 class MsgBoostUse(NetMessage):
     uid = 12
+    reliable = True
 
     def __init__(self, ent_uid):
         self.ent_uid = ent_uid
@@ -252,15 +409,23 @@ class MsgBoostUse(NetMessage):
     def from_string(cls, string):
         return MsgBoostUse(int(string))
 
+    def pack(self):
+        return _INT_.pack(self.ent_uid)
+
+    @classmethod
+    def unpack(cls, buffer):
+        return MsgBoostUse(_INT_.unpack_from(buffer)[0])
+
 
 @export
 class MsgSyncModifiers(NetMessage):
     uid = 13
+    reliable = True
 
     def __init__(self,  ent_uid, modifiers):
         self.ent_uid = ent_uid
         self.modifiers = modifiers
-        self.boost_parsed = not self.modifiers or not isinstance(self.modifiers[0], str)
+        self.boost_parsed = not self.modifiers or not isinstance(self.modifiers[0], (str, tuple))
 
     def __str__(self):
         b = "@".join([boost_serializer.serialize(boost) for boost in self.modifiers])
@@ -269,7 +434,10 @@ class MsgSyncModifiers(NetMessage):
     def parse_boost(self, game):
         if self.boost_parsed:
             return
-        self.modifiers = [boost_serializer.parse(boost, game) for boost in self.modifiers]
+        if isinstance(self.modifiers[0], tuple):
+            self.modifiers = [boost_serializer.from_fields(boost, game) for boost in self.modifiers]
+        else:
+            self.modifiers = [boost_serializer.parse(boost, game) for boost in self.modifiers]
         self.modifiers = [b for b in self.modifiers if b]
         self.boost_parsed = True
 
@@ -278,6 +446,202 @@ class MsgSyncModifiers(NetMessage):
         data = string.split("/")
         return MsgSyncModifiers(int(data[0]), data[1].split("@"))
 
+    def pack(self):
+        fields = [_BOOST_FIELDS_.pack(*boost_serializer.to_fields(boost)) for boost in self.modifiers]
+        return _INT_.pack(self.ent_uid) + _INT_.pack(len(fields)) + b"".join(fields)
+
+    @classmethod
+    def unpack(cls, buffer):
+        ent_uid, count = struct.unpack_from("<ii", buffer)
+        modifiers = [_BOOST_FIELDS_.unpack_from(buffer, 2 * _INT_.size + i * _BOOST_FIELDS_.size) for i in range(count)]
+        return MsgSyncModifiers(ent_uid, modifiers)
+
+
+@export
+class MsgSnapshot(NetMessage):
+    """
+    The entities and boosts that changed since the baseline snapshot, see manpac.controllers.net.net_snapshot.
+    Snapshots are numbered by the server, the baseline is -1 when the changes are from an empty state
+    and otherwise at most 255 snapshots older.
+    Entity changes are (uid, fields, x, y, direction, alive) where uid is in [0; 255], fields is a combination
+    of the SNAPSHOT_* flags and the fields that are not flagged are 0.
+    Boosts are (kind, x, y, value).
+    """
+    uid = 14
+
+    def __init__(self, snapshot, baseline, ticks, entities, removed_boosts, added_boosts):
+        self.snapshot = snapshot
+        self.baseline = baseline
+        self.ticks = ticks
+        self.entities = entities
+        self.removed_boosts = removed_boosts
+        self.added_boosts = added_boosts
+
+    def __str__(self):
+        return "{}:{}".format(self.uid, self.pack().hex())
+
+    @classmethod
+    def from_string(cls, string):
+        return cls.unpack(bytes.fromhex(string))
+
+    def pack(self):
+        # The baseline is sent as its distance to this snapshot, 0 for none
+        offset = self.snapshot - self.baseline if self.baseline >= 0 else 0
+        parts = [_SNAPSHOT_.pack(self.snapshot, offset, self.ticks), _COUNT_.pack(len(self.entities))]
+        for uid, fields, x, y, direction, alive in self.entities:
+            if not 0 <= uid < _MAX_SNAPSHOT_UID_:
+                raise ValueError("entity uid {} can not be sent in a snapshot, it must be in [0; {})"
+                                 .format(uid, _MAX_SNAPSHOT_UID_))
+            parts.append(_ENTITY_CHANGE_.pack(uid, fields))
+            if fields & SNAPSHOT_POSITION_SMALL_DELTA:
+                parts.append(_POSITION_SMALL_DELTA_.pack(x, y))
+            elif fields & SNAPSHOT_POSITION_DELTA:
+                parts.append(_POSITION_DELTA_.pack(x, y))
+            elif fields & SNAPSHOT_POSITION:
+                parts.append(_POSITION_.pack(x, y))
+            if fields & SNAPSHOT_DIRECTION:
+                parts.append(bytes([direction]))
+            if fields & SNAPSHOT_ALIVE:
+                parts.append(_BOOL_.pack(alive))
+        for boosts in [self.removed_boosts, self.added_boosts]:
+            parts.append(_COUNT_.pack(len(boosts)))
+            parts += [_SNAPSHOT_BOOST_.pack(*boost) for boost in boosts]
+        return b"".join(parts)
+
+    @classmethod
+    def unpack(cls, buffer):
+        snapshot, baseline, ticks = _SNAPSHOT_.unpack_from(buffer)
+        baseline = snapshot - baseline if baseline > 0 else -1
+        offset = _SNAPSHOT_.size
+        count, = _COUNT_.unpack_from(buffer, offset)
+        offset += _COUNT_.size
+        entities = []
+        for i in range(count):
+            uid, fields = _ENTITY_CHANGE_.unpack_from(buffer, offset)
+            offset += _ENTITY_CHANGE_.size
+            x = y = direction = 0
+            alive = False
+            if fields & SNAPSHOT_POSITION_SMALL_DELTA:
+                x, y = _POSITION_SMALL_DELTA_.unpack_from(buffer, offset)
+                offset += _POSITION_SMALL_DELTA_.size
+            elif fields & SNAPSHOT_POSITION_DELTA:
+                x, y = _POSITION_DELTA_.unpack_from(buffer, offset)
+                offset += _POSITION_DELTA_.size
+            elif fields & SNAPSHOT_POSITION:
+                x, y = _POSITION_.unpack_from(buffer, offset)
+                offset += _POSITION_.size
+            if fields & SNAPSHOT_DIRECTION:
+                direction = buffer[offset]
+                offset += 1
+            if fields & SNAPSHOT_ALIVE:
+                alive, = _BOOL_.unpack_from(buffer, offset)
+                offset += _BOOL_.size
+            entities.append((uid, fields, x, y, direction, alive))
+        boosts = []
+        for i in range(2):
+            count, = _COUNT_.unpack_from(buffer, offset)
+            offset += _COUNT_.size
+            boosts.append([_SNAPSHOT_BOOST_.unpack_from(buffer, offset + j * _SNAPSHOT_BOOST_.size) for j in range(count)])
+            offset += count * _SNAPSHOT_BOOST_.size
+        return MsgSnapshot(snapshot, baseline, ticks, entities, boosts[0], boosts[1])
+
+
+@export
+class MsgSnapshotAck(NetMessage):
+    uid = 15
+
+    def __init__(self, snapshot):
+        self.snapshot = snapshot
+
+    def __str__(self):
+        return "{}:{}".format(self.uid, self.snapshot)
+
+    @classmethod
+    def from_string(cls, string):
+        return MsgSnapshotAck(int(string))
+
+    def pack(self):
+        return _INT_.pack(self.snapshot)
+
+    @classmethod
+    def unpack(cls, buffer):
+        return MsgSnapshotAck(_INT_.unpack_from(buffer)[0])
+
+
+@export
+class MsgInput(NetMessage):
+    """
+    The last inputs of a client, numbered by the client from the first one of the message.
+    An input is (ticks, direction, moving): the number of ticks of one of its updates, the direction its entity faced
+    and whether it was moving, the server moves the entity from them.
+    Inputs are sent again until acknowledged so that a lost message is made up by the next one.
+    """
+    uid = 16
+
+    def __init__(self, input, inputs):
+        self.input = input
+        self.inputs = inputs
+
+    def __str__(self):
+        inputs = ";".join(["{},{},{}".format(float(ticks), direction.value, int(moving))
+                           for ticks, direction, moving in self.inputs])
+        return "{}:{}/{}".format(self.uid, self.input, inputs)
+
+    @classmethod
+    def from_string(cls, string):
+        parts = string.split("/")
+        inputs = []
+        for part in parts[1].split(";"):
+            data = part.split(",")
+            if len(data) != 3:
+                continue
+            inputs.append((float(data[0]), _DIRECTIONS_[int(data[1])], bool(int(data[2]))))
+        return MsgInput(int(parts[0]), inputs)
+
+    def pack(self):
+        return _INPUTS_.pack(self.input, len(self.inputs)) + \
+            b"".join([_INPUT_ENTRY_.pack(ticks, direction.value, moving) for ticks, direction, moving in self.inputs])
+
+    @classmethod
+    def unpack(cls, buffer):
+        input, count = _INPUTS_.unpack_from(buffer)
+        inputs = []
+        for i in range(count):
+            ticks, direction, moving = _INPUT_ENTRY_.unpack_from(buffer, _INPUTS_.size + i * _INPUT_ENTRY_.size)
+            inputs.append((ticks, _DIRECTIONS_[direction], bool(moving)))
+        return MsgInput(input, inputs)
+
+
+@export
+class MsgInputAck(NetMessage):
+    """
+    The state of the entity of a client once the server has applied its inputs up to the numbered one.
+    """
+    uid = 17
+
+    def __init__(self, input, pos, direction):
+        self.input = input
+        self.pos = pos
+        self.direction = direction
+
+    def __str__(self):
+        return "{}:{}/{},{}/{}".format(self.uid, self.input, float(self.pos[0]), float(self.pos[1]),
+                                       self.direction.value)
+
+    @classmethod
+    def from_string(cls, string):
+        parts = string.split("/")
+        pos = np.array([float(x) for x in parts[1].split(",")], dtype=np.float64)
+        return MsgInputAck(int(parts[0]), pos, _DIRECTIONS_[int(parts[2])])
+
+    def pack(self):
+        return _INPUT_.pack(self.input, self.pos[0], self.pos[1], self.direction.value)
+
+    @classmethod
+    def unpack(cls, buffer):
+        input, x, y, direction = _INPUT_.unpack_from(buffer)
+        return MsgInputAck(input, np.array([x, y], dtype=np.float64), _DIRECTIONS_[direction])
+
 
 _MESSAGES_ = {
     MsgJoin.uid: MsgJoin,
@@ -293,4 +657,8 @@ _MESSAGES_ = {
     MsgStartGame.uid: MsgStartGame,
     MsgBoostUse.uid: MsgBoostUse,
     MsgSyncModifiers.uid: MsgSyncModifiers,
+    MsgSnapshot.uid: MsgSnapshot,
+    MsgSnapshotAck.uid: MsgSnapshotAck,
+    MsgInput.uid: MsgInput,
+    MsgInputAck.uid: MsgInputAck,
 }
@@ -0,0 +1,226 @@
+from manpac.utils import export
+from manpac.controllers.net.net_message import MsgInput
+
+from collections import deque
+import bisect
+import numpy as np
+
+
+# Number of the last inputs sent in each MsgInput, a message is lost for good only if as many following ones are
+INPUT_REDUNDANCY = 16
+
+
+@export
+def apply_input(map, entity, ticks, direction, moving, pickup=True):
+    """
+    Apply the specified input of a client to its entity: it faces the direction and moves as it would on its own.
+
+    Parameters
+    -----------
+    - *map*: (**Map**)
+        the map the entity is on
+    - *entity*: (**Entity**)
+        the entity of the client
+    - *ticks*: (**float**)
+        the number of ticks of the input
+    - *direction*: (**Direction**)
+        the direction the entity faces
+    - *moving*: (**bool**)
+        whether the entity moves
+    - *pickup*: (**bool**)
+        whether the entity picks up the boosts on its way, only the server does
+
+    Return
+    -----------
+    The distance moved.
+    type: **float**
+    """
+    entity.face(direction)
+    entity.moving = moving
+    if pickup:
+        return map.move(entity, ticks)
+    speed = entity.speed
+    if speed <= 0:
+        return 0
+    distance = map.how_far(entity, ticks * speed)
+    entity.move(distance / speed)
+    return distance
+
+
+@export
+class InputHistory():
+    """
+    The inputs of a client that the server has not acknowledged yet, with the position its entity was predicted at.
+    When the server disagrees with a prediction the entity is moved back to the position of the server
+    and the inputs it has not applied yet are simulated again from there.
+
+    Parameters
+    -----------
+    - *tolerance*: (**float**)
+        the distance under which a prediction is deemed right
+    - *redundancy*: (**int**)
+        the number of the last inputs sent in each message
+    """
+
+    def __init__(self, tolerance=1e-6, redundancy=INPUT_REDUNDANCY):
+        self.tolerance = tolerance
+        self.redundancy = redundancy
+        # Number of the next input
+        self.next_input = 0
+        # Last input acknowledged by the server
+        self.acknowledged = -1
+        # (input, ticks, direction, moving, predicted position)
+        self.pending = deque()
+
+    def record(self, entity, ticks):
+        """
+        Record the input of the specified entity during an update.
+
+        Parameters
+        -----------
+        - *entity*: (**Entity**)
+            the entity, after the update
+        - *ticks*: (**float**)
+            the number of ticks of the update
+
+        Return
+        -----------
+        The input to be sent to the server along with the last ones not acknowledged.
+        type: **MsgInput**
+        """
+        self.pending.append((self.next_input, ticks, entity.direction, entity.moving, entity.pos.copy()))
+        self.next_input += 1
+        sent = list(self.pending)[-self.redundancy:]
+        return MsgInput(sent[0][0], [(ticks, direction, moving) for _, ticks, direction, moving, _ in sent])
+
+    def reconcile(self, map, entity, msg):
+        """
+        Compare the state of the server with the prediction and correct the entity if needed.
+
+        Parameters
+        -----------
+        - *map*: (**Map**)
+            the map the entity is on
+        - *entity*: (**Entity**)
+            the entity of the client
+        - *msg*: (**MsgInputAck**)
+            the state of the server
+
+        Return
+        -----------
+        True if the entity was corrected.
+        type: **bool**
+        """
+        if msg.input <= self.acknowledged:
+            return False
+        self.acknowledged = msg.input
+        predicted = None
+        while self.pending and self.pending[0][0] <= msg.input:
+            input, _, _, _, pos = self.pending.popleft()
+            if input == msg.input:
+                predicted = pos
+        if predicted is not None and np.max(np.abs(msg.pos - predicted)) <= self.tolerance:
+            return False
+        # Rewind to the server state then simulate the inputs it has not applied yet
+        direction, moving = entity.direction, entity.moving
+        entity.teleport(msg.pos)
+        entity.face(msg.direction)
+        pending = deque()
+        for input, ticks, input_direction, input_moving, _ in self.pending:
+            apply_input(map, entity, ticks, input_direction, input_moving, pickup=False)
+            pending.append((input, ticks, input_direction, input_moving, entity.pos.copy()))
+        self.pending = pending
+        entity.face(direction)
+        entity.moving = moving
+        return True
+
+
+@export
+class InterpolationBuffer():
+    """
+    The positions of the remote entities sent by the server by tick.
+    They are shown some ticks behind the last ones received so that they can be interpolated between two of them.
+
+    Parameters
+    -----------
+    - *delay*: (**float**)
+        the number of ticks the entities are shown behind the server
+    - *size*: (**int**)
+        the number of ticks kept
+    - *max_step*: (**float**)
+        an entity that moved further between two ticks was teleported and is not interpolated
+    """
+
+    def __init__(self, delay=3, size=32, max_step=1):
+        self.delay = delay
+        self.size = size
+        self.max_step = max_step
+        self.ticks = []
+        self.positions = []
+        # Difference between the ticks of the server and the local ones
+        self.offset = None
+        # Last tick sampled so that the entities never go back in time
+        self.last_sample = None
+
+    def push(self, ticks, positions, local_ticks):
+        """
+        Add the specified positions.
+
+        Parameters
+        -----------
+        - *ticks*: (**float**)
+            the tick of the server at which the entities were at these positions
+        - *positions*: (**Dict[int, numpy.ndarray]**)
+            the positions by entity uid
+        - *local_ticks*: (**float**)
+            the current local tick
+        """
+        if self.ticks and ticks < self.ticks[-1]:
+            # Older than the last positions, the entities have moved on
+            return
+        if self.ticks and ticks == self.ticks[-1]:
+            self.positions[-1].update(positions)
+        else:
+            self.ticks.append(ticks)
+            self.positions.append(positions)
+            if len(self.ticks) > self.size:
+                del self.ticks[0]
+                del self.positions[0]
+        self.offset = ticks - local_ticks
+
+    def sample(self, local_ticks):
+        """
+        Interpolate the positions of the entities at the specified local tick.
+
+        Parameters
+        -----------
+        - *local_ticks*: (**float**)
+            the current local tick
+
+        Return
+        -----------
+        The positions by entity uid, empty if nothing was received.
+        type: **Dict[int, numpy.ndarray]**
+        """
+        if not self.ticks:
+            return {}
+        ticks = local_ticks + self.offset - self.delay
+        if self.last_sample is not None:
+            ticks = max(ticks, self.last_sample)
+        self.last_sample = ticks
+        i = bisect.bisect_right(self.ticks, ticks)
+        if i == 0:
+            return dict(self.positions[0])
+        # Hold the last positions rather than guess the next ones
+        if i == len(self.ticks):
+            return dict(self.positions[-1])
+        before, after = self.positions[i - 1], self.positions[i]
+        t = (ticks - self.ticks[i - 1]) / (self.ticks[i] - self.ticks[i - 1])
+        positions = {}
+        for uid, start in before.items():
+            end = after.get(uid, start)
+            if np.max(np.abs(end - start)) > self.max_step:
+                positions[uid] = start
+            else:
+                positions[uid] = start + t * (end - start)
+        return positions
@@ -1,70 +1,176 @@
 from manpac.utils.export_decorator import export
-from manpac.game_status import GameStatus
 from manpac.controllers.abstract_controller import AbstractController
-from manpac.modifiers.swap_modifier import SwapModifier
-from manpac.controllers.net.net_message import parse, \
+from manpac.controllers.net.net_codec import TextCodec
+from manpac.controllers.net.net_snapshot import SnapshotHistory
+from manpac.controllers.net.net_transport import NetTransport
+from manpac.controllers.net.net_prediction import apply_input
+from manpac.controllers.net.net_message import \
     MsgJoin, MsgResult, MsgSyncMap, MsgSyncEntity, MsgSyncClock, MsgCompound, \
     MsgSyncMapBoosts, MsgEndGame, MsgBoostPickup, MsgYourEntity, MsgStartGame, \
-    MsgBoostUse, MsgSyncModifiers
+    MsgBoostUse, MsgSyncModifiers, MsgSnapshotAck, MsgInput, MsgInputAck
 
-import socketserver
+from collections import deque
 import threading
-from functools import partial
-import time
-import numpy as np
 
+# Ticks of inputs a client may save up while its messages are late, to be applied when they arrive
+MAX_INPUT_TICKS = 10
 
-def _callback_join_(net_server_controller, msg, socket, client_address):
+
+def _callback_join_(net_server_controller, msg, transport, client_address):
     if net_server_controller.free:
         if net_server_controller.entity.type == msg.type:
-            net_server_controller._accept_(socket, client_address)
+            net_server_controller._accept_(client_address)
     else:
-        socket.sendto(MsgResult(client_address == net_server_controller.client_address).bytes(), client_address)
+        msg = MsgResult(client_address == net_server_controller.client_address)
+        transport.send(msg, client_address, net_server_controller.game.duration)
 
 
-def _callback_result_(net_server_controller, msg, socket, client_address):
+def _callback_result_(net_server_controller, msg, transport, client_address):
     net_server_controller.has_result = True
     net_server_controller.has_ok = msg.result
+    transport.resolve(client_address, msg.result)
 
 
-def _callback_sync_entity_(net_server_controller, msg, socket, client_address):
-    if net_server_controller.pushed_local:
-        if not net_server_controller.has_result:
-            net_server_controller._push_local_entity_()
-        else:
-            net_server_controller.pushed_local = False
-            net_server_controller.sync_message = msg
-    else:
-        net_server_controller.sync_message = msg
+def _callback_input_(net_server_controller, msg, transport, client_address):
+    net_server_controller.inputs.append(msg)
 
 
-def _callback_boost_use_(net_server_controller, msg, socket, client_address):
+def _callback_boost_use_(net_server_controller, msg, transport, client_address):
     net_server_controller.entity.use_modifier()
 
 
+def _callback_snapshot_ack_(net_server_controller, msg, transport, client_address):
+    with net_server_controller.server._lock:
+        net_server_controller.acknowledged.add(msg.snapshot)
+
+
 _CALLBACKS_ = {
     MsgJoin.uid: _callback_join_,
     MsgResult.uid: _callback_result_,
-    MsgSyncEntity.uid: _callback_sync_entity_,
+    MsgInput.uid: _callback_input_,
     MsgBoostUse.uid: _callback_boost_use_,
+    MsgSnapshotAck.uid: _callback_snapshot_ack_,
 }
 
 
-class NetServerHandler(socketserver.BaseRequestHandler):
-    def __init__(self, net_server_controller, *args, **kwargs):
-        self.net = net_server_controller
-        super().__init__(*args, **kwargs)
+@export
+class NetGameServer():
+    """
+    A server hosting all the remote seats of a game on one socket.
+    A join is routed to a free seat of the right type, then the messages of a client go to its seat.
+    At the end of each tick of the game its state is captured and encoded once then sent to every client,
+    from the thread updating the game so that the state is never captured in the middle of an update.
+
+    Parameters
+    -----------
+    - *game*: (**Game**)
+        the game the seats are in
+    - *host*: (**string**)
+        the host ip
+    - *port*: (**int**)
+        the port of the host
+    - *codec*: (**TextCodec**)
+        the codec of the messages, the clients must use the same (default: TextCodec)
+    - *snapshots*: (**bool**)
+        send each tick the changes since the last snapshot every client acknowledged
+        instead of the full state of the entities and boosts
+    - *transport*: (**NetTransport**)
+        an open transport shared with other servers that gives them their messages (see on_message),
+        host, port and codec are then unused (default: a new transport)
+    """
 
-    def handle(self):
-        content, socket = self.request
-        msg = parse(content)
-        _CALLBACKS_[msg.uid](self.net, msg, socket, self.client_address)
+    def __init__(self, game, host="127.0.0.1", port=9999, codec=None, snapshots=True, transport=None):
+        self.game = game
+        self.snapshots = SnapshotHistory() if snapshots else None
+        self.seats = []
+        # Seats by client address
+        self.clients = {}
+        self._owns_transport = transport is None
+        if transport is None:
+            # Start listening
+            transport = NetTransport(codec or TextCodec(), self.on_message)
+            transport.open(local_address=(host, port))
+        self.transport = transport
+        self.codec = transport.codec
+
+        # Guards the snapshots acknowledged by the clients, they are received by the transport thread
+        self._lock = threading.Lock()
+        self._sent_ticks = None
+        self._ended_seats = 0
+        game.tick_listeners.append(self._on_tick_)
+
+    def _on_tick_(self, ticks):
+        # The game no longer updates the seats of dead entities, their clients still follow the game
+        for seat in self.seats:
+            if seat.client_address is not None and not seat.entity.alive:
+                seat.update(ticks)
+        # Including the last one, it is sent before the end of the game
+        if self.snapshots:
+            self.update()
+
+    def seat(self):
+        """
+        Make a new seat for a remote client.
+
+        Return
+        -----------
+        The controller of the seat, to be attached to the entity the client will play.
+        type: **NetServerController**
+        """
+        return NetServerController(self.game, server=self)
+
+    def has_free_seat(self, type):
+        """
+        Return whether a client of the specified EntityType can join.
+        """
+        return any(seat.free and seat.entity.type == type for seat in self.seats)
+
+    def on_message(self, msg, client_address):
+        """
+        Handle the specified message received from the specified address.
+        """
+        seat = self.clients.get(client_address, None)
+        if seat is None:
+            if msg.uid != MsgJoin.uid:
+                return
+            seat = next((seat for seat in self.seats if seat.free and seat.entity.type == msg.type), None)
+            if seat is None:
+                self.transport.send(MsgResult(False), client_address, self.game.duration)
+                return
+            self.clients[client_address] = seat
+        _CALLBACKS_[msg.uid](seat, msg, self.transport, client_address)
+
+    def update(self):
+        """
+        Send the state of the game to every client once per tick, it is called at the end of each tick of the game.
+        """
+        if self._sent_ticks == self.game.duration:
+            return
+        self._sent_ticks = self.game.duration
+        seats = [seat for seat in self.seats if seat.client_address is not None]
+        if not seats:
+            return
+        number = self.snapshots.store(self.snapshots.capture(self.game))
+        # The changes since the last snapshot every client acknowledged, hence kept
+        with self._lock:
+            for seat in seats:
+                seat.acknowledged = {ack for ack in seat.acknowledged if self.snapshots.get(ack) is not None}
+            acknowledged = max(set.intersection(*[seat.acknowledged for seat in seats]), default=-1)
+        data = self.codec.encode(self.snapshots.delta(number, acknowledged), self.game.duration)
+        for seat in seats:
+            self.transport.send_data(data, seat.client_address)
+
+    def _on_game_end_(self):
+        self._ended_seats += 1
+        if self._ended_seats == len(self.seats) and self._owns_transport:
+            self.transport.close()
 
 
 @export
 class NetServerController(AbstractController):
     """
     A controller that is a server and will take instructions from a remote client.
+    Without a server it hosts its own with itself as the only seat.
 
     Parameters
     -----------
@@ -74,22 +180,34 @@ class NetServerController(AbstractController):
         the host ip
     - *port*: (**int**)
         the port of the host
+    - *codec*: (**TextCodec**)
+        the codec of the messages, the client must use the same (default: TextCodec)
+    - *snapshots*: (**bool**)
+        send each tick the changes since the last snapshot the client acknowledged
+        instead of the full state of the entities and boosts
+    - *server*: (**NetGameServer**)
+        the server this controller is a seat of, the other parameters are then those of the server
     """
 
-    def __init__(self, game, host="127.0.0.1", port=9999):
+    def __init__(self, game, host="127.0.0.1", port=9999, codec=None, snapshots=True, server=None):
         super(NetServerController, self).__init__(game)
-        self.server = socketserver.UDPServer((host, port), partial(NetServerHandler, self), bind_and_activate=True)
-        # Start listening
-        server_thread = threading.Thread(target=self.server.serve_forever)
-        server_thread.daemon = True
-        server_thread.start()
+        self.server = server or NetGameServer(game, host, port, codec, snapshots)
+        self.server.seats.append(self)
+        self.codec = self.server.codec
+        self.transport = self.server.transport
 
         self.free = False
         self.client_address = None
+        self._joined = threading.Event()
+        # Snapshots acknowledged by the client that are still kept
+        self.acknowledged = set()
         self.is_first_tick_done = False
 
-        self.sync_message = None
-        self.pushed_local = False
+        # Inputs of the client not applied yet
+        self.inputs = deque()
+        self.last_input = -1
+        # Ticks the inputs of the client may still move its entity for, it can not move faster than the server
+        self.input_ticks = 0
 
         self.last_holdings = []
         self.last_modifiers = []
@@ -101,102 +219,97 @@ class NetServerController(AbstractController):
 
     def on_game_start(self):
         # Wait for a client to take this controller
-        while self.client_address is None:
-            time.sleep(.1)
+        self._joined.wait()
         # Assign UID to each entity
         for i, entity in enumerate(self.game.entities):
             entity.uid = i
             self.last_holdings.append([])
             self.last_modifiers.append([])
-        # Send map data
+        # Send map data, it is sent again until the client has it
         self._notify_(MsgSyncMap(self.game.map.terrain))
         # Send your entity data
         self._send_message_(MsgYourEntity(self.entity.uid))
         # Send initial sync data
         for entity in self.game.entities:
-            self._send_message_(MsgSyncEntity(entity=entity))
+            self._send_message_(MsgSyncEntity(entity=entity), reliable=True)
 
     def _notify_(self, msg):
-        self.has_result = False
-        self.has_ok = False
-        while not self.has_result:
-            self._send_message_(msg)
-            time.sleep(.1)
-        return self.has_ok
+        """
+        Send the specified NetMessage until the client answers it.
+        Parameters
+        -----------
+        - *msg*: (**NetMessage**)
+            the message to be sent
+
+        Return
+        -----------
+        A future of the result answered.
+        type: **concurrent.futures.Future**
+        """
+        return self.transport.request(msg, self.client_address, self.game.duration)
 
     def on_game_end(self):
         # Send that the game is done
         self._send_message_(MsgEndGame())
-        self.server.shutdown()
+        self.server._on_game_end_()
 
     def on_death(self):
-        # Be sure to send that this entity is now dead
-        self._send_message_(MsgSyncEntity(entity=self.entity))
-
-        # Keep the game updated
-        # because update won't be called by the game anymore we have to do it
-        def keep_updated():
-            while self.game.status is GameStatus.ONGOING:
-                self.update(1)
-                time.sleep(.02)
-
-        upd_thread = threading.Thread(target=keep_updated)
-        upd_thread.daemon = True
-        upd_thread.start()
+        # Be sure to send that this entity is now dead, the server then updates this seat at each tick
+        self._send_message_(MsgSyncEntity(entity=self.entity), reliable=True)
 
     def on_boost_pickup(self):
         # On boost pickup send info
         self._send_message_(MsgBoostPickup(self.entity.uid, self.entity.holding))
 
-    def _send_message_(self, msg):
+    def _send_message_(self, msg, reliable=None):
         """
         Send the specified NetMessage.
         Parameters
         -----------
         - *msg*: (**NetMessage**)
             the message to be sent
+        - *reliable*: (**bool**)
+            whether it is sent until acknowledged, None to decide from the message
         """
-        self.socket.sendto(msg.bytes(), self.client_address)
+        self.transport.send(msg, self.client_address, self.game.duration, reliable)
 
-    def _accept_(self, socket, client_address):
+    def _accept_(self, client_address):
         self.client_address = client_address
-        self.socket = socket
         self.free = False
         self._send_message_(MsgResult(True))
-
-    def _should_send_pos_upd_(self, li):
-        for boost in li:
-            if isinstance(boost, SwapModifier):
-                return True
-        return False
-
-    def _push_local_entity_(self):
-        self.has_result = False
-        self.has_ok = False
-        self.pushed_local = True
-        self._send_message_(MsgSyncEntity(entity=self.entity))
+        self._joined.set()
 
     def update(self, ticks):
         # Tell the game has started
         if not self.is_first_tick_done:
             self.is_first_tick_done = True
             self._send_message_(MsgStartGame())
-        # Make a compound message of the new positions
-        messages = [MsgSyncEntity(entity=e) for e in self.game.entities
-                    if self.entity != e]
-        messages.append(MsgSyncClock(self.game.duration))
-        self._send_message_(MsgCompound(*messages))
-        # Sync map boosts
-        self._send_message_(MsgSyncMapBoosts(self.game.map.ghost_boosts, self.game.map.pacman_boosts))
-        # If has received an update info about entity update now
-        if self.sync_message:
-            entity = self.entity
-            msg = self.sync_message
-            dist = np.sum(np.abs(entity.pos - msg.pos))
-            self.game.map._do_boost_pickup_(entity, dist)
-            entity.face(msg.direction)
-            entity.teleport(msg.pos)
-            self.sync_message = None
+        # With snapshots the server sends the changes of the positions, clock and map boosts at the end of the tick
+        if not self.server.snapshots:
+            # Make a compound message of the new positions
+            messages = [MsgSyncEntity(entity=e) for e in self.game.entities
+                        if self.entity != e]
+            messages.append(MsgSyncClock(self.game.duration))
+            self._send_message_(MsgCompound(*messages))
+            # Sync map boosts
+            map = self.game.map
+            self._send_message_(MsgSyncMapBoosts([[b.loc, b.remaining_duration] for b in map.ghost_boosts],
+                                                 [[b.loc, b.remaining_duration] for b in map.pacman_boosts]))
+        # Apply the new inputs of the client in order then tell it the resulting state
+        self.input_ticks = min(self.input_ticks + ticks, MAX_INPUT_TICKS)
+        if self.inputs:
+            while self.inputs:
+                msg = self.inputs.popleft()
+                for input, (input_ticks, direction, moving) in enumerate(msg.inputs, msg.input):
+                    # Inputs already applied are sent again in case they were lost
+                    if input <= self.last_input:
+                        continue
+                    self.last_input = input
+                    input_ticks = min(max(input_ticks, 0), self.input_ticks)
+                    self.input_ticks -= input_ticks
+                    if self.entity.alive:
+                        apply_input(self.game.map, self.entity, input_ticks, direction, moving)
+            self._send_message_(MsgInputAck(self.last_input, self.entity.pos, self.entity.direction))
 
         # Sync boost use / boost pickup
         for i, entity in enumerate(self.game.entities):
@@ -214,7 +327,4 @@ class NetServerController(AbstractController):
             # Sync only on change
             if entity.modifiers != self.last_modifiers[i]:
                 self._send_message_(MsgSyncModifiers(entity.uid, entity.modifiers))
-                # If a boost with a teleport was used, send local pos
-                if self._should_send_pos_upd_(self.last_modifiers[i]):
-                    self._push_local_entity_()
                 self.last_modifiers[i] = entity.modifiers[:]
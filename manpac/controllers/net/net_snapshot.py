@@ -0,0 +1,343 @@
+from manpac.utils import export
+from manpac.direction import Direction
+from manpac.controllers.net.net_message import MsgSnapshot, \
+    SNAPSHOT_POSITION, SNAPSHOT_DIRECTION, SNAPSHOT_ALIVE, SNAPSHOT_POSITION_DELTA, SNAPSHOT_POSITION_SMALL_DELTA
+
+from collections import Counter
+import numpy as np
+
+
+# Positions are sent in fixed point with this number of steps per cell
+POSITION_STEPS = 256
+# Boost expiries and durations are sent in fixed point with this number of steps per tick
+TICK_STEPS = 16
+
+_DIRECTIONS_ = {direction.value: direction for direction in Direction}
+_BYTE_ = 2**7
+_SHORT_ = 2**15
+
+
+@export
+class Snapshot():
+    """
+    The state of the entities and boosts of a game as it is sent to a client.
+
+    Parameters
+    -----------
+    - *ticks*: (**float**)
+        the game duration
+    - *entities*: (**Dict[int, Tuple[int, int, int, bool]]**)
+        for each entity uid its fixed point position, its direction value and whether it is alive
+    - *boosts*: (**List[Tuple[int, int, int, int]]**)
+        the boosts as (kind, x, y, value), the kind is 0 for ghost boosts and 1 for pacman boosts.
+        The value of a ghost boost is the fixed point game duration at which it expires so that it does not change
+        while the boost exists, that of a pacman boost its fixed point remaining duration
+    """
+
+    def __init__(self, ticks=0, entities=None, boosts=None):
+        self.ticks = ticks
+        self.entities = entities or {}
+        self.boosts = boosts or []
+
+    @classmethod
+    def capture(cls, game, excluded=None, known_boosts=None):
+        """
+        Capture the current state of the specified game.
+
+        Parameters
+        -----------
+        - *game*: (**Game**)
+            the game, its entities must have their uid
+        - *excluded*: (**Entity**)
+            an entity that is not part of the snapshot
+        - *known_boosts*: (**dict**)
+            the boosts of the previous capture, it is updated with this capture.
+            Boosts that were already captured keep their value, it does not change while they exist.
+
+        Return
+        -----------
+        The snapshot of the game.
+        type: **Snapshot**
+        """
+        ticks = game.duration
+        entities = {}
+        for entity in game.entities:
+            if entity is excluded:
+                continue
+            entities[entity.uid] = (int(round(entity.pos[0] * POSITION_STEPS)), int(round(entity.pos[1] * POSITION_STEPS)),
+                                    entity.direction.value, bool(entity.alive))
+        boosts = []
+        captured = {}
+        for kind, map_boosts in enumerate([game.map.ghost_boosts, game.map.pacman_boosts]):
+            for boost in map_boosts:
+                # Keep the boost itself so that its id is not reused while it is known
+                key = (kind, id(boost))
+                if known_boosts is not None and key in known_boosts:
+                    captured[key] = known_boosts[key]
+                else:
+                    loc, value = boost.loc, boost.remaining_duration
+                    if kind == 0:
+                        value += ticks
+                    captured[key] = (boost, (kind, int(loc[0]), int(loc[1]), int(round(value * TICK_STEPS))))
+                boosts.append(captured[key][1])
+        if known_boosts is not None:
+            known_boosts.clear()
+            known_boosts.update(captured)
+        return cls(ticks, entities, boosts)
+
+    def delta(self, snapshot, baseline=None, baseline_snapshot=-1):
+        """
+        Make the message that turns the baseline into this snapshot.
+
+        Parameters
+        -----------
+        - *snapshot*: (**int**)
+            the number of this snapshot
+        - *baseline*: (**Snapshot**)
+            the baseline, None for an empty state
+        - *baseline_snapshot*: (**int**)
+            the number of the baseline
+
+        Return
+        -----------
+        The message with the changes.
+        type: **MsgSnapshot**
+        """
+        if baseline is None:
+            baseline = Snapshot()
+            baseline_snapshot = -1
+        changes = []
+        for uid, state in self.entities.items():
+            old = baseline.entities.get(uid, None)
+            if old == state:
+                continue
+            x, y, direction, alive = state
+            fields = 0
+            dx = dy = 0
+            if old is None or old[:2] != state[:2]:
+                if old is not None and max(abs(x - old[0]), abs(y - old[1])) < _BYTE_:
+                    fields |= SNAPSHOT_POSITION_SMALL_DELTA
+                    dx, dy = x - old[0], y - old[1]
+                elif old is not None and max(abs(x - old[0]), abs(y - old[1])) < _SHORT_:
+                    fields |= SNAPSHOT_POSITION_DELTA
+                    dx, dy = x - old[0], y - old[1]
+                else:
+                    fields |= SNAPSHOT_POSITION
+                    dx, dy = x, y
+            if old is None or old[2] != direction:
+                fields |= SNAPSHOT_DIRECTION
+            if old is None or old[3] != alive:
+                fields |= SNAPSHOT_ALIVE
+            changes.append((uid, fields, dx, dy, direction if fields & SNAPSHOT_DIRECTION else 0,
+                            alive if fields & SNAPSHOT_ALIVE else False))
+        current = Counter(self.boosts)
+        previous = Counter(baseline.boosts)
+        removed = list((previous - current).elements())
+        added = list((current - previous).elements())
+        return MsgSnapshot(snapshot, baseline_snapshot, self.ticks, changes, removed, added)
+
+    def apply(self, msg):
+        """
+        Apply the changes of the specified message to this snapshot, its baseline.
+
+        Parameters
+        -----------
+        - *msg*: (**MsgSnapshot**)
+            the message
+
+        Return
+        -----------
+        The new snapshot.
+        type: **Snapshot**
+        """
+        entities = dict(self.entities)
+        for uid, fields, x, y, direction, alive in msg.entities:
+            old_x, old_y, old_direction, old_alive = entities.get(uid, (0, 0, Direction.LEFT.value, False))
+            if fields & (SNAPSHOT_POSITION_DELTA | SNAPSHOT_POSITION_SMALL_DELTA):
+                x, y = old_x + x, old_y + y
+            elif not fields & SNAPSHOT_POSITION:
+                x, y = old_x, old_y
+            if not fields & SNAPSHOT_DIRECTION:
+                direction = old_direction
+            if not fields & SNAPSHOT_ALIVE:
+                alive = old_alive
+            entities[uid] = (x, y, direction, alive)
+        removed = Counter(tuple(boost) for boost in msg.removed_boosts)
+        boosts = []
+        for boost in self.boosts:
+            if removed[boost] > 0:
+                removed[boost] -= 1
+            else:
+                boosts.append(boost)
+        boosts += [tuple(boost) for boost in msg.added_boosts]
+        return Snapshot(msg.ticks, entities, boosts)
+
+    def positions(self):
+        """
+        The positions of the entities by uid.
+        type: **Dict[int, numpy.ndarray]**
+        """
+        return {uid: np.array([x, y], dtype=np.float64) / POSITION_STEPS for uid, (x, y, _, _) in self.entities.items()}
+
+    def restore(self, game, excluded=None, positions=True, previous=None):
+        """
+        Set the entities and boosts of the specified game to the state of this snapshot.
+
+        Parameters
+        -----------
+        - *game*: (**Game**)
+            the game, entity uids are indices in its entities
+        - *excluded*: (**Entity**)
+            an entity that is left as it is
+        - *positions*: (**bool**)
+            whether the entities are moved, otherwise only their direction and whether they are alive are set
+        - *previous*: (**Snapshot**)
+            the snapshot restored before, the boosts are only set when they changed since
+            and the game then counts down the durations of the ghost boosts (default: None)
+        """
+        for uid, (x, y, direction, alive) in self.entities.items():
+            entity = game.entities[uid]
+            if entity is excluded:
+                continue
+            if positions:
+                entity.teleport(np.array([x, y], dtype=np.float64) / POSITION_STEPS)
+            entity.face(_DIRECTIONS_[direction])
+            entity.uid = uid
+            if not alive:
+                entity.kill()
+        if game.map and (previous is None or previous.boosts != self.boosts):
+            game.map.ghost_boosts = [[np.array([x, y], dtype=np.int64), value / TICK_STEPS - self.ticks]
+                                     for kind, x, y, value in self.boosts if kind == 0]
+            game.map.pacman_boosts = [[np.array([x, y], dtype=np.int64), value / TICK_STEPS]
+                                      for kind, x, y, value in self.boosts if kind == 1]
+
+
+@export
+class SnapshotHistory():
+    """
+    The last snapshots sent to a client or received from the server, by number.
+    The server sends the changes since the last snapshot the client acknowledged,
+    the client rebuilds the snapshots from the baselines it kept.
+
+    Parameters
+    -----------
+    - *size*: (**int**)
+        the number of snapshots kept
+    """
+
+    def __init__(self, size=32):
+        self.size = size
+        self.snapshots = [None] * size
+        self.numbers = [-1] * size
+        # Number of the next snapshot sent
+        self.next_snapshot = 0
+        # Last snapshot acknowledged by the client
+        self.acknowledged = -1
+        # Last snapshot received from the server
+        self.received = -1
+        # Boosts of the last capture
+        self._known_boosts = {}
+
+    def get(self, snapshot):
+        """
+        Return the specified snapshot if it is kept otherwise None.
+        """
+        if snapshot < 0 or self.numbers[snapshot % self.size] != snapshot:
+            return None
+        return self.snapshots[snapshot % self.size]
+
+    def _store_(self, number, snapshot):
+        self.numbers[number % self.size] = number
+        self.snapshots[number % self.size] = snapshot
+
+    def acknowledge(self, snapshot):
+        """
+        Mark the specified snapshot as received by the client.
+        """
+        self.acknowledged = max(self.acknowledged, snapshot)
+
+    def capture(self, game, excluded=None):
+        """
+        Capture the current state of the specified game, see Snapshot.capture.
+        """
+        return Snapshot.capture(game, excluded, self._known_boosts)
+
+    def store(self, snapshot):
+        """
+        Keep the specified new snapshot.
+
+        Parameters
+        -----------
+        - *snapshot*: (**Snapshot**)
+            the snapshot to be sent
+
+        Return
+        -----------
+        The number of the snapshot.
+        type: **int**
+        """
+        number = self.next_snapshot
+        self._store_(number, snapshot)
+        self.next_snapshot += 1
+        return number
+
+    def delta(self, snapshot, acknowledged):
+        """
+        Make the message for the specified kept snapshot.
+
+        Parameters
+        -----------
+        - *snapshot*: (**int**)
+            the number of the snapshot
+        - *acknowledged*: (**int**)
+            the number of the last snapshot acknowledged by the client
+
+        Return
+        -----------
+        The message with the changes since the acknowledged snapshot if it is still kept otherwise with all of it.
+        type: **MsgSnapshot**
+        """
+        return self.get(snapshot).delta(snapshot, self.get(acknowledged), acknowledged)
+
+    def send(self, snapshot):
+        """
+        Make the message for the specified new snapshot and keep it.
+
+        Parameters
+        -----------
+        - *snapshot*: (**Snapshot**)
+            the snapshot to be sent
+
+        Return
+        -----------
+        The message with the changes since the last acknowledged snapshot still kept.
+        type: **MsgSnapshot**
+        """
+        return self.delta(self.store(snapshot), self.acknowledged)
+
+    def receive(self, msg):
+        """
+        Rebuild and keep the snapshot of the specified message.
+
+        Parameters
+        -----------
+        - *msg*: (**MsgSnapshot**)
+            the message received
+
+        Return
+        -----------
+        The snapshot and whether it is newer than any received before,
+        None if its baseline is no longer kept in which case it should not be acknowledged.
+        type: **Tuple[Snapshot, bool]**
+        """
+        if msg.baseline >= 0:
+            baseline = self.get(msg.baseline)
+            if baseline is None:
+                return None
+        else:
+            baseline = Snapshot()
+        snapshot = baseline.apply(msg)
+        self._store_(msg.snapshot, snapshot)
+        newer = msg.snapshot > self.received
+        self.received = max(self.received, msg.snapshot)
+        return snapshot, newer
@@ -0,0 +1,341 @@
+from manpac.utils import export
+from manpac.controllers.net.net_channel import NetChannel
+
+from collections import deque
+from concurrent.futures import Future, TimeoutError
+import asyncio
+import struct
+import threading
+
+
+@export
+class NetTransport(asyncio.DatagramProtocol):
+    """
+    A UDP endpoint driven by an asyncio event loop running on its own thread.
+    Received messages are decoded and given to the callback on that thread, sending never blocks the caller.
+    Requests are sent again with an exponential backoff until they are answered (see resolve) or time out.
+    Unless disabled the datagrams go through a NetChannel per peer, so that messages marked reliable
+    are delivered in order and older unreliable messages are dropped, both ends must agree on it.
+
+    Parameters
+    -----------
+    - *codec*: (**TextCodec**)
+        the codec of the messages
+    - *callback*: (**(NetMessage, Tuple[str, int]) -> None**)
+        called with each message received and the address of its sender
+    - *retry_delay*: (**float**)
+        the delay in seconds before a request is sent again, it doubles after each try (default: .1)
+    - *max_retry_delay*: (**float**)
+        the maximum delay in seconds between two tries of a request (default: 1)
+    - *timeout*: (**float**)
+        the delay in seconds after which a request fails, None to try forever (default: 10)
+    - *channels*: (**bool**)
+        whether the messages are sent through channels (default: True)
+    - *linger*: (**float**)
+        the maximum delay in seconds close waits for the reliable messages to be acknowledged (default: 1)
+    """
+
+    def __init__(self, codec, callback, retry_delay=.1, max_retry_delay=1, timeout=10, channels=True, linger=1):
+        self.codec = codec
+        self.callback = callback
+        self.retry_delay = retry_delay
+        self.max_retry_delay = max_retry_delay
+        self.timeout = timeout
+        self.linger = linger
+        # Channels by address, None if they are not used
+        self.channels = {} if channels else None
+        self.loop = asyncio.new_event_loop()
+        self._thread = None
+        self.transport = None
+        self.remote_address = None
+        self.closed = False
+        self._closing = False
+        # Futures of the requests waiting for an answer by address
+        self._pending = {}
+        # Datagrams and their bytes, channel headers included
+        self.packets_sent = 0
+        self.packets_received = 0
+        self.bytes_sent = 0
+        self.bytes_received = 0
+
+    def open(self, local_address=None, remote_address=None):
+        """
+        Start the event loop and bind the socket.
+
+        Parameters
+        -----------
+        - *local_address*: (**Tuple[str, int]**)
+            the address to listen on, None for any
+        - *remote_address*: (**Tuple[str, int]**)
+            the only address to talk to, None to talk to anyone
+        """
+        self._thread = threading.Thread(target=self._run_)
+        self._thread.daemon = True
+        self._thread.start()
+        endpoint = self.loop.create_datagram_endpoint(lambda: self, local_addr=local_address,
+                                                      remote_addr=remote_address)
+        try:
+            asyncio.run_coroutine_threadsafe(endpoint, self.loop).result()
+        except BaseException:
+            self.close()
+            raise
+        self.remote_address = remote_address
+
+    def _run_(self):
+        self.loop.run_forever()
+        # Stopped by close, the loop is closed on its own thread in case close was called from it
+        self.loop.close()
+
+    @property
+    def local_address(self):
+        """
+        The address the socket is bound to.
+        type: **Tuple[str, int]**
+        """
+        return self.transport.get_extra_info('sockname')
+
+    def connection_made(self, transport):
+        self.transport = transport
+
+    def connection_lost(self, exc):
+        self.closed = True
+
+    def datagram_received(self, data, address):
+        self.packets_received += 1
+        self.bytes_received += len(data)
+        if self.channels is None:
+            self._receive_(data, address)
+            return
+        channel = self.channel(address)
+        try:
+            received = channel.receive(data)
+        except struct.error:
+            return
+        for payload, seq in received:
+            self._receive_(payload, address, channel, seq)
+
+    def _receive_(self, data, address, channel=None, seq=None):
+        try:
+            msg = self.codec.decode(data)
+        except (ValueError, KeyError, IndexError, struct.error):
+            # Not a message of this codec
+            return
+        if seq is not None and not channel.is_latest(msg.key(), seq):
+            return
+        self.callback(msg, address)
+
+    def error_received(self, exc):
+        # Such as an unreachable peer, requests are tried again anyway
+        pass
+
+    def _key_(self, address):
+        return self.remote_address if self.remote_address is not None else address
+
+    def channel(self, address=None):
+        """
+        Return the channel of the specified peer, it must be called from the event loop.
+
+        Parameters
+        -----------
+        - *address*: (**Tuple[str, int]**)
+            the address of the peer, unused if a remote address was given to open
+
+        Return
+        -----------
+        The channel, None if they are not used.
+        type: **NetChannel**
+        """
+        if self.channels is None:
+            return None
+        address = self._key_(address)
+        channel = self.channels.get(address, None)
+        if channel is None:
+            channel = NetChannel(self.loop, lambda data: self._send_(data, address))
+            self.channels[address] = channel
+        return channel
+
+    def forget(self, address):
+        """
+        Drop the channel of the specified peer once its reliable messages are acknowledged or after linger seconds.
+        A new peer at this address then starts a new channel.
+
+        Parameters
+        -----------
+        - *address*: (**Tuple[str, int]**)
+            the address of the peer
+        """
+        if self.closed or self.channels is None:
+            return
+
+        def drop(deadline):
+            channel = self.channels.get(address, None)
+            if channel is None:
+                return
+            if channel.unacked and self.loop.time() < deadline:
+                self.loop.call_later(.02, drop, deadline)
+                return
+            channel.close()
+            del self.channels[address]
+        self._call_soon_(lambda: drop(self.loop.time() + self.linger))
+
+    def _send_payload_(self, data, address, reliable=False):
+        if self.channels is None:
+            self._send_(data, address)
+        else:
+            self.channel(address).send(data, reliable)
+
+    def _send_(self, data, address):
+        if self.transport is None or self.transport.is_closing():
+            return
+        self.packets_sent += 1
+        self.bytes_sent += len(data)
+        if self.remote_address is not None:
+            self.transport.sendto(data)
+        else:
+            self.transport.sendto(data, address)
+
+    def send(self, msg, address=None, tick=0, reliable=None):
+        """
+        Send the specified message.
+
+        Parameters
+        -----------
+        - *msg*: (**NetMessage**)
+            the message to be sent
+        - *address*: (**Tuple[str, int]**)
+            the address to send to, unused if a remote address was given to open
+        - *tick*: (**float**)
+            the game tick the message is sent at
+        - *reliable*: (**bool**)
+            whether it is sent until acknowledged, None to decide from the message (default: None)
+        """
+        self.send_data(self.codec.encode(msg, tick), address, msg.reliable if reliable is None else reliable)
+
+    def send_data(self, data, address=None, reliable=False):
+        """
+        Send the specified already encoded message.
+
+        Parameters
+        -----------
+        - *data*: (**bytes**)
+            the encoded message
+        - *address*: (**Tuple[str, int]**)
+            the address to send to, unused if a remote address was given to open
+        - *reliable*: (**bool**)
+            whether it is sent until acknowledged, only once otherwise
+        """
+        if self.closed:
+            return
+        self._call_soon_(self._send_payload_, data, address, reliable)
+
+    def request(self, msg, address=None, tick=0):
+        """
+        Send the specified message until it is answered.
+
+        Parameters
+        -----------
+        - *msg*: (**NetMessage**)
+            the message to be sent
+        - *address*: (**Tuple[str, int]**)
+            the address to send to, unused if a remote address was given to open
+        - *tick*: (**float**)
+            the game tick the message is sent at
+
+        Return
+        -----------
+        A future of the answer, it fails with a concurrent.futures.TimeoutError if there is none in time.
+        type: **concurrent.futures.Future**
+        """
+        future = Future()
+        if self.closed:
+            future.set_exception(TimeoutError())
+            return future
+        if not self._call_soon_(self._start_request_, future, self.codec.encode(msg, tick), self._key_(address)):
+            future.set_exception(TimeoutError())
+        return future
+
+    def _call_soon_(self, callback, *args):
+        # The loop may be closed by another thread once closed was checked
+        try:
+            self.loop.call_soon_threadsafe(callback, *args)
+        except RuntimeError:
+            return False
+        return True
+
+    def _start_request_(self, future, data, address):
+        pending = self._pending.setdefault(address, deque())
+        pending.append(future)
+        deadline = None if self.timeout is None else self.loop.time() + self.timeout
+
+        def attempt(delay):
+            if future.done():
+                return
+            if deadline is not None and self.loop.time() >= deadline:
+                pending.remove(future)
+                future.set_exception(TimeoutError())
+                return
+            # The answer is a message of its own so requests are sent unreliably until answered
+            self._send_payload_(data, address)
+            self.loop.call_later(delay, attempt, min(2 * delay, self.max_retry_delay))
+        attempt(self.retry_delay)
+
+    def resolve(self, address, answer):
+        """
+        Answer the oldest request sent to the specified address.
+        It must be called from the callback.
+
+        Parameters
+        -----------
+        - *address*: (**Tuple[str, int]**)
+            the address the answer comes from
+        - *answer*:
+            the result of the request
+
+        Return
+        -----------
+        True if a request was waiting for this answer.
+        type: **bool**
+        """
+        pending = self._pending.get(self._key_(address), None)
+        while pending:
+            future = pending.popleft()
+            if future.set_running_or_notify_cancel():
+                future.set_result(answer)
+                return True
+        return False
+
+    def close(self):
+        """
+        Close the socket, stop the event loop and wait for its thread to end, pending requests fail.
+        The reliable messages already sent are still sent again until acknowledged or for at most linger seconds.
+        """
+        if self._closing:
+            return
+        self._closing = self.closed = True
+        if self._thread is None:
+            self.loop.close()
+            return
+        deadline = self.loop.time() + self.linger
+
+        def shutdown():
+            channels = list(self.channels.values()) if self.channels else []
+            if any(channel.unacked for channel in channels) and self.loop.time() < deadline:
+                self.loop.call_later(.02, shutdown)
+                return
+            for channel in channels:
+                # The last acknowledgements may not have been sent yet
+                if channel.remote_seq >= 0:
+                    channel.flush()
+                channel.close()
+            for pending in self._pending.values():
+                for future in pending:
+                    if future.set_running_or_notify_cancel():
+                        future.set_exception(TimeoutError())
+            self._pending.clear()
+            if self.transport is not None:
+                self.transport.close()
+            # After the socket is released by the callback scheduled when closing the transport
+            self.loop.call_soon(self.loop.stop)
+        self.loop.call_soon_threadsafe(shutdown)
+        if threading.current_thread() is not self._thread:
+            self._thread.join()
@@ -2,8 +2,6 @@ from manpac.utils import export
 from manpac.direction import Direction
 from manpac.controllers.abstract_controller import AbstractController
 
-import random
-
 
 @export
 class RandomWalkController(AbstractController):
@@ -22,6 +20,18 @@ class RandomWalkController(AbstractController):
         super(RandomWalkController, self).__init__(game)
         self._dir_duration = switch_duration + 1
         self.switch_duration = switch_duration
+        self._rng = None
+
+    @property
+    def rng(self):
+        """
+        The random generator of this controller, spawned from the game on first use
+        so that the controller can be made before its game.
+        type: **numpy.random.Generator**
+        """
+        if self._rng is None:
+            self._rng = self.game.spawn_rng()
+        return self._rng
 
     def update(self, ticks):
         self._dir_duration += ticks
@@ -30,12 +40,13 @@ class RandomWalkController(AbstractController):
             choices = [dir for dir in Direction
                        if self.game.map.is_walkable(self.entity.map_position + dir.vector)]
             if choices:
-                self.entity.face(random.choice(choices))
+                self.entity.face(choices[self.rng.integers(len(choices))])
             self.entity.moving = True
             self._dir_duration = 0
         else:
             speed = self.entity.speed
-            used_ticks = self.game.map.how_far(self.entity, speed * ticks) / speed
+            # A frozen entity uses all its ticks standing still
+            used_ticks = self.game.map.how_far(self.entity, speed * ticks) / speed if speed > 0 else ticks
             self.game.map.move(self.entity, used_ticks)
             if used_ticks < ticks:
                 # Force direction change
@@ -30,7 +30,7 @@ class WalkAwayController(AbstractController):
         for direction in choices:
             per_dir_min = 50
             for pac in pacs:
-                test_path, tmp_dist = self.game.map.path_to(pac.pos, self.entity.map_position + direction.vector)
+                tmp_dist = self.game.map.path_distance(pac.pos, self.entity.map_position + direction.vector)
                 if tmp_dist < per_dir_min:
                     per_dir_min = tmp_dist
             if per_dir_min > max_min_square_dist:
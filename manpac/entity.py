@@ -1,10 +1,9 @@
 from manpac.utils import export
 from manpac.direction import Direction
 from manpac.entity_type import EntityType
+from manpac.utils.timers import Timers
 
 import numpy as np
-import operator
-from functools import reduce
 
 
 @export
@@ -19,6 +18,13 @@ class Entity():
     """
 
     def __init__(self, type):
+        # Aggregates of the modifiers, recomputed when they, moving or base_speed change
+        self._modifiers = []
+        self._moving = False
+        self._base_speed = 0
+        self._speed = 0
+        self._tangible = True
+        self._ghost_collide = False
         # The current coordinates of the center of this entity
         self.pos = np.zeros((2,), dtype=np.float64)
         # True if the entity is alive otherwise False
@@ -37,8 +43,12 @@ class Entity():
         self.type = type
         # Holding modifier
         self.holding = None
+        # Number of modifiers used, recorders tell from it when a modifier was used
+        self.modifiers_used = 0
         # List of current modifiers of the entity
         self.modifiers = []
+        # Expiry of the modifiers used by the entity, its clock advances with the updates of the entity
+        self.timers = Timers()
         # Current controller of the entity
         self.controller = None
 
@@ -62,15 +72,64 @@ class Entity():
         """
         return np.floor(self.pos).astype(dtype=np.int)
 
+    @property
+    def modifiers(self):
+        """
+        The modifiers in use by this entity, assign a new list to change them.
+        type: **AbstractModifier list**
+        """
+        return self._modifiers
+
+    @modifiers.setter
+    def modifiers(self, modifiers):
+        self._modifiers = modifiers
+        self._invalidate_()
+
+    @property
+    def moving(self):
+        """
+        True if this entity is moving otherwise False.
+        type: **bool**
+        """
+        return self._moving
+
+    @moving.setter
+    def moving(self, moving):
+        self._moving = moving
+        self._update_speed_()
+
+    @property
+    def base_speed(self):
+        """
+        The speed of this entity without modifiers in cells / tick.
+        type: **float**
+        """
+        return self._base_speed
+
+    @base_speed.setter
+    def base_speed(self, base_speed):
+        self._base_speed = base_speed
+        self._update_speed_()
+
+    def _update_speed_(self):
+        speed = self._base_speed * self._moving
+        for modifier in self._modifiers:
+            speed *= modifier.speed_multiplier
+        self._speed = speed
+
+    def _invalidate_(self):
+        # Recompute the aggregates of the modifiers, to be called whenever they change
+        self._update_speed_()
+        self._tangible = all(modifier.is_tangible for modifier in self._modifiers)
+        self._ghost_collide = any(modifier.can_ghost_collide for modifier in self._modifiers)
+
     @property
     def speed(self):
         """
         The current speed of this entity in cells / tick.
         type: **float**
         """
-        return reduce(operator.mul,
-                      [modifier.speed_multiplier for modifier in self.modifiers],
-                      self.base_speed * self.moving)
+        return self._speed
 
     def face(self, direction):
         """
@@ -146,16 +205,11 @@ class Entity():
         """
         if not self.alive:
             return
-        new_modifiers = []
-        dead_modifiers = []
-        for modifier in self.modifiers:
-            modifier.update(ticks)
-            if modifier.alive:
-                new_modifiers.append(modifier)
-            else:
-                dead_modifiers.append(modifier)
-
-        self.modifiers = new_modifiers
+        # Only the modifiers still in use, they may have been replaced since
+        dead_modifiers = [modifier for modifier in self.timers.advance(ticks) if modifier in self._modifiers]
+        if dead_modifiers:
+            self._modifiers = [modifier for modifier in self._modifiers if modifier not in dead_modifiers]
+            self._invalidate_()
         for modifier in dead_modifiers:
             modifier.on_death(self)
         if self.controller:
@@ -181,7 +235,9 @@ class Entity():
         Use the modifier this entity is holding.
         """
         if self.holding:
-            self.modifiers.append(self.holding)
+            self.modifiers_used += 1
+            self._modifiers.append(self.holding)
+            self._invalidate_()
             if self.controller:
                 self.controller.on_boost_use()
             self.holding.use(self)
@@ -193,9 +249,7 @@ class Entity():
         False if this entity can walk through walls or any entities.
         type: **bool**
         """
-        return reduce(operator.and_,
-                      [modifier.is_tangible for modifier in self.modifiers],
-                      True)
+        return self._tangible
 
     def can_collide_with(self, other):
         """
@@ -210,11 +264,9 @@ class Entity():
         type: **bool**
         """
         if self.type is EntityType.PACMAN or other is EntityType.PACMAN:
-            return self.is_tangible
+            return self._tangible
         else:
-            return reduce(operator.or_,
-                          [modifier.can_ghost_collide for modifier in self.modifiers],
-                          False)
+            return self._ghost_collide
 
     def kill(self):
         """
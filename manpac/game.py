@@ -3,11 +3,27 @@ from manpac.game_status import GameStatus
 from manpac.entity_type import EntityType
 
 import numpy as np
+import math
 
 
 MAX_TICK_UNIT = .5
 
 
+def _grid_key_(entity, cell_size):
+    return (math.floor(entity.pos[0] / cell_size), math.floor(entity.pos[1] / cell_size))
+
+
+def _grid_neighbours_(grid, key, after):
+    # Sorted indices greater than after in the 3x3 block of cells around key
+    x, y = key
+    neighbours = []
+    for dx in (-1, 0, 1):
+        for dy in (-1, 0, 1):
+            neighbours += [index for index in grid.get((x + dx, y + dy), ()) if index > after]
+    neighbours.sort()
+    return neighbours
+
+
 @export
 class Game():
     """
@@ -17,15 +33,37 @@ class Game():
     -----------
     - *entities*: (**Entity iterable**)
         the collection of entities taking part in this game
+    - *seed*: (**int or numpy.random.SeedSequence**)
+        the seed of the randomness of this game, None for a random one (default: None)
     """
 
-    def __init__(self, *entities):
+    def __init__(self, *entities, seed=None):
         self.entities = list(entities)
+        if not isinstance(seed, np.random.SeedSequence):
+            seed = np.random.SeedSequence(seed)
+        # Replaying a game only takes the entropy of its seed sequence
+        self.seed_sequence = seed
+        self.rng = np.random.default_rng(seed)
         self.status = GameStatus.NOT_STARTED
         self.duration = 0
         self.map = None
         self.winner = None
         self._fired_on_end = False
+        # Functions called with the ticks at the end of each update, once the collisions are resolved
+        # and before the on_game_end event when the update ended the game
+        self.tick_listeners = []
+
+    def spawn_rng(self):
+        """
+        Return a new random generator for a component of this game, independent from the others.
+        The components get the same generators in the same order for the same seed.
+
+        Return
+        -----------
+        A new random generator.
+        type: **numpy.random.Generator**
+        """
+        return np.random.default_rng(self.seed_sequence.spawn(1)[0])
 
     def start(self, map):
         """
@@ -76,17 +114,18 @@ class Game():
             return
         if(self.status is GameStatus.FINISHED):
             if not self._fired_on_end:
-                self._fired_on_end = True
-                self._find_winner_()
-                # Fire on_game_end event
-                for entity in self.entities:
-                    if entity.controller:
-                        entity.controller.on_game_end()
+                self._end_()
             return
         self.duration += ticks
+        self._update_(ticks)
+        for listener in self.tick_listeners:
+            listener(ticks)
+        if self.status is GameStatus.FINISHED:
+            self._end_()
 
+    def _update_(self, ticks):
         while ticks > MAX_TICK_UNIT and self.status is GameStatus.ONGOING:
-            self.update(MAX_TICK_UNIT)
+            self._update_(MAX_TICK_UNIT)
             ticks -= MAX_TICK_UNIT
         # Update entities
         for entity in self.entities:
@@ -98,19 +137,36 @@ class Game():
         # Update status
         if self.ghosts <= 1:
             self.status = GameStatus.FINISHED
-            self._fired_on_end = True
-            self._find_winner_()
-            # Fire on_game_end event
-            for entity in self.entities:
-                if entity.controller:
-                    entity.controller.on_game_end()
+
+    def _end_(self):
+        self._fired_on_end = True
+        self._find_winner_()
+        # Fire on_game_end event
+        for entity in self.entities:
+            if entity.controller:
+                entity.controller.on_game_end()
 
     def _check_collisions_(self):
         cpy = self.entities[:]
+        if not cpy:
+            return
+        # Broad phase: a uniform grid where colliding entities are in the same or neighbouring cells
+        cell_size = max(1, 2 * max(entity.size for entity in cpy))
+        keys = [_grid_key_(entity, cell_size) for entity in cpy]
+        grid = {}
+        for index, entity in enumerate(cpy):
+            if entity.alive:
+                grid.setdefault(keys[index], []).append(index)
+
         for i, entity1 in enumerate(cpy):
             if not entity1.alive:
                 continue
-            for entity2 in cpy[i+1:]:
+            candidates = _grid_neighbours_(grid, keys[i], i)
+            k = 0
+            while k < len(candidates):
+                j = candidates[k]
+                k += 1
+                entity2 = cpy[j]
                 if not entity2.alive:
                     continue
                 can_collide = entity1.can_collide_with(entity2.type) or entity2.can_collide_with(entity1.type)
@@ -119,6 +175,16 @@ class Game():
                     self.on_collision(entity1, entity2)
                     if not entity1.alive:
                         break
+                    # Collision resolution may have moved them
+                    for index in (i, j):
+                        key = _grid_key_(cpy[index], cell_size)
+                        if key != keys[index]:
+                            grid[keys[index]].remove(index)
+                            grid.setdefault(key, []).append(index)
+                            keys[index] = key
+                            if index == i:
+                                candidates = _grid_neighbours_(grid, key, j)
+                                k = 0
 
     def on_collision(self, entity1, entity2):
         """
@@ -3,35 +3,22 @@ from manpac.entity_type import EntityType
 from manpac.cell import Cell
 from manpac.direction import Direction
 from manpac.path_graph import PathGraph
+from manpac.utils.timers import Timers
+from manpac.boost_store import BoostStore
 
 
 import numpy as np
+import math
 
 
-def __find_first_unwalkable__(map, considered_pos, speed, v, ticks):
-    times = 0
-    unwalkable = [pos for pos in considered_pos if not map.is_walkable(pos)]
-    while not unwalkable and times - 1 < speed * ticks:
-        for pos in considered_pos:
-            pos += v
-        unwalkable = [pos for pos in considered_pos if not map.is_walkable(pos)]
-        times += 1
-    # Not enough time
-    if times - 1 >= speed * ticks:
-        return considered_pos, True
-    return unwalkable, False
-
-
-def __find_first_walkable__(map, considered_pos, size, speed, v, ticks):
-    unwalkables, timeout = __find_first_unwalkable__(map, considered_pos, speed, v, ticks)
-    for unwalkable in unwalkables:
-        walkable = unwalkable.astype(dtype=np.float)
-        if not timeout:
-            walkable -= v * 1       # Go back one case as it unwalkable
-            walkable += .5          # Center position
-            walkable += v * (.5 - size)  # Center relative to entity size
-        yield walkable
-    return []
+_DIRECTION_VECTORS_ = np.array([direction.vector for direction in Direction])
+_DIRECTION_INDEX_ = {direction: i for i, direction in enumerate(Direction)}
+_DIRECTION_TUPLES_ = [(int(direction.vector[0]), int(direction.vector[1])) for direction in Direction]
+
+
+def _direction_indices_(vectors):
+    # Index in Direction of each (n, 2) direction vector
+    return np.where(vectors[:, 0] != 0, (vectors[:, 0] + 1) // 2, 2 + (vectors[:, 1] + 1) // 2)
 
 
 @export
@@ -54,20 +41,61 @@ class Map():
             self.spawns[type] = np.zeros((2,))
         # The actual terrain
         self.terrain = np.full(shape, Cell.EMPTY)
+        # Incremented when a wall or a DEBUG cell is changed through this map
+        self.terrain_version = 0
         self.path_buffer = np.zeros_like(self.terrain, dtype=np.bool)
         self.max_bounds = np.array(shape) - 1
         # Boost generator
         self.boost_generator = boost_generator
-        # Ghost boosts which are (loc, remaining_duration)
-        self.ghost_boosts = []
-        # Pacman boosts which are (loc, *)
-        self.pacman_boosts = []
+        # Expiry of the ghost boosts, its clock advances with the updates of the map
+        self.timers = Timers()
+        # Ghost boosts which are (loc, remaining_duration) and pacman boosts which are (loc, *)
+        self.boosts = BoostStore(shape, self.timers)
         # Boost livetime in ticks
         self.boost_duration = 600
         # Grab size distance of boost
         self.boost_size = .1
+        # Number of boosts picked up by each entity type
+        self.picked_boosts = {type: 0 for type in EntityType}
+        # Precompute the paths between all junctions on compile, it costs time and memory cubic in their number
+        self.all_pairs_paths = False
+        # MapCache where the compiled data is stored and loaded from, None disables it
+        self.cache = None
 
         self.compiled = False
+        self._wall_distances = None
+        self._closest_walkable = None
+        self._walkable_cells = None
+
+    @property
+    def ghost_boosts(self):
+        """
+        The ghost boosts as Boost views, they turn into pacman boosts when their duration is over.
+        It is set from (loc, remaining_duration) pairs.
+        type: **List[Boost]**
+        """
+        return self.boosts.boosts(EntityType.GHOST)
+
+    @ghost_boosts.setter
+    def ghost_boosts(self, boosts):
+        self.boosts.clear(EntityType.GHOST)
+        for loc, duration in boosts:
+            self.boosts.insert(EntityType.GHOST, loc, duration)
+
+    @property
+    def pacman_boosts(self):
+        """
+        The pacman boosts as Boost views, their remaining_duration is that of the ghost boost they come from.
+        It is set from (loc, remaining_duration) pairs.
+        type: **List[Boost]**
+        """
+        return self.boosts.boosts(EntityType.PACMAN)
+
+    @pacman_boosts.setter
+    def pacman_boosts(self, boosts):
+        self.boosts.clear(EntityType.PACMAN)
+        for loc, duration in boosts:
+            self.boosts.insert(EntityType.PACMAN, loc, duration)
 
     def reset(self):
         """
@@ -75,14 +103,124 @@ class Map():
         """
         self.ghost_boosts = []
         self.pacman_boosts = []
+        self.picked_boosts = {type: 0 for type in EntityType}
 
     def compile(self):
         """
         Compile the map data for optimized pathfinding.
+        If a cache is set the data is loaded from it when this map was already compiled, otherwise it is stored there.
         """
         if not self.compiled:
             self.compiled = True
+            self._walkable_cells = self._build_walkable_cells_()
+            arrays = self.cache.load(self) if self.cache else None
+            if arrays is not None:
+                self._restore_compiled_(arrays)
+                return
+            self._wall_distances = self._build_wall_distances_()
+            self._closest_walkable = self._build_closest_walkable_()
             self.path_graph = PathGraph(self)
+            if self.all_pairs_paths:
+                self.path_graph.compile()
+            if self.cache:
+                self.cache.store(self, self._compiled_arrays_())
+
+    def _compiled_arrays_(self):
+        arrays = {"wall_distances": self._wall_distances}
+        if self._closest_walkable is not None:
+            arrays["closest_walkable_starts"], arrays["closest_walkable_offsets"] = self._closest_walkable
+        for name, array in self.path_graph.arrays.items():
+            arrays["path_graph_" + name] = array
+        return arrays
+
+    def _restore_compiled_(self, arrays):
+        self._wall_distances = arrays["wall_distances"]
+        if "closest_walkable_starts" in arrays:
+            self._closest_walkable = (arrays["closest_walkable_starts"], arrays["closest_walkable_offsets"])
+        graph_arrays = {name[len("path_graph_"):]: array for name, array in arrays.items() if name.startswith("path_graph_")}
+        self.path_graph = PathGraph(self, graph_arrays)
+
+    def _build_wall_distances_(self):
+        walkable = self.terrain != Cell.WALL
+        distances = np.zeros((len(Direction),) + self.terrain.shape, dtype=np.int64)
+        for i, direction in enumerate(Direction):
+            axis = 0 if direction.vector[0] != 0 else 1
+            step = int(direction.vector[axis])
+            length = self.terrain.shape[axis]
+            table = np.moveaxis(distances[i], axis, 0)
+            line_walkable = np.moveaxis(walkable, axis, 0)
+            previous = np.zeros(table.shape[1], dtype=np.int64)
+            for index in (range(length - 1, -1, -1) if step > 0 else range(length)):
+                previous = line_walkable[index] * (previous + 1)
+                table[index] = previous
+        return distances
+
+    @property
+    def wall_distances(self):
+        """
+        For each direction and each cell the number of walkable cells that follow one another from this cell,
+        this cell included, in that direction.
+        It is built by compile and rebuilt when walls are changed through this map.
+        type: **numpy.ndarray**, shape=(4, width, height)
+        """
+        if self._wall_distances is None:
+            self._wall_distances = self._build_wall_distances_()
+        return self._wall_distances
+
+    def _build_closest_walkable_(self):
+        # For each cell of the map and of a one cell border around it, the offsets to the walkable cells
+        # the closest_walkable search reaches first, in the order the search reaches them
+        width, height = self.terrain.shape
+        walkable = self.terrain != Cell.WALL
+        if not walkable.any():
+            return None
+        starts = np.zeros((width + 2) * (height + 2) + 1, dtype=np.int64)
+        offsets = []
+        for x in range(-1, width + 1):
+            for y in range(-1, height + 1):
+                level = [(x, y)]
+                while True:
+                    found = [(cx, cy) for cx, cy in level
+                             if 0 <= cx < width and 0 <= cy < height and walkable[cx, cy]]
+                    if found:
+                        break
+                    # No visited set: cells may be reached again, only the order of first arrival in a level matters
+                    next_level = {}
+                    for cx, cy in level:
+                        for dx, dy in _DIRECTION_TUPLES_:
+                            next_level.setdefault((cx + dx, cy + dy))
+                    level = list(next_level)
+                offsets += [(cx - x, cy - y) for cx, cy in found]
+                index = (x + 1) * (height + 2) + y + 1
+                starts[index + 1] = len(offsets)
+        return starts, np.array(offsets, dtype=_DIRECTION_VECTORS_.dtype)
+
+    @property
+    def closest_walkable_table(self):
+        """
+        For each cell of the map and of a one cell border around it, the candidates of closest_walkable
+        as offsets from that cell, None if there is no walkable cell.
+        The candidates of the cell (x, y) are offsets[starts[i]:starts[i + 1]] where i = (x + 1) * (height + 2) + y + 1.
+        It is built by compile and rebuilt when walls are changed through this map.
+        type: (**numpy.ndarray**, **numpy.ndarray**) or **None**
+        """
+        if self._closest_walkable is None:
+            self._closest_walkable = self._build_closest_walkable_()
+        return self._closest_walkable
+
+    def _build_walkable_cells_(self):
+        return np.flatnonzero(self.terrain != Cell.WALL)
+
+    @property
+    def walkable_cells(self):
+        """
+        The walkable cells of the map as flat indices, the cell (x, y) has the index x * height + y.
+        It is built by compile and rebuilt when walls are changed through this map.
+        type: **numpy.ndarray**
+        """
+        if self._walkable_cells is None:
+            self._walkable_cells = self._build_walkable_cells_()
+        return self._walkable_cells
 
     @property
     def width(self):
@@ -109,21 +247,16 @@ class Map():
         - *ticks*: (**float**)
             the number of ticks elapsed
         """
-        new_boosts = []
-        for boost in self.ghost_boosts:
-            loc, ticks_remaining = boost
-            # Spawn pacman boost
-            if ticks_remaining <= ticks:
-                self.pacman_boosts.append(boost)
-            else:
-                boost[1] -= ticks
-                new_boosts.append(boost)
-        self.ghost_boosts = new_boosts
+        # Expired ghost boosts spawn pacman boosts
+        for boost in self.timers.advance(ticks):
+            loc, remaining = boost.loc, boost.remaining_duration
+            self.boosts.remove(boost)
+            self.boosts.insert(EntityType.PACMAN, loc, remaining + ticks)
         # Add new boosts
         if self.boost_generator:
             new_boosts = self.boost_generator.generate(ticks)
             for loc in new_boosts:
-                self.ghost_boosts.append([loc, self.boost_duration])
+                self.boosts.insert(EntityType.GHOST, loc, self.boost_duration)
 
     def __getitem__(self, key):
         if isinstance(key, np.ndarray):
@@ -133,9 +266,15 @@ class Map():
 
     def __setitem__(self, key, value):
         if isinstance(key, np.ndarray):
-            self.terrain[key[0], key[1]] = value
-        else:
-            self.terrain[key] = value
+            key = (key[0], key[1])
+        if np.any(self.terrain[key] == Cell.WALL) or np.any(np.asarray(value) == Cell.WALL):
+            self._wall_distances = None
+            self._closest_walkable = None
+            self._walkable_cells = None
+            self.terrain_version += 1
+        elif np.any(self.terrain[key] == Cell.DEBUG) or np.any(np.asarray(value) == Cell.DEBUG):
+            self.terrain_version += 1
+        self.terrain[key] = value
 
     def is_walkable(self, pos):
         """
@@ -154,6 +293,24 @@ class Map():
             return False
         return Cell(self[pos]).walkable
 
+    def are_walkable(self, cells):
+        """
+        Vectorized version of is_walkable.
+
+        Parameters
+        -----------
+        - *cells*: (**numpy.ndarray**)
+            the integer positions to look at, the last axis holds the coordinates
+
+        Return
+        -----------
+        For each position True if it is within bounds and walkable.
+        type: **numpy.ndarray**, dtype=bool
+        """
+        x, y = cells[..., 0], cells[..., 1]
+        inside = (x >= 0) & (y >= 0) & (x <= self.max_bounds[0]) & (y <= self.max_bounds[1])
+        return inside & (self.terrain[np.where(inside, x, 0), np.where(inside, y, 0)] != Cell.WALL)
+
     def closest_walkable(self, src):
         """
         Find the closest walkable cell from src.
@@ -168,6 +325,20 @@ class Map():
         The closest walkable cell from src.
         type: **numpy.ndarray**
         """
+        pos = np.round(src)
+        table = self.closest_walkable_table
+        x, y = int(pos[0]) + 1, int(pos[1]) + 1
+        if table is None or not (0 <= x < self.width + 2 and 0 <= y < self.height + 2):
+            return self.__search_closest_walkable__(src)
+        starts, offsets = table
+        index = x * (self.height + 2) + y
+        candidates = pos + offsets[starts[index]:starts[index + 1]]
+        if len(candidates) == 1:
+            return candidates[0]
+        # First of the closest, as the search does
+        return candidates[np.argmin(np.sum(np.square(src - candidates), axis=1))]
+
+    def __search_closest_walkable__(self, src):
         closest = None
         distance = 1e10
 
@@ -229,6 +400,24 @@ class Map():
         """
         return self.path_graph.path(src, dst)
 
+    def path_distance(self, src, dst):
+        """
+        Return the length of the shortest walkable path from src to dst.
+
+        Parameters
+        -----------
+        - *src*: (**numpy.ndarray**)
+            the source position
+        - *dst*: (**numpy.ndarray**)
+            the destination position, it must be walkable
+
+        Return
+        -----------
+        The length of the path, 1e12 if there is none.
+        type: **float**
+        """
+        return self.path_graph.distance(src, dst)
+
     def how_far(self, entity, max_distance):
         """
         Return how far the specified entity can move in their current direction.
@@ -255,42 +444,135 @@ class Map():
             next = np.clip(entity.pos + v * max_distance, entity.size, self.max_bounds + 1 - entity.size)
             maxi = min(np.max(v * (next - entity.pos)) / speed, max_distance)
         else:
-            # Finds first unwalkable tile
-            cells_occupied_by_entity = self.__cells_occupied_by_entity__(entity)
-            walkables = __find_first_walkable__(self, cells_occupied_by_entity, entity.size, 1, v, max_distance)
-            # Now walkable is target coordinates
-            maxi = -1
-            for walkable in walkables:
-                diff = np.max((walkable - entity.pos) * v)
-                if diff > 0:
-                    if maxi < 0:
-                        maxi = max_distance
-                    maxi = min(diff, maxi)
-            if maxi < 0:
-                maxi = 0
+            maxi = self._how_far_tangible_(entity, max_distance)
         return maxi
 
+    def _how_far_tangible_(self, entity, max_distance):
+        index = _DIRECTION_INDEX_[entity.direction]
+        table = self.wall_distances[index]
+        width, height = self.terrain.shape
+        vx, vy = _DIRECTION_TUPLES_[index]
+        px, py = float(entity.pos[0]), float(entity.pos[1])
+        size = entity.size
+        # Cells occupied by the entity and number of steps before each one is blocked
+        cells = []
+        for dx, dy in _DIRECTION_TUPLES_:
+            x = int(px + dx * size * .99)
+            y = int(py + dy * size * .99)
+            steps = int(table[x, y]) if 0 <= x < width and 0 <= y < height else 0
+            cells.append((x, y, steps))
+        first = min(steps for (x, y, steps) in cells)
+        timeout = first - 1 >= max_distance
+        if timeout:
+            first = math.ceil(max_distance) + 1
+        maxi = -1
+        for x, y, steps in cells:
+            if not timeout and steps != first:
+                continue
+            wx, wy = float(x + first * vx), float(y + first * vy)
+            if not timeout:
+                # Go back one cell as it is unwalkable then center relative to entity size
+                wx, wy = wx - vx + .5 + vx * (.5 - size), wy - vy + .5 + vy * (.5 - size)
+            diff = max((wx - px) * vx, (wy - py) * vy)
+            if diff > 0:
+                if maxi < 0:
+                    maxi = max_distance
+                maxi = min(diff, maxi)
+        return max(maxi, 0)
+
+    def _batch_cells_occupied_(self, pos, sizes):
+        # Same cells as __cells_occupied_by_entity__ with shape (n, 4, 2)
+        offsets = _DIRECTION_VECTORS_[None, :, :] * sizes[:, None, None] * .99
+        return (pos[:, None, :] + offsets).astype(dtype=np.int64)
+
+    def _batch_steps_to_wall_(self, cells, directions):
+        # Number of steps before each cell of the (n, k) cells meets an unwalkable cell
+        x, y = cells[..., 0], cells[..., 1]
+        inside = (x >= 0) & (y >= 0) & (x <= self.max_bounds[0]) & (y <= self.max_bounds[1])
+        steps = self.wall_distances[directions[:, None], np.where(inside, x, 0), np.where(inside, y, 0)]
+        return np.where(inside, steps, 0)
+
+    def how_far_batch(self, pos, vectors, speeds, sizes, max_distances, tangible):
+        """
+        Vectorized version of how_far for many entities at once.
+
+        Parameters
+        -----------
+        - *pos*: (**numpy.ndarray**)
+            the (n, 2) positions of the entities
+        - *vectors*: (**numpy.ndarray**)
+            the (n, 2) direction vectors of the entities
+        - *speeds*: (**numpy.ndarray**)
+            the (n,) current speeds of the entities
+        - *sizes*: (**numpy.ndarray**)
+            the (n,) sizes of the entities
+        - *max_distances*: (**numpy.ndarray**)
+            the (n,) maximum distances to be considered
+        - *tangible*: (**numpy.ndarray**)
+            the (n,) tangibility of the entities
+
+        Return
+        ----------
+        The maximum distance each entity can continue in their direction before being blocked.
+        type: **numpy.ndarray**
+        """
+        out = np.zeros(pos.shape[0])
+        active = speeds > 0
+        # Intangible entities are only stopped by the bounds of the map
+        intangible = active & ~tangible
+        if intangible.any():
+            p, v, s = pos[intangible], vectors[intangible], sizes[intangible, None]
+            next = np.clip(p + v * max_distances[intangible, None], s, self.max_bounds + 1 - s)
+            out[intangible] = np.minimum(np.max(v * (next - p), axis=1) / speeds[intangible],
+                                         max_distances[intangible])
+        tangible = active & tangible
+        if not tangible.any():
+            return out
+        p, s, max_distance = pos[tangible], sizes[tangible, None, None], max_distances[tangible]
+        v = vectors[tangible][:, None, :]
+        cells = self._batch_cells_occupied_(p, sizes[tangible])
+        steps = self._batch_steps_to_wall_(cells, _direction_indices_(vectors[tangible]))
+        first = np.min(steps, axis=1)
+        timeout = first - 1 >= max_distance
+        # Same rules as _how_far_tangible_
+        reached = np.where(timeout, np.ceil(max_distance) + 1, first).astype(dtype=np.int64)
+        walkable = (cells + reached[:, None, None] * v).astype(dtype=np.float64)
+        adjusted = walkable - v * 1
+        adjusted += .5
+        adjusted += v * (.5 - s)
+        walkable = np.where(timeout[:, None, None], walkable, adjusted)
+        considered = timeout[:, None] | (steps == first[:, None])
+        diff = (walkable - p[:, None, :]) * v
+        diff = np.maximum(diff[:, :, 0], diff[:, :, 1])
+        diff = np.where(considered & (diff > 0), diff, np.inf)
+        closest = np.min(diff, axis=1)
+        out[tangible] = np.where(np.isinf(closest), 0, np.minimum(closest, max_distance))
+        return out
+
     def _do_boost_pickup_(self, entity, distance_traveled):
         v = entity.direction.vector
         v_orth = entity.direction.rot90(1).vector
-        # Pick up boosts
-        boosts = self.ghost_boosts if entity.type is EntityType.GHOST else self.pacman_boosts
-        for index, (loc, t) in enumerate(boosts):
+        radius = entity.size + self.boost_size
+        # Pick up boosts, only those in the cells swept by the entity can be
+        boosts = self.boosts.swept(entity.type, entity.pos, entity.direction, distance_traveled + radius, radius)
+        for boost in boosts:
+            loc, t = boost.loc, boost.remaining_duration
             vector = (loc + .5) - entity.pos
             # if not in the right direction
             if (np.sign(vector) != v).all():
                 continue
             # If on the side direction entity is not big enough to walk on it
-            if np.max(np.abs(vector * v_orth)) > entity.size + self.boost_size:
+            if np.max(np.abs(vector * v_orth)) > radius:
                 continue
             distance = np.max(vector * v) - entity.size - self.boost_size
             if distance <= distance_traveled:
                 if self.boost_generator:
                     modifier = self.boost_generator.make_modifier(entity, loc)
                     entity.pickup(modifier)
-                boosts.pop(index)
+                self.boosts.remove(boost)
+                self.picked_boosts[entity.type] += 1
                 if entity.type is EntityType.GHOST:
-                    self.pacman_boosts.append([loc, t])
+                    self.boosts.insert(EntityType.PACMAN, loc, t)
                 return True
         return False
 
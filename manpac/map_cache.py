@@ -0,0 +1,153 @@
+from manpac.utils import export
+from manpac.entity_type import EntityType
+
+import numpy as np
+import hashlib
+import os
+import struct
+import tempfile
+import zipfile
+
+
+# Bump when the compiled arrays change, older files are then ignored
+FORMAT_VERSION = 1
+
+_HEADER_READERS_ = {
+    (1, 0): np.lib.format.read_array_header_1_0,
+    (2, 0): np.lib.format.read_array_header_2_0
+}
+
+
+def _load_npz_(path):
+    # Memory map every member of an uncompressed .npz file
+    arrays = {}
+    with zipfile.ZipFile(path) as archive, open(path, 'rb') as file:
+        for info in archive.infolist():
+            if info.compress_type != zipfile.ZIP_STORED:
+                raise ValueError("{} is compressed and can not be memory mapped".format(path))
+            # Skip the local file header, its extra field can differ from the central directory one
+            file.seek(info.header_offset + 26)
+            name_length, extra_length = struct.unpack("<HH", file.read(4))
+            file.seek(info.header_offset + 30 + name_length + extra_length)
+            version = np.lib.format.read_magic(file)
+            shape, fortran_order, dtype = _HEADER_READERS_[version](file)
+            name = info.filename[:-len(".npy")]
+            if dtype.hasobject:
+                raise ValueError("{} holds objects which can not be memory mapped".format(name))
+            if 0 in shape:
+                arrays[name] = np.empty(shape, dtype=dtype)
+            else:
+                arrays[name] = np.memmap(path, dtype=dtype, mode='r', offset=file.tell(), shape=shape,
+                                         order='F' if fortran_order else 'C')
+    return arrays
+
+
+def _read_only_(array):
+    # A copy that the maps sharing it can not modify
+    array = np.array(array)
+    array.setflags(write=False)
+    return array
+
+
+@export
+class MapCache():
+    """
+    Store the compiled data of maps on disk so that compiling the same map again only loads it.
+    Files are named after a hash of the terrain and the spawn points, so a changed map never loads stale data.
+    Loaded arrays are read-only memory maps.
+
+    Parameters
+    -----------
+    - *directory*: (**str**)
+        the directory where compiled maps are stored, it is created if needed.
+        None to only keep them in memory for the maps compiled later by this process.
+    """
+
+    def __init__(self, directory=None):
+        self.directory = directory
+        if directory is not None:
+            os.makedirs(directory, exist_ok=True)
+        # Arrays already loaded by this cache
+        self._loaded = {}
+
+    def key(self, map):
+        """
+        Compute the key of the specified map.
+
+        Parameters
+        -----------
+        - *map*: (**Map**)
+            the map
+
+        Return
+        -----------
+        The hexadecimal hash of the map's terrain and spawns.
+        type: **str**
+        """
+        digest = hashlib.sha1()
+        digest.update("{}:{}:{}:{}".format(FORMAT_VERSION, map.terrain.shape, map.terrain.dtype.str,
+                                           map.all_pairs_paths).encode())
+        digest.update(np.ascontiguousarray(map.terrain).tobytes())
+        for type in EntityType:
+            spawn = np.ascontiguousarray(map.spawns[type])
+            digest.update(spawn.dtype.str.encode())
+            digest.update(spawn.tobytes())
+        return digest.hexdigest()
+
+    def path(self, map):
+        """
+        The file where the specified map is stored, only its key if the maps are kept in memory.
+        type: **str**
+        """
+        if self.directory is None:
+            return self.key(map)
+        return os.path.join(self.directory, "{}.npz".format(self.key(map)))
+
+    def load(self, map):
+        """
+        Load the compiled arrays of the specified map.
+
+        Parameters
+        -----------
+        - *map*: (**Map**)
+            the map
+
+        Return
+        -----------
+        The compiled arrays or None if the map was never stored or its file can not be read.
+        type: **Dict[str, numpy.ndarray]**
+        """
+        path = self.path(map)
+        if path not in self._loaded:
+            if self.directory is None or not os.path.exists(path):
+                return None
+            try:
+                self._loaded[path] = _load_npz_(path)
+            except (OSError, ValueError, KeyError, zipfile.BadZipFile):
+                return None
+        return self._loaded[path]
+
+    def store(self, map, arrays):
+        """
+        Store the compiled arrays of the specified map.
+
+        Parameters
+        -----------
+        - *map*: (**Map**)
+            the map
+        - *arrays*: (**Dict[str, numpy.ndarray]**)
+            its compiled arrays
+        """
+        path = self.path(map)
+        if self.directory is None:
+            self._loaded[path] = {name: _read_only_(array) for name, array in arrays.items()}
+            return
+        # Write then rename so that concurrent runs never read a partial file
+        handle, tmp_path = tempfile.mkstemp(suffix=".npz", dir=self.directory)
+        try:
+            with os.fdopen(handle, 'wb') as file:
+                np.savez(file, **arrays)
+            os.replace(tmp_path, path)
+        except BaseException:
+            os.remove(tmp_path)
+            raise
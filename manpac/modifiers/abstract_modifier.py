@@ -20,8 +20,28 @@ class AbstractModifier(ABC):
     def __init__(self, game, duration):
         self.game = game
         self.used = False
-        # Remaining duration of the modifier in ticks
-        self.remaining_duration = duration
+        self._duration = duration
+        # Once used, it expires with a timer of the entity it was used on
+        self._timers = None
+        self._timer = None
+
+    @property
+    def remaining_duration(self):
+        """
+        Remaining duration of this modifier in ticks, it decreases once it is used.
+        type: **float**
+        """
+        if self._timer is None:
+            return self._duration
+        return self._timers.remaining(self._timer)
+
+    @remaining_duration.setter
+    def remaining_duration(self, duration):
+        if self._timer is None:
+            self._duration = duration
+        else:
+            self._timers.cancel(self._timer)
+            self._timer = self._timers.schedule(duration, self)
 
     @property
     def speed_multiplier(self):
@@ -65,6 +85,8 @@ class AbstractModifier(ABC):
             the entity this modifier is being used on
         """
         self.used = True
+        self._timers = entity.timers
+        self._timer = entity.timers.schedule(self._duration, self)
         self.on_use(entity)
 
     def on_use(self, entity):
@@ -94,15 +116,3 @@ class AbstractModifier(ABC):
     def on_pickup(self, entity):
         if entity.type is EntityType.PACMAN:
             entity.use_modifier()
-
-    def update(self, ticks):
-        """
-        Update this entity for the specified number of ticks.
-
-        Parameters
-        -----------
-        - *ticks*: (**float**)
-            the number of ticks elapsed
-        """
-        if self.used:
-            self.remaining_duration -= ticks
@@ -1,8 +1,10 @@
 from manpac.utils import export
 from manpac.direction import Direction
+from manpac.cell import Cell
 from queue import PriorityQueue
 
 
+import math
 import numpy as np
 
 
@@ -15,15 +17,68 @@ class PathGraph():
     -----------
     - *map*: (**Map**)
         the map this graph will represent
+    - *arrays*: (**Dict[str, numpy.ndarray]**)
+        the arrays of a previous graph of the same map (see arrays), if given the graph is restored instead of built
     """
 
-    def __init__(self, map):
+    def __init__(self, map, arrays=None):
         self.map = map
         self.nodes = np.zeros_like(map.terrain, dtype=np.int) - 1
         self.nodes_data = []
         self.buffer = np.zeros_like(self.nodes, dtype=np.bool)
         self.debug = False
-        self._build_()
+        self.compiled = False
+        if arrays is None:
+            self._build_()
+        else:
+            self._restore_(arrays)
+
+    @property
+    def arrays(self):
+        """
+        The arrays from which this graph can be restored, compiled tables included.
+        type: **Dict[str, numpy.ndarray]**
+        """
+        n = len(self.nodes_data)
+        positions = np.array([data['pos'] for data in self.nodes_data], dtype=np.int64).reshape((n, 2))
+        neighbours = np.full((n, len(Direction)), -1, dtype=np.int64)
+        neighbour_distances = np.zeros((n, len(Direction)), dtype=np.int64)
+        for i, data in enumerate(self.nodes_data):
+            for k, direction in enumerate(Direction):
+                dst_info = data.get(direction, None)
+                if dst_info is None:
+                    continue
+                dst, distance = dst_info
+                neighbours[i, k] = self.nodes[dst[0], dst[1]]
+                neighbour_distances[i, k] = distance
+        arrays = {
+            "nodes": self.nodes,
+            "positions": positions,
+            "neighbours": neighbours,
+            "neighbour_distances": neighbour_distances
+        }
+        if self.compiled:
+            arrays["distances"] = self.distances
+            arrays["next_hops"] = self.next_hops
+            arrays["cell_nodes"] = self.cell_nodes
+        return arrays
+
+    def _restore_(self, arrays):
+        self.nodes = arrays["nodes"]
+        positions = arrays["positions"]
+        for i, pos in enumerate(positions):
+            data = {'pos': np.array(pos)}
+            for k, direction in enumerate(Direction):
+                j = arrays["neighbours"][i, k]
+                if j >= 0:
+                    data[direction] = [np.array(positions[j]), int(arrays["neighbour_distances"][i, k])]
+            self.nodes_data.append(data)
+        if "distances" in arrays:
+            self.node_positions = positions
+            self.distances = arrays["distances"]
+            self.next_hops = arrays["next_hops"]
+            self.cell_nodes = arrays["cell_nodes"]
+            self.compiled = True
 
     def _is_node_candidate_(self, pos):
         if not self.map.is_walkable(pos):
@@ -90,6 +145,76 @@ class PathGraph():
                 self._link_(origin, current, d, dist)
                 nodes.append(current)
 
+    def compile(self):
+        """
+        Precompute the distances and the next hops between all pairs of nodes as well as the closest nodes of each cell.
+        Afterwards path and distance no longer need any search.
+        """
+        n = len(self.nodes_data)
+        self.node_positions = np.array([data['pos'] for data in self.nodes_data], dtype=np.int64).reshape((n, 2))
+        distances = np.full((n, n), np.inf)
+        next_hops = np.full((n, n), -1, dtype=np.int64)
+        for i, data in enumerate(self.nodes_data):
+            distances[i, i] = 0
+            next_hops[i, i] = i
+            for direction in Direction:
+                dst_info = data.get(direction, None)
+                if dst_info is None:
+                    continue
+                dst, distance = dst_info
+                j = self.nodes[dst[0], dst[1]]
+                if distance < distances[i, j]:
+                    distances[i, j] = distance
+                    next_hops[i, j] = j
+        # Floyd-Warshall
+        for k in range(n):
+            through = distances[:, k, None] + distances[None, k, :]
+            better = through < distances
+            distances = np.where(better, through, distances)
+            next_hops = np.where(better, next_hops[:, k, None], next_hops)
+        self.distances = distances
+        self.next_hops = next_hops
+        self.cell_nodes = self._build_cell_nodes_()
+        self.compiled = True
+
+    def _build_cell_nodes_(self):
+        # For each direction the first node met from each cell before an unwalkable cell
+        walkable = self.map.terrain != Cell.WALL
+        first_nodes = []
+        for direction in Direction:
+            axis = 0 if direction.vector[0] != 0 else 1
+            step = int(direction.vector[axis])
+            length = self.nodes.shape[axis]
+            hits = np.full_like(self.nodes, -1)
+            table = np.moveaxis(hits, axis, 0)
+            line_nodes = np.moveaxis(self.nodes, axis, 0)
+            line_walkable = np.moveaxis(walkable, axis, 0)
+            previous = np.full(table.shape[1], -1)
+            for index in (range(length - 1, -1, -1) if step > 0 else range(length)):
+                previous = np.where(line_nodes[index] >= 0, line_nodes[index],
+                                    np.where(line_walkable[index], previous, -1))
+                table[index] = previous
+            # Shift to start from the neighbour cell
+            shifted = np.full_like(hits, -1)
+            if step > 0:
+                np.moveaxis(shifted, axis, 0)[:-1] = table[1:]
+            else:
+                np.moveaxis(shifted, axis, 0)[1:] = table[:-1]
+            first_nodes.append(shifted)
+        cell_nodes = np.stack(first_nodes, axis=-1)
+        # A node is its only closest node
+        is_node = self.nodes >= 0
+        cell_nodes[is_node] = -1
+        cell_nodes[is_node, 0] = self.nodes[is_node]
+        return cell_nodes
+
+    def _closest_node_indices_(self, pos):
+        map_pos = np.floor(pos).astype(dtype=np.int64)
+        if (map_pos < 0).any() or (map_pos > self.map.max_bounds).any():
+            return None
+        indices = self.cell_nodes[map_pos[0], map_pos[1]]
+        return indices[indices >= 0]
+
     def closest_nodes(self, pos):
         """
         Find the closest reachable nodes to the specified position.
@@ -102,7 +227,11 @@ class PathGraph():
         The list of the closest reachable nodes surrounding the position.
         type: **List[numpy.ndarray]**
         """
-        map_pos = np.floor(pos).astype(dtype=np.int)
+        if self.compiled:
+            indices = self._closest_node_indices_(pos)
+            if indices is not None:
+                return list(self.node_positions[indices])
+        map_pos = np.floor(pos).astype(dtype=np.int64)
         # If current pos is node then return it
         if self.nodes[map_pos[0], map_pos[1]] >= 0:
             return [map_pos]
@@ -116,6 +245,26 @@ class PathGraph():
                 nodes.append(current)
         return nodes
 
+    def _straight_distance_(self, src, dst):
+        # Cells on a walkable line are linked by it, the nodes only link the other ones
+        src_x, src_y = math.floor(src[0]), math.floor(src[1])
+        dst_x, dst_y = math.floor(dst[0]), math.floor(dst[1])
+        if src_x == dst_x:
+            line = self._terrain_line_(src_x, min(src_y, dst_y), max(src_y, dst_y), self.map.terrain)
+        elif src_y == dst_y:
+            line = self._terrain_line_(src_y, min(src_x, dst_x), max(src_x, dst_x), self.map.terrain.T)
+        else:
+            return None
+        if line is None or (line == Cell.WALL).any():
+            return None
+        return np.sum(np.abs(dst - src))
+
+    @staticmethod
+    def _terrain_line_(row, start, stop, terrain):
+        if row < 0 or row >= terrain.shape[0] or start < 0 or stop >= terrain.shape[1]:
+            return None
+        return terrain[row, start:stop + 1]
+
     def path(self, src, dst):
         """
         Find a list of walkable tiles from src to dst.
@@ -133,6 +282,16 @@ class PathGraph():
         A list of tiles that needs to be reached where a direction change occurs if a path exists and the distance.
         type: **Tuple[List[numpy.ndarray], float]**
         """
+        straight = self._straight_distance_(src, dst)
+        if straight is not None:
+            return [dst], straight
+        if self.compiled:
+            pair = self._best_node_pair_(src, dst)
+            if pair is not None:
+                src_index, dst_index, distance = pair
+                best = self._node_index_path_(src_index, dst_index) if src_index >= 0 else []
+                best.append(dst)
+                return best, distance
         src_nodes = self.closest_nodes(src)
         dst_nodes = self.closest_nodes(dst)
         best = []
@@ -148,6 +307,58 @@ class PathGraph():
         best.append(dst)
         return best, best_distance
 
+    def _best_node_pair_(self, src, dst):
+        # Same choice as path: first pair with the smallest distance
+        src_indices = self._closest_node_indices_(src)
+        dst_indices = self._closest_node_indices_(dst)
+        if src_indices is None or dst_indices is None:
+            return None
+        if src_indices.size == 0 or dst_indices.size == 0:
+            return -1, -1, 1e12
+        distances = self.distances[src_indices[:, None], dst_indices[None, :]]
+        distances = distances + np.sum(np.abs(self.node_positions[src_indices] - src), axis=1)[:, None]
+        distances = distances + np.sum(np.abs(self.node_positions[dst_indices] - dst), axis=1)[None, :]
+        best = np.argmin(distances)
+        i, j = np.unravel_index(best, distances.shape)
+        if not distances[i, j] < 1e12:
+            return -1, -1, 1e12
+        return src_indices[i], dst_indices[j], distances[i, j]
+
+    def _node_index_path_(self, i, j):
+        if i == j:
+            return [self.node_positions[i], self.node_positions[j]]
+        path = [self.node_positions[i]]
+        while i != j:
+            i = self.next_hops[i, j]
+            path.append(self.node_positions[i])
+        return path
+
+    def distance(self, src, dst):
+        """
+        Return the length of the shortest path from src to dst.
+        When compiled it only costs a few table lookups.
+
+        Parameters
+        -----------
+        - *src*: (**numpy.ndarray**)
+            the source position
+        - *dst*: (**numpy.ndarray**)
+            the destination position, it must be walkable
+
+        Return
+        -----------
+        The length of the path, 1e12 if there is none.
+        type: **float**
+        """
+        straight = self._straight_distance_(src, dst)
+        if straight is not None:
+            return straight
+        if self.compiled:
+            pair = self._best_node_pair_(src, dst)
+            if pair is not None:
+                return pair[2]
+        return self.path(src, dst)[1]
+
     def node_path(self, src_node, dst_node):
         """
         Find a list of walkable tiles from src to dst.
@@ -168,6 +379,12 @@ class PathGraph():
         max_d = np.sum(np.abs(dst_node - src_node))
         if max_d == 0:
             return [src_node, dst_node], 0
+        if self.compiled:
+            i = self.nodes[src_node[0], src_node[1]]
+            j = self.nodes[dst_node[0], dst_node[1]]
+            if np.isinf(self.distances[i, j]):
+                return [], 1e12
+            return self._node_index_path_(i, j), self.distances[i, j]
         self.buffer[:, :] = False
         paths = PriorityQueue()
         path_num = 1
@@ -175,6 +392,12 @@ class PathGraph():
         paths.put([0, 0, src_node, [src_node]])
         while not paths.empty():
             distance, p, pos, path = paths.get()
+            # The links have different lengths, a node is only at its shortest distance once taken out
+            if (pos == dst_node).all():
+                return path, distance
+            if self.buffer[pos[0], pos[1]]:
+                continue
+            self.buffer[pos[0], pos[1]] = True
             ipos = self.nodes[pos[0], pos[1]]
             node_data = self.nodes_data[ipos]
             for direction in Direction:
@@ -184,11 +407,7 @@ class PathGraph():
                 new_pos, added_distance = dst_info
                 if self.buffer[new_pos[0], new_pos[1]]:
                     continue
-                self.buffer[new_pos[0], new_pos[1]] = True
                 new_distance = distance + added_distance
-                if (new_pos == dst_node).all():
-                    path.append(dst_node)
-                    return path, new_distance
                 new_path = path[:]
                 new_path.append(new_pos)
                 paths.put([new_distance, path_num, new_pos, new_path])
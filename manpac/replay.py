@@ -0,0 +1,289 @@
+from manpac.utils import export
+from manpac.entity import Entity
+from manpac.entity_type import EntityType
+from manpac.direction import Direction
+from manpac.map_cache import MapCache
+from manpac.controllers.abstract_controller import AbstractController
+from manpac.game import Game
+
+import numpy as np
+import struct
+import zlib
+
+
+_MAGIC_ = b"MPRP"
+FORMAT_VERSION = 2
+
+# A decision is one byte: the direction in its 2 low bits, whether the entity was moving in the third one
+# and the number of modifiers it used in the tick in the others
+_MOVING_ = 0x04
+_USES_SHIFT_ = 3
+_MAX_USES_ = 0xff >> _USES_SHIFT_
+
+# The streams are runs of ticks with the same value: their count followed by the value
+_COUNT_ = struct.Struct("<H")
+_MAX_COUNT_ = 2**16 - 1
+_TICKS_ = struct.Struct("<d")
+_DECISION_ = struct.Struct("<B")
+_LENGTH_ = struct.Struct("<I")
+_DIRECTIONS_ = list(Direction)
+_DIRECTION_CODES_ = {direction: code for code, direction in enumerate(_DIRECTIONS_)}
+_TYPES_ = list(EntityType)
+
+
+def _append_(runs, value):
+    if runs and runs[-1][1] == value and runs[-1][0] < _MAX_COUNT_:
+        runs[-1][0] += 1
+    else:
+        runs.append([1, value])
+
+
+def _encode_runs_(runs, packer):
+    stream = bytearray()
+    for count, value in runs:
+        stream += _COUNT_.pack(count) + packer.pack(value)
+    return stream
+
+
+def _decode_runs_(stream, unpacker):
+    values = []
+    offset = 0
+    while offset < len(stream):
+        count, = _COUNT_.unpack_from(stream, offset)
+        value, = unpacker.unpack_from(stream, offset + _COUNT_.size)
+        values += [value] * count
+        offset += _COUNT_.size + unpacker.size
+    return values
+
+
+@export
+class ReplayRecorder():
+    """
+    Record a game so that a Replay can play it again.
+    Only the seed of the game, a hash of its map, the ticks of its updates and the decisions of the controllers
+    at the end of each of them are recorded: the direction and moving state of their entity and the modifiers it used.
+    The rest of the game follows from them.
+    The game is played again exactly when its controllers decide once per update, moving their entity
+    with all the ticks of the update, as human controllers do.
+    Those moving it several times in an update are played again from their last decision of each tick.
+    Entities moved by messages from a peer, as those of net controllers, can not be recorded.
+
+    Parameters
+    -----------
+    - *game*: (**Game**)
+        the game to record, its controllers are attached and it is not started yet
+    """
+
+    def __init__(self, game):
+        self.game = game
+        self.map_key = None
+        # Runs of [count, value] of the ticks of the updates and of the decisions of each entity
+        self.frames = []
+        self.decisions = [[] for entity in game.entities]
+        self._modifiers_used = [entity.modifiers_used for entity in game.entities]
+        self._alive = None
+        self._positions = None
+        game.tick_listeners.append(self._on_tick_)
+
+    def _on_tick_(self, ticks):
+        game = self.game
+        if self.map_key is None:
+            self.map_key = MapCache().key(game.map)
+        _append_(self.frames, ticks)
+        for i, (entity, decisions) in enumerate(zip(game.entities, self.decisions)):
+            if not entity.controller:
+                continue
+            moving = entity.moving
+            # Killing an entity stops it, it was moving in the tick it died in if it moved
+            if self._alive is not None and self._alive[i] and not entity.alive:
+                moving = bool((entity.pos != self._positions[i]).any())
+            uses = min(entity.modifiers_used - self._modifiers_used[i], _MAX_USES_)
+            self._modifiers_used[i] = entity.modifiers_used
+            _append_(decisions, _DIRECTION_CODES_[entity.direction] | (_MOVING_ if moving else 0) | (uses << _USES_SHIFT_))
+        self._alive = [entity.alive for entity in game.entities]
+        self._positions = [entity.pos.copy() for entity in game.entities]
+
+    def encode(self):
+        """
+        Encode the recording of the game so far.
+
+        Return
+        -----------
+        The compressed recording.
+        type: **bytes**
+        """
+        seed = self.game.seed_sequence
+        if not isinstance(seed.entropy, int):
+            raise ValueError("only games seeded by an integer can be recorded")
+        if self.map_key is None:
+            raise ValueError("the game was not updated since it started")
+        entropy = str(seed.entropy).encode()
+        body = bytearray()
+        body += struct.pack("<H", len(entropy)) + entropy
+        body += struct.pack("<B{}I".format(len(seed.spawn_key)), len(seed.spawn_key), *seed.spawn_key)
+        body += self.map_key.encode()
+        body += struct.pack("<B", len(self.game.entities))
+        for entity in self.game.entities:
+            body += struct.pack("<BB", _TYPES_.index(entity.type), entity.controller is not None)
+        streams = [_encode_runs_(self.frames, _TICKS_)] + \
+            [_encode_runs_(decisions, _DECISION_) for decisions in self.decisions]
+        for stream in streams:
+            body += _LENGTH_.pack(len(stream)) + stream
+        return _MAGIC_ + struct.pack("<B", FORMAT_VERSION) + zlib.compress(bytes(body), 9)
+
+    def save(self, path):
+        """
+        Save the recording of the game so far to the specified file.
+
+        Parameters
+        -----------
+        - *path*: (**str**)
+            the file
+        """
+        with open(path, "wb") as file:
+            file.write(self.encode())
+
+
+@export
+class ReplayController(AbstractController):
+    """
+    A controller that makes the recorded decisions of another one again, one by tick of the game.
+
+    Parameters
+    -----------
+    - *game*: (**Game**)
+        the game this controller is being used in
+    - *decisions*: (**List[int]**)
+        the recorded decision of the controller at each tick
+    """
+
+    def __init__(self, game, decisions):
+        super(ReplayController, self).__init__(game)
+        self.decisions = decisions
+        self.tick = 0
+        # Modifiers left to use in this tick, once the entity holds one
+        self.uses = decisions[0] >> _USES_SHIFT_ if decisions else 0
+        game.tick_listeners.append(self._on_tick_)
+
+    def _on_tick_(self, ticks):
+        self.tick += 1
+        self.uses = self.decisions[self.tick] >> _USES_SHIFT_ if self.tick < len(self.decisions) else 0
+
+    def update(self, ticks):
+        if self.tick >= len(self.decisions):
+            return
+        code = self.decisions[self.tick]
+        if self.uses and self.entity.holding:
+            self.uses -= 1
+            self.entity.use_modifier()
+        self.entity.face(_DIRECTIONS_[code & 0x03])
+        self.entity.moving = bool(code & _MOVING_)
+        self.game.map.move(self.entity, ticks)
+
+
+@export
+class Replay():
+    """
+    A recorded game that can be played again, as fast as it can be simulated.
+
+    Parameters
+    -----------
+    - *data*: (**bytes**)
+        the recording (see ReplayRecorder)
+    """
+
+    def __init__(self, data):
+        if data[:len(_MAGIC_)] != _MAGIC_:
+            raise ValueError("not a replay")
+        version = data[len(_MAGIC_)]
+        if version != FORMAT_VERSION:
+            raise ValueError("unsupported replay version {}".format(version))
+        body = zlib.decompress(data[len(_MAGIC_) + 1:])
+        offset = 0
+        length, = struct.unpack_from("<H", body, offset)
+        offset += 2
+        entropy = int(body[offset:offset + length].decode())
+        offset += length
+        keys = body[offset]
+        spawn_key = struct.unpack_from("<{}I".format(keys), body, offset + 1)
+        offset += 1 + 4 * keys
+        self.seed_sequence = np.random.SeedSequence(entropy, spawn_key=spawn_key)
+        self.map_key = body[offset:offset + 40].decode()
+        offset += 40
+        self.types = []
+        # Whether each entity had a controller
+        self.controlled = []
+        for i in range(body[offset]):
+            type, controlled = struct.unpack_from("<BB", body, offset + 1 + 2 * i)
+            self.types.append(_TYPES_[type])
+            self.controlled.append(bool(controlled))
+        offset += 1 + 2 * len(self.types)
+        streams = []
+        for i in range(len(self.types) + 1):
+            length, = _LENGTH_.unpack_from(body, offset)
+            offset += _LENGTH_.size
+            streams.append(body[offset:offset + length])
+            offset += length
+        # The ticks of each update and the decisions of each entity at its end
+        self.frames = _decode_runs_(streams[0], _TICKS_)
+        self.decisions = [_decode_runs_(stream, _DECISION_) for stream in streams[1:]]
+
+    @staticmethod
+    def load(path):
+        """
+        Load the replay saved in the specified file.
+
+        Parameters
+        -----------
+        - *path*: (**str**)
+            the file
+
+        Return
+        -----------
+        The replay.
+        type: **Replay**
+        """
+        with open(path, "rb") as file:
+            return Replay(file.read())
+
+    def create_game(self, map_factory):
+        """
+        Create the recorded game with controllers that make the recorded decisions.
+
+        Parameters
+        -----------
+        - *map_factory*: (**Game -> Map**)
+            create the map of the recorded game
+
+        Return
+        -----------
+        The game and the map it should be started on.
+        type: **Tuple[Game, Map]**
+        """
+        game = Game(*[Entity(type) for type in self.types], seed=self.seed_sequence)
+        for entity, controlled, decisions in zip(game.entities, self.controlled, self.decisions):
+            if controlled:
+                entity.attach(ReplayController(game, decisions))
+        return game, map_factory(game)
+
+    def play(self, map_factory):
+        """
+        Play the recorded game again.
+
+        Parameters
+        -----------
+        - *map_factory*: (**Game -> Map**)
+            create the map of the recorded game
+
+        Return
+        -----------
+        The game, in the state the recording ended in.
+        type: **Game**
+        """
+        game, map = self.create_game(map_factory)
+        game.start(map)
+        if MapCache().key(map) != self.map_key:
+            raise ValueError("the map is not the one of the recorded game")
+        for ticks in self.frames:
+            game.update(ticks)
+        return game
@@ -8,17 +8,25 @@ from manpac.entity import Entity  # NOQA
 from manpac.entity_type import EntityType  # NOQA
 from manpac.game import Game  # NOQA
 from manpac.game_status import GameStatus  # NOQA
+from manpac.map_cache import MapCache  # NOQA
 from manpac.controllers.human_controller import HumanController  # NOQA
 from manpac.controllers.random_walk_controller import RandomWalkController  # NOQA
 from manpac.controllers.walk_away_controller import WalkAwayController  # NOQA
 from manpac.controllers.target_seeker_controller import TargetSeekerController  # NOQA
 from manpac.controllers.net.net_server_controller import NetServerController  # NOQA
 from manpac.controllers.net.net_client_controller import NetClientController  # NOQA
+from manpac.controllers.net.net_codec import TextCodec, BinaryCodec  # NOQA
 from manpac.ui.interface import Interface  # NOQA
+from manpac.replay import ReplayRecorder  # NOQA
+from manpac.trajectory import TrajectoryRecorder  # NOQA
 
 import argparse  # NOQA
-from tqdm import trange  # NOQA
+from tqdm import tqdm  # NOQA
+from functools import partial  # NOQA
+from multiprocessing import Pool  # NOQA
+import numpy as np  # NOQA
 import time  # NOQA
+import os  # NOQA
 
 
 MAP_DICT = {
@@ -30,9 +38,24 @@ CONTROLLER_DICT = {
     "hu": lambda game, params: HumanController(game),
     "rw": lambda game, params: RandomWalkController(game),
     "wa": lambda game, params: WalkAwayController(game, 10),
-    "ns": lambda game, params: NetServerController(game, params.host, params.port),
-    "nc": lambda game, params: NetClientController(HumanController(game), params.host, params.port)
+    "ns": lambda game, params: _net_seat_(game, params),
+    "nc": lambda game, params: NetClientController(HumanController(game), params.host, params.port,
+                                                   CODEC_DICT[params.codec]())
 }
+CODEC_DICT = {
+    "text": TextCodec,
+    "binary": BinaryCodec
+}
+
+
+def _net_seat_(game, params):
+    # All the remote seats of a game share the server of the first one
+    for entity in game.entities:
+        if isinstance(entity.controller, NetServerController):
+            return entity.controller.server.seat()
+    return NetServerController(game, params.host, params.port, CODEC_DICT[params.codec]())
+
+
 # =============================================================================
 #  ARGUMENT PARSING
 # =============================================================================
@@ -73,6 +96,21 @@ misc_options.add_argument('-d', '--debug', dest='debug',
 misc_options.add_argument('-f', '--freq', dest='freq',
                           action='store', default=0, type=int,
                           help='frequence of the game update when no ui (default: unlimited)')
+misc_options.add_argument('-w', '--workers', dest='workers',
+                          action='store', default=0, type=int,
+                          help='play headless games in parallel on this number of processes (default: no pool)')
+misc_options.add_argument('--seed', dest='seed',
+                          action='store', default=None, type=int,
+                          help='seed of the games, each one plays an independent stream spawned from it (default: random)')
+misc_options.add_argument('--record', dest='record',
+                          action='store', default=None, type=str,
+                          help='directory where a replay of each game is saved (default: no replay)')
+misc_options.add_argument('--trajectory', dest='trajectory',
+                          action='store', default=None, type=str,
+                          help='directory where the state of each game at each tick is saved (default: not saved)')
+misc_options.add_argument('--map-cache', dest='map_cache',
+                          action='store', default=None, type=str,
+                          help='directory where compiled maps are cached (default: in memory only)')
 
 net_options = parser.add_argument_group('net options')
 net_options.add_argument('--host', dest='host',
@@ -81,25 +119,46 @@ net_options.add_argument('--host', dest='host',
 net_options.add_argument('-p', '--port', dest='port',
                          action='store', default=9999, type=int,
                          help='port for net services (default: 9999)')
+net_options.add_argument('--codec', dest='codec',
+                         action='store', default="text", type=str,
+                         choices=list(CODEC_DICT.keys()),
+                         help='encoding of the net messages, the same on both ends (default: "text")')
 
-params = parser.parse_args()
 # =============================================================================
 # RUNNING GAMES
 # =============================================================================
-game_range = trange(params.games) if params.progress else range(params.games)
-for game_num in game_range:
+# Map caches of this process by directory, None for the one kept in memory
+_MAP_CACHES_ = {}
+
+
+def create_game(params, seed=None):
+    """
+    Create a game and its map as specified by the parameters.
+
+    Parameters
+    -----------
+    - *params*: (**argparse.Namespace**)
+        the parsed arguments
+    - *seed*: (**numpy.random.SeedSequence**)
+        the seed of the game, None for a random one (default: None)
+
+    Return
+    -----------
+    The game and the map it should be started on.
+    type: **Tuple[Game, Map]**
+    """
     # Create pacmans
     pacmans = []
     if not params.no_pacman:
         pacmans.append(Entity(EntityType.PACMAN))
 
-    params.controllers_name += ["n"] * (4 - len(params.controllers_name))
+    controllers_name = params.controllers_name + ["n"] * (4 - len(params.controllers_name))
     # Create ghosts
     ghosts = []
     for i in range(4):
         ghosts.append(Entity(EntityType.GHOST))
     # Create game
-    game = Game(*pacmans, *ghosts)
+    game = Game(*pacmans, *ghosts, seed=seed)
 
     # Attach controller off pacman
     for pacman in pacmans:
@@ -110,7 +169,7 @@ for game_num in game_range:
         pacman.attach(controller)
 
     # Attach controller off ghosts
-    for ghost, controller in zip(ghosts, params.controllers_name):
+    for ghost, controller in zip(ghosts, controllers_name):
         controller = CONTROLLER_DICT[controller](game, params)
         if controller is None:
             continue
@@ -119,22 +178,180 @@ for game_num in game_range:
 
     # Create map
     map = MAP_DICT[params.map_name](game)
-    # Run the game
+    # Controllers look paths up at every update, the paths are only computed by the first game of each process
+    map.all_pairs_paths = True
+    if params.map_cache not in _MAP_CACHES_:
+        _MAP_CACHES_[params.map_cache] = MapCache(params.map_cache)
+    map.cache = _MAP_CACHES_[params.map_cache]
+    return game, map
+
+
+def game_path(directory, game_num, extension=""):
+    """
+    Return the path of the file of the specified game in a directory.
+    type: **str**
+    """
+    return os.path.join(directory, "game_{}{}".format(game_num, extension))
+
+
+def game_seed(params, game_num):
+    """
+    Return the seed of the specified game.
+
+    Parameters
+    -----------
+    - *params*: (**argparse.Namespace**)
+        the parsed arguments
+    - *game_num*: (**int**)
+        the number of the game
+
+    Return
+    -----------
+    The stream SeedSequence(params.seed).spawn would give to this game whichever process plays it, None without a seed.
+    type: **numpy.random.SeedSequence**
+    """
+    if params.seed is None:
+        return None
+    return np.random.SeedSequence(params.seed, spawn_key=(game_num,))
+
+
+def play_game(params, game_num):
+    """
+    Play a game without user interface until it is finished.
+
+    Parameters
+    -----------
+    - *params*: (**argparse.Namespace**)
+        the parsed arguments
+    - *game_num*: (**int**)
+        the number of this game, it determines its seed when a seed is given
+
+    Return
+    -----------
+    The results of the game: its winner (ghost number starting at 1, 0 if none), its duration in ticks,
+    the number of ticks played per second and the number of boosts picked by each entity type.
+    type: **dict**
+    """
+    game, map = create_game(params, game_seed(params, game_num))
+    recorder = ReplayRecorder(game) if params.record else None
+    trajectory = TrajectoryRecorder(game, game_path(params.trajectory, game_num)) if params.trajectory else None
+    game.start(map)
+
+    for entity in game.entities:
+        if isinstance(entity.controller, NetServerController):
+            time.sleep(3)
+            break
+
+    while game.status is GameStatus.NOT_STARTED:
+        time.sleep(.01)
+    start = time.perf_counter()
+    sleep_time = 1 / params.freq if params.freq > 0 else 0
+    while game.status is not GameStatus.FINISHED:
+        game.update(1)
+        if sleep_time > 0:
+            time.sleep(sleep_time)
+    elapsed = time.perf_counter() - start
+    if recorder:
+        recorder.save(game_path(params.record, game_num, ".replay"))
+    if trajectory:
+        trajectory.close()
+
+    ghosts = [entity for entity in game.entities if entity.type is EntityType.GHOST]
+    return {
+        "game": game_num,
+        "winner": ghosts.index(game.winner) + 1 if game.winner else 0,
+        "duration": game.duration,
+        "ticks_per_second": game.duration / elapsed if elapsed > 0 else float("inf"),
+        "boosts": {type.name.lower(): count for type, count in map.picked_boosts.items()}
+    }
+
+
+def play_games(params):
+    """
+    Play the games without user interface, in parallel if workers are requested.
+
+    Parameters
+    -----------
+    - *params*: (**argparse.Namespace**)
+        the parsed arguments
+
+    Return
+    -----------
+    The results of each game (see play_game) in the order they finished.
+    type: **List[dict]**
+    """
+    play = partial(play_game, params)
+    if params.workers > 0:
+        pool = Pool(params.workers)
+        results = pool.imap_unordered(play, range(params.games))
+    else:
+        pool = None
+        results = (play(game_num) for game_num in range(params.games))
+    if params.progress:
+        results = tqdm(results, total=params.games)
+    try:
+        return list(results)
+    finally:
+        if pool:
+            pool.close()
+            pool.join()
+
+
+def print_summary(results):
+    """
+    Print aggregated statistics of the specified game results.
+
+    Parameters
+    -----------
+    - *results*: (**List[dict]**)
+        the results of the games (see play_game)
+    """
+    if not results:
+        return
+    durations = np.array([result["duration"] for result in results], dtype=np.float64)
+    speeds = np.array([result["ticks_per_second"] for result in results], dtype=np.float64)
+    print("games: {}".format(len(results)))
+    print("duration: mean={:.1f} std={:.1f} min={:.1f} max={:.1f}".format(
+        durations.mean(), durations.std(), durations.min(), durations.max()))
+    print("ticks/s per game: mean={:.1f}".format(speeds.mean()))
+    winners = {}
+    for result in results:
+        winners[result["winner"]] = winners.get(result["winner"], 0) + 1
+    for winner in sorted(winners):
+        name = "ghost {}".format(winner) if winner else "none"
+        print("winner {}: {} ({:.1%})".format(name, winners[winner], winners[winner] / len(results)))
+    for type in results[0]["boosts"]:
+        picked = np.array([result["boosts"][type] for result in results])
+        print("{} boosts picked: total={} mean={:.2f}".format(type, picked.sum(), picked.mean()))
+
+
+if __name__ == "__main__":
+    params = parser.parse_args()
+    if params.workers > 0:
+        if params.ui:
+            parser.error("--workers can not be used with --ui")
+        names = params.controllers_name + [params.pacman_controller]
+        if any(name in ("hu", "ns", "nc") for name in names):
+            parser.error("--workers can not be used with human or net controllers")
+    if params.record:
+        names = params.controllers_name + [params.pacman_controller]
+        if any(name in ("ns", "nc") for name in names):
+            parser.error("--record can not be used with net controllers")
+        os.makedirs(params.record, exist_ok=True)
+
     if params.ui:
-        interface = Interface(game)
-        interface.start(map)
+        for game_num in (tqdm(range(params.games)) if params.progress else range(params.games)):
+            game, map = create_game(params, game_seed(params, game_num))
+            recorder = ReplayRecorder(game) if params.record else None
+            trajectory = TrajectoryRecorder(game, game_path(params.trajectory, game_num)) if params.trajectory else None
+            interface = Interface(game)
+            try:
+                interface.start(map)
+            finally:
+                # Also when the window is closed during the game
+                if trajectory:
+                    trajectory.close()
+            if recorder:
+                recorder.save(game_path(params.record, game_num, ".replay"))
     else:
-        game.start(map)
-
-        for entity in game.entities:
-            if isinstance(entity.controller, NetServerController):
-                time.sleep(3)
-                break
-
-        while game.status is GameStatus.NOT_STARTED:
-            time.sleep(.01)
-        sleep_time = 1 / params.freq if params.freq > 0 else 0
-        while game.status is not GameStatus.FINISHED:
-            game.update(1)
-            if sleep_time > 0:
-                time.sleep(sleep_time)
+        print_summary(play_games(params))
@@ -0,0 +1,171 @@
+from manpac.entity_type import EntityType
+from manpac.entity import Entity
+from manpac.map import Map
+from manpac.game import Game
+from manpac.batch_game import BatchGame, DIRECTIONS
+from manpac.game_status import GameStatus
+from manpac.controllers.abstract_controller import AbstractController
+from manpac.maps.map_pacman import MapPacman
+from manpac.cell import Cell
+
+
+import numpy as np
+import pytest
+
+
+class ScriptedController(AbstractController):
+    def __init__(self, game):
+        super(ScriptedController, self).__init__(game)
+        self.direction = DIRECTIONS[0]
+        self.moving = False
+        self.use = False
+
+    def update(self, ticks):
+        if self.use:
+            self.entity.use_modifier()
+        self.entity.face(self.direction)
+        self.entity.moving = self.moving
+        self.game.map.move(self.entity, ticks)
+
+
+def test_status():
+    batch = BatchGame(3, EntityType.GHOST, EntityType.PACMAN)
+    assert batch.status is GameStatus.NOT_STARTED
+    batch.start(Map((10, 10)))
+    assert batch.status is GameStatus.FINISHED
+    assert (batch.winner == 0).all()
+
+    batch = BatchGame(3, EntityType.GHOST, EntityType.GHOST, EntityType.PACMAN)
+    batch.start(Map((10, 10)))
+    assert batch.status is GameStatus.ONGOING
+    assert batch.game_status(1) is GameStatus.ONGOING
+
+
+def test_collision():
+    map = Map((10, 10))
+    map.spawns[EntityType.PACMAN] = np.array([1, 1])
+    map.spawns[EntityType.GHOST] = np.array([1, 1])
+    batch = BatchGame(2, EntityType.PACMAN, EntityType.GHOST, EntityType.GHOST, EntityType.GHOST)
+    batch.start(map)
+    batch.pos[1, 2:] += 3
+    batch.update(.1)
+
+    assert batch.game_status(0) is GameStatus.FINISHED
+    assert batch.winner[0] == -1
+    assert batch.game_status(1) is GameStatus.ONGOING
+    assert batch.ghosts[1] == 2
+
+
+@pytest.mark.timeout(10)
+def test_same_as_game():
+    types = [EntityType.PACMAN] + [EntityType.GHOST] * 4
+    n_games = 2
+    batch = BatchGame(n_games, *types)
+    map = MapPacman(None)
+    map.boost_generator = None
+    batch.start(map)
+
+    games = []
+    for i in range(n_games):
+        entities = [Entity(type) for type in types]
+        game = Game(*entities)
+        for entity in entities:
+            entity.attach(ScriptedController(game))
+        map = MapPacman(game)
+        map.boost_generator = None
+        game.start(map)
+        games.append(game)
+
+    for t in range(300):
+        if t % 20 == 0:
+            batch.direction[:, :] = np.random.randint(0, 4, size=batch.direction.shape)
+            batch.moving[:, :] = np.random.random_sample(batch.moving.shape) < .9
+            for i, game in enumerate(games):
+                for j, entity in enumerate(game.entities):
+                    entity.controller.direction = DIRECTIONS[batch.direction[i, j]]
+                    entity.controller.moving = batch.moving[i, j]
+        batch.update(1)
+        for game in games:
+            game.update(.5)
+            game.update(.5)
+
+    for i, game in enumerate(games):
+        for j, entity in enumerate(game.entities):
+            assert entity.alive == batch.alive[i, j]
+            if entity.alive:
+                np.testing.assert_allclose(entity.pos, batch.pos[i, j])
+
+
+def _only_modifier_(map, kind):
+    # A single kind of ghost modifier so that picking it does not depend on the randomness of each side
+    generator = map.boost_generator
+    generator.ghost_modifier_factory = [generator.ghost_modifier_factory[kind]]
+    generator.boost_probability = 0
+    map.boost_duration = 30
+    return map
+
+
+@pytest.mark.timeout(30)
+@pytest.mark.parametrize("kind", range(4))
+def test_same_as_game_with_boosts(kind):
+    rng = np.random.default_rng(kind)
+    types = [EntityType.PACMAN] + [EntityType.GHOST] * 4
+    n_games = 3
+    batch = BatchGame(n_games, *types, seed=kind)
+    batch.start(_only_modifier_(MapPacman(None), kind))
+    generator = batch.map.boost_generator
+    names = [type(factory()).__name__
+             for (odds, factory) in generator.ghost_modifier_factory + generator.pacman_modifier_factory]
+
+    games = []
+    for i in range(n_games):
+        entities = [Entity(type) for type in types]
+        game = Game(*entities, seed=kind)
+        for entity in entities:
+            entity.attach(ScriptedController(game))
+        game.start(_only_modifier_(MapPacman(game), kind))
+        games.append(game)
+
+    walkable = np.argwhere(batch.map.terrain != Cell.WALL)
+    used = 0
+    for t in range(300):
+        if t % 10 == 0:
+            batch.direction[:, :] = rng.integers(0, 4, size=batch.direction.shape)
+            batch.moving[:, :] = rng.random(batch.moving.shape) < .9
+            batch.use_request[:, :] = rng.random(batch.use_request.shape) < .5
+            for i, game in enumerate(games):
+                for j, entity in enumerate(game.entities):
+                    entity.controller.direction = DIRECTIONS[batch.direction[i, j]]
+                    entity.controller.moving = batch.moving[i, j]
+                    entity.controller.use = batch.use_request[i, j]
+        if t % 3 == 0:
+            for i, game in enumerate(games):
+                loc = walkable[rng.integers(len(walkable))]
+                batch.ghost_boosts.insert(np.array([i]), loc, game.map.boost_duration)
+                game.map.boosts.insert(EntityType.GHOST, loc.copy(), game.map.boost_duration)
+        batch.update(1)
+        for game in games:
+            game.update(.5)
+            game.update(.5)
+
+        for i, game in enumerate(games):
+            assert [boost.loc.tolist() for boost in game.map.ghost_boosts] == \
+                [loc.tolist() for loc, _ in batch.ghost_boosts.to_list(i)]
+            assert [boost.loc.tolist() for boost in game.map.pacman_boosts] == \
+                [loc.tolist() for loc, _ in batch.pacman_boosts.to_list(i)]
+            for j, entity in enumerate(game.entities):
+                assert entity.alive == batch.alive[i, j]
+                if not entity.alive:
+                    continue
+                np.testing.assert_allclose(entity.pos, batch.pos[i, j])
+                holding = batch.holding[i, j]
+                assert (type(entity.holding).__name__ if entity.holding else None) == \
+                    (names[holding] if holding >= 0 else None)
+                modifiers = [(names[k], r) for k, r in zip(batch.modifiers[i, j], batch.modifiers_remaining[i, j])
+                             if k >= 0]
+                expected = [(type(modifier).__name__, modifier.remaining_duration) for modifier in entity.modifiers]
+                assert sorted(name for name, _ in modifiers) == sorted(name for name, _ in expected)
+                np.testing.assert_allclose(sorted(r for _, r in modifiers), sorted(r for _, r in expected))
+                used += len(expected)
+    # The boosts were picked up and their modifiers used
+    assert used > 0
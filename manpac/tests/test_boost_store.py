@@ -0,0 +1,53 @@
+from manpac.entity_type import EntityType
+from manpac.direction import Direction
+from manpac.boost_store import BoostStore
+from manpac.utils.timers import Timers
+
+import numpy as np
+
+
+def test_boost_store():
+    timers = Timers()
+    store = BoostStore((10, 10), timers, capacity=2)
+    a = store.insert(EntityType.GHOST, np.array([1, 1]), 3)
+    b = store.insert(EntityType.GHOST, np.array([1, 1]), 3)
+    c = store.insert(EntityType.PACMAN, np.array([4, 2]), 5)
+    assert store.count(EntityType.GHOST) == 2
+    assert store.boosts(EntityType.PACMAN) == [c]
+    # Equal boosts are removed by identity
+    store.remove(b)
+    assert store.boosts(EntityType.GHOST)[0] is a
+    timers.advance(1)
+    assert a.remaining_duration == 2 and c.remaining_duration == 5
+    assert a.loc.tolist() == [1, 1] and not a.loc.flags.writeable
+    store.set_remaining(a, 1)
+    assert timers.advance(1) == [a]
+    store.clear(EntityType.GHOST)
+    assert store.count(EntityType.GHOST) == 0
+    assert store.grid.sum() == 1
+
+
+def test_swept():
+    rng = np.random.RandomState(0)
+    store = BoostStore((20, 20), Timers())
+    for _ in range(200):
+        store.insert(EntityType.GHOST, rng.randint(0, 20, size=2), 100)
+    radius, reach = .9, 1.5
+    for i in range(500):
+        pos = rng.uniform(0, 20, size=2)
+        if i % 5 == 0:
+            # Aligned with boosts
+            pos[i % 2] = rng.randint(0, 20) + .5
+        direction = list(Direction)[i % 4]
+        v, v_orth = direction.vector, direction.rot90(1).vector
+        swept = store.swept(EntityType.GHOST, pos, direction, reach, radius)
+        # Every boost the entity may pick up is in the swept cells, in the order they were added
+        expected = []
+        for boost in store.boosts(EntityType.GHOST):
+            vector = (boost.loc + .5) - pos
+            if (np.sign(vector) != v).all() or np.max(np.abs(vector * v_orth)) > radius or np.max(vector * v) > reach:
+                continue
+            expected.append(boost)
+        assert all(any(boost is other for other in swept) for boost in expected)
+        orders = [boost.order for boost in swept]
+        assert orders == sorted(orders)
@@ -1,4 +1,4 @@
-from manpac.utils.buffered_random import BufferedRandom
+from manpac.utils.buffered_random import BufferedRandom, AliasTable
 
 
 import numpy as np
@@ -40,3 +40,39 @@ def test_choice():
     odds[3] = 1
     for i in range(10):
         assert rand.choice(collection, odds) in collection[-2:]
+
+
+def test_rng():
+    first = BufferedRandom(rng=np.random.default_rng(3))
+    second = BufferedRandom(rng=np.random.default_rng(3))
+    # More draws than the buffer holds
+    assert [first.uniform() for i in range(120)] == [second.uniform() for i in range(120)]
+
+
+def test_alias_table():
+    rand = BufferedRandom(rng=np.random.default_rng(0))
+    collection = ["a", "b", "c", "d"]
+    table = AliasTable([0, 0, 2, 0])
+    for i in range(10):
+        assert "c" == rand.choice(collection, table)
+
+    odds = [1, 0, 3, 6]
+    table = AliasTable(odds)
+    picked = rand.choice_batch(np.array(collection), table, 20000)
+    frequencies = [np.mean(picked == x) for x in collection]
+    np.testing.assert_allclose(frequencies, np.array(odds) / 10, atol=.02)
+
+
+def test_batch():
+    first = BufferedRandom(30, np.random.default_rng(3))
+    second = BufferedRandom(30, np.random.default_rng(3))
+    # Batches give the same numbers as single draws, across and beyond refills
+    assert first.uniform_batch(10, 2, 5).tolist() == [second.uniform(2, 5) for i in range(10)]
+    assert first.randint_batch(100, -4, 7).tolist() == [second.randint(-4, 7) for i in range(100)]
+    table = AliasTable([3, 1, 2])
+    sequence = np.array([7, 8, 9])
+    assert first.choice_batch(sequence, table, 45).tolist() == [second.choice(sequence, table) for i in range(45)]
+    # The refill size can be changed
+    first.buffer_size = second.buffer_size = 200
+    assert first.uniform_batch(50).tolist() == [second.uniform() for i in range(50)]
+    assert first.buffer.size == 200
@@ -1,6 +1,10 @@
 from manpac.entity_type import EntityType
 from manpac.entity import Entity
 from manpac.direction import Direction
+from manpac.game import Game
+from manpac.modifiers.speed_modifier import SpeedModifier
+from manpac.modifiers.intangible_modifier import IntangibleModifier
+from manpac.modifiers.ghost_block_modifier import GhostBlockModifier
 
 
 import numpy as np
@@ -74,3 +78,31 @@ def test_default_collison_behavior():
 
     assert pacman.can_collide_with(ghost.type)
     assert pacman.can_collide_with(pacman.type)
+
+
+def test_aggregates():
+    game = Game()
+    a = Entity(EntityType.GHOST)
+    a.alive = True
+    assert a.speed == 0
+    a.moving = True
+    assert a.speed == .2
+    a.base_speed = .5
+    assert a.speed == .5
+    assert a.is_tangible and not a.can_collide_with(EntityType.GHOST)
+
+    # Used, expired or replaced modifiers
+    a.holding = SpeedModifier(game, 2, 2)
+    a.use_modifier()
+    assert a.speed == 1
+    a.holding = IntangibleModifier(game, 10)
+    a.use_modifier()
+    assert not a.is_tangible and not a.can_collide_with(EntityType.PACMAN)
+    a.update(3)
+    assert a.speed == .5 and not a.is_tangible
+    a.modifiers = [GhostBlockModifier(game, 10)]
+    assert a.is_tangible and a.can_collide_with(EntityType.GHOST)
+    a.modifiers = []
+    assert not a.can_collide_with(EntityType.GHOST)
+    a.kill()
+    assert a.speed == 0
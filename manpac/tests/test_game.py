@@ -5,6 +5,9 @@ from manpac.game import Game
 from manpac.direction import Direction
 from manpac.game_status import GameStatus
 from manpac.controllers.target_seeker_controller import TargetSeekerController
+from manpac.controllers.random_walk_controller import RandomWalkController
+from manpac.maps.map_pacman import MapPacman
+from manpac.modifiers.ghost_block_modifier import GhostBlockModifier
 
 import pytest
 import numpy as np
@@ -68,3 +71,79 @@ def test_big_updates():
     assert g.status is GameStatus.ONGOING
     g.update(1e12)
     assert g.status is GameStatus.FINISHED
+
+
+def __brute_force_collisions__(game):
+    cpy = game.entities[:]
+    for i, entity1 in enumerate(cpy):
+        if not entity1.alive:
+            continue
+        for entity2 in cpy[i+1:]:
+            if not entity2.alive:
+                continue
+            can_collide = entity1.can_collide_with(entity2.type) or entity2.can_collide_with(entity1.type)
+            if can_collide and entity1.squared_distance_to(entity2.pos) < (entity2.size + entity1.size)**2:
+                game.on_collision(entity1, entity2)
+                if not entity1.alive:
+                    break
+
+
+def __crowded_game__(seed):
+    rng = np.random.RandomState(seed)
+    directions = list(Direction)
+    entities = [Entity(EntityType.GHOST) for _ in range(40)] + [Entity(EntityType.PACMAN) for _ in range(3)]
+    g = Game(*entities)
+    g.start(Map((12, 12)))
+    for entity in entities:
+        entity.teleport(rng.uniform(1, 11, size=2))
+        entity.face(directions[rng.randint(4)])
+        if entity.type is EntityType.GHOST and rng.rand() < .5:
+            entity.modifiers = [GhostBlockModifier(g, 10)]
+    return g
+
+
+def test_collision_broad_phase():
+    for seed in range(10):
+        g1 = __crowded_game__(seed)
+        g2 = __crowded_game__(seed)
+        g1._check_collisions_()
+        __brute_force_collisions__(g2)
+        assert g1.ghosts == g2.ghosts
+        for e1, e2 in zip(g1.entities, g2.entities):
+            assert e1.alive == e2.alive
+            assert np.array_equal(e1.pos, e2.pos)
+
+
+def __play_seeded__(seed, ticks=300):
+    entities = [Entity(EntityType.PACMAN)] + [Entity(EntityType.GHOST) for _ in range(4)]
+    game = Game(*entities, seed=seed)
+    entities[0].attach(TargetSeekerController(game))
+    for entity in entities[1:]:
+        entity.attach(RandomWalkController(game))
+    map = MapPacman(game)
+    map.all_pairs_paths = False
+    game.start(map)
+    for _ in range(ticks):
+        game.update(1)
+    return np.array([entity.pos for entity in entities]), [boost.loc.tolist() for boost in map.ghost_boosts]
+
+
+@pytest.mark.timeout(20)
+def test_seed():
+    # The same seed plays the same game, whatever the global random state
+    np.random.seed(1)
+    positions, boosts = __play_seeded__(42)
+    np.random.seed(2)
+    same_positions, same_boosts = __play_seeded__(np.random.SeedSequence(42))
+    np.testing.assert_array_equal(positions, same_positions)
+    assert boosts == same_boosts
+    other_positions, other_boosts = __play_seeded__(43)
+    assert not np.array_equal(positions, other_positions) or boosts != other_boosts
+
+    # The components get independent streams
+    game = Game(seed=0)
+    assert game.spawn_rng().random() != game.spawn_rng().random()
+    # Controllers can still be made before their game
+    controller = RandomWalkController(None)
+    controller.game = game
+    assert controller.rng is controller.rng
@@ -36,6 +36,21 @@ def test_get_set():
     assert cnt == 2
 
 
+def test_terrain_version():
+    map = Map((10, 10))
+    version = map.terrain_version
+    # Only walls and DEBUG cells change what is rendered of the terrain
+    map[2, 2] = Cell.DEBUG_ONCE
+    map[2, 2] = Cell.EMPTY
+    assert map.terrain_version == version
+    map[2, 2] = Cell.WALL
+    assert map.terrain_version == version + 1
+    map[2, 2] = Cell.EMPTY
+    map[3, 3] = Cell.DEBUG
+    map[3, 3] = Cell.EMPTY
+    assert map.terrain_version == version + 4
+
+
 def test_move():
     map = Map((10, 10))
     ent = Entity(EntityType.GHOST)
@@ -189,3 +204,73 @@ def test_pickup_boost():
     map.move(pacman, ticks)
     assert len(map.ghost_boosts) == 1
     assert len(map.pacman_boosts) == 0
+
+
+def test_boost_expiry():
+    map = Map((10, 10))
+    map.ghost_boosts = [[np.array([1, 1]), 2], [np.array([2, 2]), 5]]
+    map.update(1)
+    assert [boost.remaining_duration for boost in map.ghost_boosts] == [1, 4]
+    map.boosts.set_remaining(map.ghost_boosts[1], 1.5)
+    map.update(1)
+    # Expired ghost boosts turn into pacman boosts
+    assert [boost.loc.tolist() for boost in map.ghost_boosts] == [[2, 2]]
+    assert [boost.loc.tolist() for boost in map.pacman_boosts] == [[1, 1]]
+    map.update(1)
+    assert map.ghost_boosts == []
+    assert len(map.pacman_boosts) == 2
+
+
+def test_how_far_batch():
+    size = 10
+    map = Map((size, size))
+    map[:, 7:] = Cell.WALL
+    map[3, 3:5] = Cell.WALL
+    ent = Entity(EntityType.GHOST)
+    ent.alive = True
+    ent.moving = True
+
+    for i in range(100):
+        ent.teleport(np.random.random_sample(2) * size)
+        ent.face(list(Direction)[i % 4])
+        max_distance = np.random.random_sample() * 3
+        expected = map.how_far(ent, max_distance)
+        found = map.how_far_batch(ent.pos[None], ent.direction.vector[None], np.array([ent.speed]),
+                                  np.array([ent.size]), np.array([max_distance]), np.array([True]))
+        assert expected == found[0]
+
+
+def test_wall_distances():
+    map = Map((10, 10))
+    map.compile()
+    right = list(Direction).index(Direction.RIGHT)
+    up = list(Direction).index(Direction.UP)
+    assert map.wall_distances[right, 0, 0] == 10
+    assert map.wall_distances[up, 0, 9] == 10
+
+    # Changing walls through the map invalidates the table
+    map[5, 0] = Cell.WALL
+    assert map.wall_distances[right, 0, 0] == 5
+    assert map.wall_distances[right, 5, 0] == 0
+    assert map.wall_distances[up, 5, 9] == 9
+
+
+def test_closest_walkable_table():
+    size = 10
+    map = Map((size, size))
+    map[:, 7:] = Cell.WALL
+    map[2:5, 2:5] = Cell.WALL
+    map.compile()
+
+    for i in range(200):
+        src = np.random.random_sample(2) * (size + 2) - 1.5
+        if i % 4 == 0:
+            src = np.round(src * 2) / 2
+        expected = map.__search_closest_walkable__(src)
+        found = map.closest_walkable(src)
+        assert found.dtype == expected.dtype
+        assert (found == expected).all()
+
+    # Changing walls through the map invalidates the table
+    map[3, 3] = Cell.EMPTY
+    assert (map.closest_walkable(np.array([3.2, 3.4])) == np.array([3, 3])).all()
@@ -0,0 +1,77 @@
+from manpac.entity_type import EntityType
+from manpac.entity import Entity
+from manpac.game import Game
+from manpac.cell import Cell
+from manpac.map_cache import MapCache
+from manpac.maps.map_pacman import MapPacman
+
+
+import numpy as np
+
+
+def __new_map__():
+    map = MapPacman(Game(Entity(EntityType.GHOST)))
+    map.all_pairs_paths = True
+    return map
+
+
+def test_load_compiled(tmp_path):
+    cache = MapCache(str(tmp_path))
+    built = __new_map__()
+    built.cache = cache
+    built.compile()
+    assert cache.load(built) is not None
+
+    # A new cache only has the file to load from
+    loaded = __new_map__()
+    loaded.cache = MapCache(str(tmp_path))
+    loaded.compile()
+    assert isinstance(loaded.path_graph.distances, np.memmap)
+    assert loaded.path_graph.compiled
+    assert (loaded.wall_distances == built.wall_distances).all()
+    assert (loaded.path_graph.nodes == built.path_graph.nodes).all()
+    assert loaded.path_graph.nodes_data[0].keys() == built.path_graph.nodes_data[0].keys()
+
+    for i in range(50):
+        src = np.random.random_sample(2) * built.terrain.shape
+        dst = np.random.random_sample(2) * built.terrain.shape
+        assert (loaded.closest_walkable(src) == built.closest_walkable(src)).all()
+        dst = built.closest_walkable(dst) + .5
+        assert loaded.path_distance(src, dst) == built.path_distance(src, dst)
+        path, distance = loaded.path_to(src, dst)
+        expected_path, expected_distance = built.path_to(src, dst)
+        assert distance == expected_distance
+        assert len(path) == len(expected_path)
+        assert all((a == b).all() for a, b in zip(path, expected_path))
+
+
+def test_key(tmp_path):
+    cache_map = __new_map__()
+    cache = MapCache(str(tmp_path))
+    key = cache.key(cache_map)
+    assert key == cache.key(__new_map__())
+
+    cache_map[1, 1] = Cell.WALL
+    assert cache.key(cache_map) != key
+    cache_map[1, 1] = Cell.EMPTY
+    assert cache.key(cache_map) == key
+
+    cache_map.spawns[EntityType.PACMAN] = cache_map.spawns[EntityType.PACMAN] + 1
+    assert cache.key(cache_map) != key
+
+
+def test_in_memory():
+    cache = MapCache()
+    built = __new_map__()
+    built.cache = cache
+    built.compile()
+
+    loaded = __new_map__()
+    loaded.cache = cache
+    loaded.compile()
+    assert loaded.path_graph.compiled
+    assert not loaded.wall_distances.flags.writeable
+    assert (loaded.wall_distances == built.wall_distances).all()
+    assert (loaded.path_graph.distances == built.path_graph.distances).all()
+    # A new cache knows nothing
+    assert MapCache().load(built) is None
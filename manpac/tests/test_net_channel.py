@@ -0,0 +1,85 @@
+from manpac.controllers.net.net_channel import NetChannel
+
+import heapq
+import itertools
+import random
+
+
+class __Loop__():
+    """
+    Run the callbacks of the channels in simulated time.
+    """
+
+    def __init__(self):
+        self.now = 0
+        self.callbacks = []
+        self.counter = itertools.count()
+
+    def call_later(self, delay, callback, *args):
+        heapq.heappush(self.callbacks, (self.now + delay, next(self.counter), callback, args))
+
+    def run(self, until):
+        while self.callbacks and self.callbacks[0][0] <= until:
+            self.now, _, callback, args = heapq.heappop(self.callbacks)
+            callback(*args)
+
+
+def __link__(loop, loss, latency, rng):
+    """
+    Two channels exchanging packets that are lost or delayed at random.
+    """
+    received = {"a": [], "b": []}
+    channels = {}
+
+    def send(to):
+        def deliver(packet):
+            if rng.random() >= loss:
+                loop.call_later(latency * rng.uniform(.5, 1.5), lambda: received[to].extend(channels[to].receive(packet)))
+        return deliver
+    channels["a"] = NetChannel(loop, send("b"))
+    channels["b"] = NetChannel(loop, send("a"))
+    return channels, received
+
+
+def test_reliable():
+    loop = __Loop__()
+    channels, received = __link__(loop, .3, .01, random.Random(0))
+    a, b = channels["a"], channels["b"]
+    for i in range(50):
+        loop.call_later(i * .01, a.send, b"r%d" % i, True)
+        loop.call_later(i * .01, a.send, b"u%d" % i)
+        # Some traffic back carries the acknowledgements
+        loop.call_later(i * .01, b.send, b"back")
+    loop.run(10)
+
+    # Every reliable message arrives once and in order
+    reliable = [payload for payload, seq in received["b"] if seq is None]
+    assert reliable == [b"r%d" % i for i in range(50)]
+    assert not a.unacked
+    assert a.rtt is not None and a.min_timeout <= a.timeout <= a.max_timeout
+    # Unreliable ones arrive at most once
+    unreliable = [payload for payload, seq in received["b"] if seq is not None]
+    assert 0 < len(unreliable) < 50
+    assert len(set(unreliable)) == len(unreliable)
+
+
+def test_acks():
+    loop = __Loop__()
+    packets = []
+    a = NetChannel(loop, packets.append)
+    b = NetChannel(loop, lambda packet: a.receive(packet))
+    for i in range(4):
+        a.send(b"%d" % i)
+    # The second packet is lost and the fourth one arrives before the third
+    for i in [0, 3, 2]:
+        assert b.receive(packets[i]) == [(b"%d" % i, i)]
+    assert b.receive(packets[3]) == []
+    assert b.remote_seq == 3
+    assert b.received_bits == 0b101
+    b.flush()
+    assert list(a.sent) == [1]
+
+    # Latest wins among the unreliable messages of the same kind
+    assert b.is_latest("position", 3)
+    assert not b.is_latest("position", 2)
+    assert b.is_latest("clock", 2)
@@ -0,0 +1,114 @@
+from manpac.entity_type import EntityType
+from manpac.entity import Entity
+from manpac.game import Game
+from manpac.direction import Direction
+from manpac.modifiers.speed_modifier import SpeedModifier
+from manpac.modifiers.swap_modifier import SwapModifier
+from manpac.modifiers.ghost_block_modifier import GhostBlockModifier
+from manpac.modifiers.intangible_modifier import IntangibleModifier
+from manpac.maps.map_pacman import MapPacman
+from manpac.controllers.net.net_codec import TextCodec, BinaryCodec
+from manpac.controllers.net.net_message import \
+    MsgJoin, MsgResult, MsgSyncMap, MsgSyncEntity, MsgSyncClock, MsgCompound, \
+    MsgSyncMapBoosts, MsgEndGame, MsgBoostPickup, MsgYourEntity, MsgStartGame, \
+    MsgBoostUse, MsgSyncModifiers, MsgInput, MsgInputAck
+
+import pytest
+import numpy as np
+
+
+def __game__():
+    return Game(Entity(EntityType.GHOST), Entity(EntityType.PACMAN))
+
+
+def __modifiers__(game):
+    return [SpeedModifier(game, 120, 2), SwapModifier(game, 10, 25), GhostBlockModifier(game, 60.5),
+            IntangibleModifier(game, 3)]
+
+
+def __assert_same_modifiers__(found, expected):
+    assert len(found) == len(expected)
+    for a, b in zip(found, expected):
+        assert type(a) is type(b)
+        assert a.__dict__.keys() == b.__dict__.keys()
+        for key in a.__dict__:
+            if key != "game":
+                assert a.__dict__[key] == b.__dict__[key]
+
+
+@pytest.mark.parametrize("codec", [TextCodec(), BinaryCodec()])
+def test_round_trip(codec):
+    game = __game__()
+
+    for type in EntityType:
+        assert codec.decode(codec.encode(MsgJoin(type))).type is type
+    for result in [True, False]:
+        assert codec.decode(codec.encode(MsgResult(result))).result is result
+    for direction in Direction:
+        msg = codec.decode(codec.encode(MsgSyncEntity(pos=np.array([1.25, 7.5]), direction=direction, alive=False, uid=3)))
+        assert (msg.pos == np.array([1.25, 7.5])).all()
+        assert msg.direction is direction
+        assert msg.alive is False
+        assert msg.ent_uid == 3
+    assert codec.decode(codec.encode(MsgSyncClock(12.5))).ticks == 12.5
+
+    compound = codec.decode(codec.encode(MsgCompound(MsgSyncClock(3), MsgYourEntity(2), MsgEndGame())))
+    assert compound.compound
+    assert [msg.uid for msg in compound.messages] == [MsgSyncClock.uid, MsgYourEntity.uid, MsgEndGame.uid]
+    assert compound.messages[0].ticks == 3
+    assert compound.messages[1].ent_uid == 2
+
+    ghost_boosts = [[np.array([1, 2]), 30.5], [np.array([4, 3]), 600]]
+    pacman_boosts = [[np.array([5, 6]), 2]]
+    msg = codec.decode(codec.encode(MsgSyncMapBoosts(ghost_boosts, pacman_boosts)))
+    for found, expected in [(msg.ghost_boosts, ghost_boosts), (msg.pacman_boosts, pacman_boosts)]:
+        assert len(found) == len(expected)
+        for (loc, duration), (expected_loc, expected_duration) in zip(found, expected):
+            assert (loc == expected_loc).all()
+            assert duration == expected_duration
+    assert codec.decode(codec.encode(MsgSyncMapBoosts([], []))).ghost_boosts == []
+
+    assert codec.decode(codec.encode(MsgEndGame())).uid == MsgEndGame.uid
+    assert codec.decode(codec.encode(MsgStartGame())).uid == MsgStartGame.uid
+    assert codec.decode(codec.encode(MsgBoostUse(4))).ent_uid == 4
+    assert codec.decode(codec.encode(MsgYourEntity(-1))).ent_uid == -1
+
+    for modifier in __modifiers__(game):
+        msg = codec.decode(codec.encode(MsgBoostPickup(1, modifier)))
+        msg.parse_boost(game)
+        assert msg.ent_uid == 1
+        __assert_same_modifiers__([msg.boost], [modifier])
+
+    for modifiers in [__modifiers__(game), []]:
+        msg = codec.decode(codec.encode(MsgSyncModifiers(0, modifiers)))
+        msg.parse_boost(game)
+        __assert_same_modifiers__(msg.modifiers, modifiers)
+
+    inputs = [(.1 + .2, Direction.DOWN, True), (1 / 3, Direction.LEFT, False)]
+    msg = codec.decode(codec.encode(MsgInput(41, inputs)))
+    assert (msg.input, msg.inputs) == (41, inputs)
+    assert codec.decode(codec.encode(MsgInput(41, []))).inputs == []
+    msg = codec.decode(codec.encode(MsgInputAck(42, np.array([10.35, 3.5]), Direction.LEFT)))
+    assert (msg.input, msg.direction) == (42, Direction.LEFT)
+    assert (msg.pos == np.array([10.35, 3.5])).all()
+
+
+def test_binary_map():
+    codec = BinaryCodec()
+    terrain = MapPacman(__game__()).terrain
+    msg = codec.decode(codec.encode(MsgSyncMap(terrain)))
+    assert msg.terrain.shape == terrain.shape
+    assert (msg.terrain == terrain).all()
+
+
+def test_binary_header():
+    codec = BinaryCodec()
+    first = codec.decode(codec.encode(MsgSyncClock(1), 10))
+    second = codec.decode(codec.encode(MsgSyncClock(2), 10.5))
+    assert second.seq == first.seq + 1
+    assert (first.tick, second.tick) == (10, 10.5)
+
+    data = bytearray(codec.encode(MsgEndGame()))
+    data[0] = BinaryCodec.version + 1
+    with pytest.raises(ValueError):
+        codec.decode(bytes(data))
@@ -0,0 +1,108 @@
+from manpac.entity_type import EntityType
+from manpac.entity import Entity
+from manpac.game import Game
+from manpac.maps.map_pacman import MapPacman
+from manpac.controllers.net.net_codec import BinaryCodec
+from manpac.controllers.net.net_transport import NetTransport
+from manpac.controllers.net.net_server_controller import NetGameServer
+from manpac.direction import Direction
+from manpac.controllers.net.net_message import MsgJoin, MsgResult, MsgSnapshot, MsgEndGame, MsgInput
+
+import numpy as np
+import threading
+import time
+import pytest
+
+
+class __Client__():
+    def __init__(self, address):
+        self.snapshots = []
+        self.uids = []
+        self.received = threading.Event()
+        self.transport = NetTransport(BinaryCodec(), self.on_message, retry_delay=.05, timeout=2)
+        self.transport.open(remote_address=address)
+
+    def on_message(self, msg, address):
+        self.uids.append(msg.uid)
+        if msg.uid == MsgResult.uid:
+            self.transport.resolve(address, msg.result)
+        elif msg.uid == MsgSnapshot.uid:
+            self.snapshots.append(msg)
+            self.received.set()
+
+    def join(self, type):
+        return self.transport.request(MsgJoin(type)).result(timeout=5)
+
+
+@pytest.mark.timeout(20)
+def test_seats():
+    entities = [Entity(EntityType.PACMAN)] + [Entity(EntityType.GHOST) for _ in range(4)]
+    game = Game(*entities)
+    server = NetGameServer(game, port=0, codec=BinaryCodec())
+    seats = [server.seat(), server.seat()]
+    entities[1].attach(seats[0])
+    entities[3].attach(seats[1])
+    clients = [__Client__(server.transport.local_address) for _ in range(3)]
+    try:
+        # Joins go to the free seats of the right type
+        assert not clients[0].join(EntityType.PACMAN)
+        assert clients[0].join(EntityType.GHOST)
+        assert clients[1].join(EntityType.GHOST)
+        assert not clients[2].join(EntityType.GHOST)
+        # Joining again keeps the same seat
+        assert clients[0].join(EntityType.GHOST)
+        assert [seat.client_address for seat in seats] == [client.transport.local_address for client in clients[:2]]
+        assert server.clients[clients[0].transport.local_address] is seats[0]
+
+        game.start(MapPacman(game))
+        # The state is sent once at the end of the tick
+        game.update(1)
+        for client in clients[:2]:
+            assert client.received.wait(timeout=5)
+        time.sleep(.1)
+        first, second = clients[0].snapshots, clients[1].snapshots
+        assert len(first) == len(second) == 1
+        assert first[0].seq == second[0].seq
+        assert first[0].pack() == second[0].pack()
+        assert len(first[0].entities) == len(entities)
+        assert not clients[2].snapshots
+
+        # The inputs of a client can not move its entity faster than the server
+        before = entities[3].pos.copy()
+        seats[1].inputs.append(MsgInput(0, [(50, Direction.RIGHT, True)]))
+        game.update(1)
+        # The tick is updated in two halves, the input takes the ticks since the start and the first half
+        assert (seats[1].last_input, seats[1].input_ticks) == (0, .5)
+        assert np.sum(np.abs(entities[3].pos - before)) <= 2 * entities[3].speed + 1e-9
+        # Inputs already applied are skipped
+        before = entities[3].pos.copy()
+        seats[1].inputs.append(MsgInput(0, [(50, Direction.RIGHT, True), (0, Direction.LEFT, False)]))
+        game.update(1)
+        assert seats[1].last_input == 1
+        assert (entities[3].direction, entities[3].moving) == (Direction.LEFT, False)
+        assert (entities[3].pos == before).all()
+
+        # The client of a dead entity still follows the game, from the ticks of the game only
+        threads = threading.active_count()
+        entities[1].kill()
+        clients[0].received.clear()
+        game.update(1)
+        assert clients[0].received.wait(timeout=5)
+        assert threading.active_count() == threads
+
+        # The last tick is sent before the end of the game
+        for entity in entities[2:]:
+            entity.kill()
+        game.ghosts = 1
+        clients[0].uids.clear()
+        game.update(1)
+        deadline = time.time() + 5
+        while MsgEndGame.uid not in clients[0].uids and time.time() < deadline:
+            time.sleep(.01)
+        uids = clients[0].uids
+        assert MsgSnapshot.uid in uids[:uids.index(MsgEndGame.uid)]
+        assert clients[0].snapshots[-1].seq > first[0].seq
+    finally:
+        for client in clients:
+            client.transport.close()
+        server.transport.close()
@@ -0,0 +1,75 @@
+from manpac.entity_type import EntityType
+from manpac.entity import Entity
+from manpac.game import Game
+from manpac.direction import Direction
+from manpac.maps.map_pacman import MapPacman
+from manpac.controllers.net.net_codec import TextCodec
+from manpac.controllers.net.net_message import MsgInputAck
+from manpac.controllers.net.net_prediction import InputHistory, InterpolationBuffer, apply_input
+
+import numpy as np
+
+
+def test_reconcile():
+    game = Game(Entity(EntityType.GHOST), Entity(EntityType.GHOST))
+    game.start(MapPacman(game))
+    client, server = game.entities
+    server.teleport(client.pos)
+    history = InputHistory(redundancy=4)
+    codec = TextCodec()
+    messages = []
+    for i in range(10):
+        direction = Direction.DOWN if i % 2 else Direction.RIGHT
+        apply_input(game.map, client, .5 + i / 10, direction, i != 5, pickup=False)
+        messages.append(codec.decode(codec.encode(history.record(client, .5 + i / 10))))
+    predicted = client.pos.copy()
+    # The last inputs not acknowledged are sent again
+    assert [(msg.input, len(msg.inputs)) for msg in messages[:5]] == [(0, 1), (0, 2), (0, 3), (0, 4), (1, 4)]
+    assert messages[5].inputs[3] == (1., Direction.DOWN, False)
+    assert messages[9].inputs[0] == (1.1, Direction.RIGHT, True)
+
+    def simulate(msg, last_input, ticks=None):
+        for input, (input_ticks, direction, moving) in enumerate(msg.inputs, msg.input):
+            if input > last_input:
+                apply_input(game.map, server, input_ticks if ticks is None else ticks, direction, moving)
+        return msg.input + len(msg.inputs) - 1
+
+    # The first messages are lost, the server simulates their inputs from the next one and agrees
+    last_input = simulate(messages[3], -1)
+    assert not history.reconcile(game.map, client, MsgInputAck(last_input, server.pos.copy(), server.direction))
+    assert (client.pos == predicted).all()
+    assert len(history.pending) == 6
+    # Older acknowledgements are ignored
+    assert not history.reconcile(game.map, client, MsgInputAck(2, server.pos + 5, server.direction))
+
+    # The server moves the entity less than the client did, the inputs it has not applied are simulated from there
+    last_input = simulate(messages[6], last_input, ticks=.1)
+    assert history.reconcile(game.map, client, MsgInputAck(last_input, server.pos.copy(), server.direction))
+    assert not np.allclose(client.pos, predicted)
+    assert client.direction == Direction.DOWN
+    last_input = simulate(messages[9], last_input)
+    assert last_input == 9
+    assert not history.reconcile(game.map, client, MsgInputAck(last_input, server.pos.copy(), server.direction))
+    assert (client.pos == server.pos).all()
+    assert not history.pending
+
+
+def test_interpolation():
+    buffer = InterpolationBuffer(delay=2, max_step=1)
+    assert buffer.sample(0) == {}
+    buffer.push(10, {0: np.array([1., 1.]), 1: np.array([5., 5.])}, 10)
+    buffer.push(12, {0: np.array([2., 1.]), 1: np.array([9., 5.])}, 12)
+    # Shown 2 ticks behind the server
+    positions = buffer.sample(12)
+    assert (positions[0] == [1, 1]).all()
+    positions = buffer.sample(13)
+    assert np.allclose(positions[0], [1.5, 1])
+    # Teleported entities are not interpolated
+    assert (positions[1] == [5, 5]).all()
+    # No guess past the last positions
+    assert (buffer.sample(20)[0] == [2, 1]).all()
+    # Never back in time
+    assert (buffer.sample(12)[0] == [2, 1]).all()
+    # Late positions are ignored
+    buffer.push(11, {0: np.array([0., 0.])}, 20)
+    assert buffer.ticks == [10, 12]
@@ -0,0 +1,111 @@
+from manpac.entity_type import EntityType
+from manpac.entity import Entity
+from manpac.game import Game
+from manpac.game_status import GameStatus
+from manpac.maps.map_pacman import MapPacman
+from manpac.controllers.random_walk_controller import RandomWalkController
+from manpac.controllers.net.net_codec import BinaryCodec
+from manpac.controllers.net.net_message import MsgSnapshotAck
+from manpac.controllers.net.net_snapshot import Snapshot, SnapshotHistory, POSITION_STEPS, TICK_STEPS
+
+from collections import Counter
+import pytest
+import numpy as np
+
+
+def __new_game__():
+    entities = [Entity(EntityType.PACMAN)] + [Entity(EntityType.GHOST) for _ in range(4)]
+    game = Game(*entities)
+    for entity in entities[1:]:
+        entity.attach(RandomWalkController(game, 10))
+    map = MapPacman(game)
+    map.boost_generator.boost_probability = .5
+    game.start(map)
+    for i, entity in enumerate(entities):
+        entity.uid = i
+    return game
+
+
+@pytest.mark.timeout(10)
+def test_snapshot_sync():
+    np.random.seed(0)
+    game = __new_game__()
+    remote = __new_game__()
+    # The remote map counts down the durations of the boosts but only gets them from the snapshots
+    remote.map.boost_generator = None
+    codec = BinaryCodec()
+    server = SnapshotHistory()
+    client = SnapshotHistory()
+    sent = {}
+    restored = 0
+    boosts = 0
+    previous = None
+    for tick in range(200):
+        if game.status is not GameStatus.ONGOING:
+            break
+        game.update(1)
+        remote.map.update(1)
+        snapshot = server.capture(game, game.entities[0])
+        data = codec.encode(server.send(snapshot))
+        sent[server.next_snapshot - 1] = snapshot
+        # Lose some snapshots and some acknowledgements
+        if tick % 3 == 1:
+            continue
+        msg = codec.decode(data)
+        received = client.receive(msg)
+        if received is None:
+            continue
+        if tick % 5 != 2:
+            server.acknowledge(codec.decode(codec.encode(MsgSnapshotAck(msg.snapshot))).snapshot)
+        found, newer = received
+        expected = sent[msg.snapshot]
+        assert found.ticks == expected.ticks
+        assert found.entities == expected.entities
+        assert Counter(found.boosts) == Counter(expected.boosts)
+        if newer:
+            kept = remote.map.ghost_boosts
+            found.restore(remote, previous=previous)
+            # The boosts are only set again when they changed
+            if previous is not None and previous.boosts == found.boosts:
+                assert all(a is b for a, b in zip(kept, remote.map.ghost_boosts))
+            previous = found
+            restored += 1
+            for entity, remote_entity in zip(game.entities[1:], remote.entities[1:]):
+                assert np.abs(entity.pos - remote_entity.pos).max() <= .5 / POSITION_STEPS
+                assert entity.direction is remote_entity.direction
+                assert entity.alive == remote_entity.alive
+            assert len(remote.map.ghost_boosts) == len(game.map.ghost_boosts)
+            boosts = max(boosts, len(remote.map.ghost_boosts) + len(remote.map.pacman_boosts))
+            for boosts_list, remote_list in [(game.map.ghost_boosts, remote.map.ghost_boosts),
+                                             (game.map.pacman_boosts, remote.map.pacman_boosts)]:
+                assert sorted(tuple(b.loc) for b in boosts_list) == sorted(tuple(b.loc) for b in remote_list)
+            # The durations are up to date even when the boosts were not set again
+            expected = sorted((tuple(b.loc), b.remaining_duration) for b in game.map.ghost_boosts)
+            found_durations = sorted((tuple(b.loc), b.remaining_duration) for b in remote.map.ghost_boosts)
+            for (loc, duration), (remote_loc, remote_duration) in zip(expected, found_durations):
+                assert loc == remote_loc and abs(duration - remote_duration) <= .5 / TICK_STEPS
+    assert restored > 100
+    assert boosts > 0
+
+
+def test_snapshot_size():
+    np.random.seed(1)
+    game = __new_game__()
+    history = SnapshotHistory()
+    codec = BinaryCodec()
+    full = len(codec.encode(history.send(history.capture(game))))
+    history.acknowledge(0)
+    game.update(1)
+    delta = codec.encode(history.send(history.capture(game)))
+    assert len(delta) < full
+    # Nothing changed but the clock
+    history.acknowledge(1)
+    msg = history.send(Snapshot(game.duration, dict(history.get(1).entities), list(history.get(1).boosts)))
+    assert msg.entities == [] and msg.removed_boosts == [] and msg.added_boosts == []
+
+
+def test_snapshot_uid():
+    game = __new_game__()
+    game.entities[1].uid = 256
+    with pytest.raises(ValueError):
+        BinaryCodec().encode(SnapshotHistory().send(Snapshot.capture(game)))
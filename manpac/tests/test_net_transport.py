@@ -0,0 +1,71 @@
+from manpac.controllers.net.net_codec import TextCodec, BinaryCodec
+from manpac.controllers.net.net_transport import NetTransport
+from manpac.controllers.net.net_message import MsgJoin, MsgResult, MsgSyncClock
+from manpac.entity_type import EntityType
+
+from concurrent.futures import TimeoutError
+import threading
+import pytest
+
+
+def __pair__(codec, on_server_message, **kwargs):
+    server = NetTransport(codec, lambda msg, address: on_server_message(server, msg, address))
+    server.open(local_address=("127.0.0.1", 0))
+    client = NetTransport(codec, lambda msg, address: client.resolve(address, msg.result), **kwargs)
+    client.open(remote_address=server.local_address)
+    return server, client
+
+
+@pytest.mark.parametrize("codec", [TextCodec, BinaryCodec])
+def test_request(codec):
+    received = []
+    done = threading.Event()
+
+    def on_message(server, msg, address):
+        received.append(msg)
+        if isinstance(msg, MsgSyncClock):
+            done.set()
+        # Drop the first two tries
+        elif len(received) > 2:
+            server.send(MsgResult(msg.type == EntityType.GHOST), address)
+    server, client = __pair__(codec(), on_message, retry_delay=.05)
+    try:
+        assert client.request(MsgJoin(EntityType.GHOST)).result(timeout=5) is True
+        assert len(received) == 3
+        assert all(isinstance(msg, MsgJoin) for msg in received)
+        # Sending does not wait for an answer
+        client.send(MsgSyncClock(12.5))
+        assert done.wait(timeout=5)
+        assert received[-1].ticks == 12.5
+    finally:
+        client.close()
+        server.close()
+
+
+def test_timeout():
+    received = []
+    server, client = __pair__(TextCodec(), lambda server, msg, address: received.append(msg),
+                              retry_delay=.01, max_retry_delay=.04, timeout=.3)
+    try:
+        with pytest.raises(TimeoutError):
+            client.request(MsgJoin(EntityType.PACMAN)).result(timeout=5)
+        # Tries are spaced by a growing delay capped to the maximum
+        assert 4 <= len(received) <= 12
+    finally:
+        client.close()
+        server.close()
+
+
+def test_close():
+    server, client = __pair__(TextCodec(), lambda server, msg, address: None)
+    threads = threading.active_count()
+    client.close()
+    server.close()
+    # The event loops and their threads are released
+    assert client.loop.is_closed() and server.loop.is_closed()
+    assert threading.active_count() == threads - 2
+    # Closing again or sending once closed does nothing
+    client.close()
+    client.send(MsgSyncClock(1))
+    with pytest.raises(TimeoutError):
+        client.request(MsgJoin(EntityType.PACMAN)).result(timeout=1)
@@ -0,0 +1,56 @@
+from manpac.path_graph import PathGraph
+from manpac.maps.map_pacman import MapPacman
+from manpac.cell import Cell
+from manpac.direction import Direction
+
+
+from collections import deque
+import numpy as np
+
+
+def __bfs__(map, src):
+    # Distances from src to every cell walking on the grid, -1 for those out of reach
+    distances = np.full(map.terrain.shape, -1)
+    distances[src[0], src[1]] = 0
+    cells = deque([src])
+    while cells:
+        cell = cells.popleft()
+        for direction in Direction:
+            next = cell + direction.vector
+            if map.is_walkable(next) and distances[next[0], next[1]] < 0:
+                distances[next[0], next[1]] = distances[cell[0], cell[1]] + 1
+                cells.append(next)
+    return distances
+
+
+def __assert_shortest__(graph, src, dst, expected):
+    path, distance = graph.path(src, dst)
+    assert distance == expected
+    assert distance == graph.distance(src, dst)
+    assert (path[-1] == dst).all()
+    # Each step of the path follows a straight line
+    length = np.sum(np.abs(path[0] - src))
+    for a, b in zip(path[:-1], path[1:]):
+        assert np.min(np.abs(b - a)) == 0
+        length += np.sum(np.abs(b - a))
+    assert length == distance
+
+
+def test_compiled_paths():
+    rng = np.random.default_rng(0)
+    map = MapPacman(None)
+    graph = PathGraph(map)
+    walkable = np.argwhere(map.terrain != Cell.WALL)
+    pairs = [(walkable[i], walkable[j]) for i, j in rng.integers(0, len(walkable), size=(50, 2))]
+    # Cells of the same corridor and the same cell
+    pairs += [(walkable[0], walkable[1]), (walkable[0], walkable[0])]
+    expected = [__bfs__(map, src)[dst[0], dst[1]] for src, dst in pairs]
+    closest = [graph.closest_nodes(cell) for cell in walkable]
+    for (src, dst), distance in zip(pairs, expected):
+        __assert_shortest__(graph, src, dst, distance)
+
+    graph.compile()
+    for cell, nodes in zip(walkable, closest):
+        assert np.array_equal(graph.closest_nodes(cell), nodes)
+    for (src, dst), distance in zip(pairs, expected):
+        __assert_shortest__(graph, src, dst, distance)
@@ -0,0 +1,110 @@
+from manpac.entity_type import EntityType
+from manpac.entity import Entity
+from manpac.game import Game
+from manpac.game_status import GameStatus
+from manpac.cell import Cell
+from manpac.direction import Direction
+from manpac.controllers.abstract_controller import AbstractController
+from manpac.controllers.target_seeker_controller import TargetSeekerController
+from manpac.controllers.random_walk_controller import RandomWalkController
+from manpac.maps.map_pacman import MapPacman
+from manpac.replay import ReplayRecorder, Replay
+
+import pytest
+import numpy as np
+
+
+def __map__(game):
+    map = MapPacman(game)
+    map.all_pairs_paths = False
+    return map
+
+
+class __Scripted__(AbstractController):
+    # Decides once per update as a human player does
+    def __init__(self, game):
+        super(__Scripted__, self).__init__(game)
+        self.direction = Direction.LEFT
+        self.moving = False
+        self.use = False
+
+    def update(self, ticks):
+        if self.use:
+            self.entity.use_modifier()
+        self.entity.face(self.direction)
+        self.entity.moving = self.moving
+        self.game.map.move(self.entity, ticks)
+
+
+def __play__(game, rng=None):
+    # Return the number of updates
+    for i in range(2000):
+        if game.status is GameStatus.FINISHED:
+            return i
+        if rng and i % 15 == 0:
+            for entity in game.entities:
+                entity.controller.direction = list(Direction)[rng.integers(4)]
+                entity.controller.moving = rng.random() < .9
+                entity.controller.use = rng.random() < .3
+        # Long updates are split by the game, they are replayed the same way
+        game.update(1 if i % 10 else 1.7)
+    return i + 1
+
+
+def __assert_same__(replayed, game):
+    np.testing.assert_array_equal([entity.pos for entity in replayed.entities], [entity.pos for entity in game.entities])
+    assert [entity.alive for entity in replayed.entities] == [entity.alive for entity in game.entities]
+    assert replayed.status is game.status
+    assert replayed.duration == game.duration
+    assert (replayed.winner is None) == (game.winner is None)
+    if game.winner:
+        assert replayed.entities.index(replayed.winner) == game.entities.index(game.winner)
+    assert replayed.map.picked_boosts == game.map.picked_boosts
+
+
+@pytest.mark.timeout(30)
+def test_replay(tmp_path):
+    entities = [Entity(EntityType.PACMAN)] + [Entity(EntityType.GHOST) for _ in range(4)]
+    game = Game(*entities, seed=8)
+    for entity in entities:
+        entity.attach(__Scripted__(game))
+    recorder = ReplayRecorder(game)
+    game.start(__map__(game))
+    ticks = __play__(game, np.random.default_rng(8))
+    # Ghosts used modifiers and were killed, killing them stops them
+    assert sum(entity.modifiers_used for entity in entities[1:]) > 0
+    assert not all(entity.alive for entity in entities)
+    path = str(tmp_path / "game.replay")
+    recorder.save(path)
+
+    replay = Replay.load(path)
+    assert len(replay.frames) == ticks
+    __assert_same__(replay.play(__map__), game)
+    # The decisions of the replay are the recorded ones
+    replayed, map = replay.create_game(__map__)
+    replayed_recorder = ReplayRecorder(replayed)
+    replayed.start(map)
+    for ticks in replay.frames:
+        replayed.update(ticks)
+    assert [entity.modifiers_used for entity in replayed.entities] == [entity.modifiers_used for entity in entities]
+    assert replayed_recorder.encode() == recorder.encode()
+
+    # Controllers moving several times by update are replayed from their last decision of each tick, the same way
+    entities = [Entity(EntityType.PACMAN)] + [Entity(EntityType.GHOST) for _ in range(4)]
+    game = Game(*entities, seed=7)
+    entities[0].attach(TargetSeekerController(game))
+    for entity in entities[1:]:
+        entity.attach(RandomWalkController(game))
+    recorder = ReplayRecorder(game)
+    game.start(__map__(game))
+    __play__(game)
+    replay = Replay(recorder.encode())
+    __assert_same__(replay.play(__map__), replay.play(__map__))
+
+    # Another map is refused
+    def other_map(game):
+        map = __map__(game)
+        map[1, 1] = Cell.WALL
+        return map
+    with pytest.raises(ValueError):
+        replay.play(other_map)
@@ -0,0 +1,74 @@
+from manpac.entity_type import EntityType
+from manpac.map_cache import MapCache
+from manpac.server import Room, Matchmaker, TickScheduler
+from manpac.controllers.net.net_codec import BinaryCodec
+from manpac.controllers.net.net_transport import NetTransport
+from manpac.controllers.net.net_message import MsgJoin, MsgResult
+
+from concurrent.futures import TimeoutError
+import pytest
+import numpy as np
+
+
+@pytest.mark.timeout(30)
+def test_rooms():
+    np.random.seed(0)
+    cache = MapCache()
+    matchmaker = Matchmaker(2, lambda uid: Room(uid, map_cache=cache), games=5)
+    scheduler = TickScheduler(matchmaker, freq=10000)
+    # The maps are compiled before the first tick
+    assert all(room.map.compiled for room in matchmaker.rooms)
+    # The finished rooms are replaced after the tick
+    matchmaker.update()
+    for entity in matchmaker.rooms[0].game.entities[2:]:
+        entity.kill()
+    matchmaker.rooms[0].game.ghosts = 1
+    matchmaker.rooms[0].game.update(1)
+    assert len(scheduler.tick()) == 1
+    assert [room.uid for room in matchmaker.rooms] == [1]
+    matchmaker.replace()
+    assert [room.uid for room in matchmaker.rooms] == [1, 0]
+    ended = []
+    scheduler.run(ended.append)
+    assert matchmaker.rooms == []
+    assert len(ended) == 4
+    assert len(matchmaker.finished) == 5
+    # Finished rooms are replaced by rooms with the same uid
+    assert {room.uid for room in ended} == {0, 1}
+    for room in ended:
+        assert room.finished
+        assert room.updates > 0
+        mean, std, maximum = room.jitter()
+        assert 0 <= mean <= maximum
+
+
+@pytest.mark.timeout(30)
+def test_matchmaking():
+    server = NetTransport(BinaryCodec(), lambda msg, address: matchmaker.on_message(msg, address))
+    server.open(local_address=("127.0.0.1", 0))
+    matchmaker = Matchmaker(2, lambda uid: Room(uid, seats=1, transport=server), transport=server)
+    clients = []
+    for i in range(3):
+        client = NetTransport(BinaryCodec(), lambda msg, address, i=i: msg.uid == MsgResult.uid and
+                              clients[i].resolve(address, msg.result), retry_delay=.05, timeout=.5)
+        client.open(remote_address=server.local_address)
+        clients.append(client)
+    try:
+        # No room has a seat for a pac-man
+        assert not clients[0].request(MsgJoin(EntityType.PACMAN)).result(timeout=5)
+        assert not matchmaker.update()
+        assert not any(room.started for room in matchmaker.rooms)
+        assert clients[0].request(MsgJoin(EntityType.GHOST)).result(timeout=5)
+        matchmaker.update()
+        assert [room.started for room in matchmaker.rooms] == [True, False]
+        assert clients[1].request(MsgJoin(EntityType.GHOST)).result(timeout=5)
+        matchmaker.update()
+        assert all(room.started for room in matchmaker.rooms)
+        # All the seats are taken, the client waits for one
+        with pytest.raises(TimeoutError):
+            clients[2].request(MsgJoin(EntityType.GHOST)).result(timeout=5)
+        assert [matchmaker.clients[client.local_address].uid for client in clients[:2]] == [0, 1]
+    finally:
+        for client in clients:
+            client.close()
+        server.close()
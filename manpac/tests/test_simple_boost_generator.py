@@ -0,0 +1,28 @@
+from manpac.game import Game
+from manpac.map import Map
+from manpac.cell import Cell
+from manpac.boost_generators.simple_boost_generator import SimpleBoostGenerator
+
+
+def test_generate():
+    game = Game(seed=5)
+    map = Map((10, 10), SimpleBoostGenerator(game, .5, [], []))
+    map[:, 5:] = Cell.WALL
+    map.compile()
+    game.map = map
+    generator = map.boost_generator
+
+    locations = generator.generate(2000)
+    # One try per whole tick
+    assert 900 < len(locations) < 1100
+    assert all(map.is_walkable(loc) for loc in locations)
+    assert {tuple(loc) for loc in locations} == {(x, y) for x in range(10) for y in range(5)}
+    # The last tick is kept for the next call
+    generator.boost_probability = 1
+    assert len(generator.generate(.5)) == 1
+    assert generator.generate(.25) == []
+
+    # Changing walls through the map changes where boosts spawn
+    map[:, :] = Cell.WALL
+    map[3, 7] = Cell.EMPTY
+    assert [loc.tolist() for loc in generator.generate(3)] == [[3, 7]] * 3
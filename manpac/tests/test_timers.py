@@ -0,0 +1,17 @@
+from manpac.utils.timers import Timers
+
+
+def test_timers():
+    timers = Timers()
+    a = timers.schedule(3, "a")
+    timers.schedule(1, "b")
+    c = timers.schedule(1, "c")
+    timers.schedule(2, "d")
+    timers.cancel(c)
+    assert timers.remaining(a) == 3
+    assert timers.advance(.5) == []
+    # In the order of their expiry then of their scheduling
+    assert timers.advance(2) == ["b", "d"]
+    assert timers.remaining(a) == .5
+    assert timers.advance(.5) == ["a"]
+    assert len(timers) == 0
@@ -0,0 +1,75 @@
+from manpac.entity_type import EntityType
+from manpac.entity import Entity
+from manpac.game import Game
+from manpac.controllers.target_seeker_controller import TargetSeekerController
+from manpac.controllers.random_walk_controller import RandomWalkController
+from manpac.maps.map_pacman import MapPacman
+from manpac.modifiers.speed_modifier import SpeedModifier
+from manpac.trajectory import TrajectoryRecorder, Trajectory
+
+import pytest
+import numpy as np
+
+
+@pytest.mark.timeout(30)
+def test_trajectory(tmp_path):
+    entities = [Entity(EntityType.PACMAN)] + [Entity(EntityType.GHOST) for _ in range(4)]
+    game = Game(*entities, seed=3)
+    entities[0].attach(TargetSeekerController(game))
+    for entity in entities[1:]:
+        entity.attach(RandomWalkController(game))
+    map = MapPacman(game)
+    map.all_pairs_paths = False
+    map.boost_generator.boost_probability = .5
+    game.start(map)
+    # Chunks smaller than the preallocated columns to make them grow
+    recorder = TrajectoryRecorder(game, str(tmp_path), chunk_size=7)
+    positions, boosts = [], []
+    for i in range(100):
+        if i == 50:
+            entities[1].modifiers = entities[1].modifiers + [SpeedModifier(game, 10, 2)]
+        game.update(1)
+        positions.append(np.array([entity.pos for entity in entities]))
+        boosts.append([boost.loc.tolist() for boost in map.ghost_boosts + map.pacman_boosts])
+        if i == 60:
+            # Readable while recording
+            recorder.flush()
+            assert len(Trajectory(str(tmp_path))) == 61
+    recorder.close()
+    duration = game.duration
+    # The game is no longer recorded
+    game.update(1)
+
+    trajectory = Trajectory(str(tmp_path))
+    assert len(trajectory) == 100
+    assert trajectory.types == ["PACMAN"] + ["GHOST"] * 4
+    assert isinstance(trajectory["pos"], np.memmap)
+    np.testing.assert_array_equal(trajectory["pos"], positions)
+    assert trajectory["ticks"][-1] == duration
+
+    columns = trajectory.ticks(40, 60)
+    # Views of the files
+    assert np.shares_memory(columns["pos"], trajectory["pos"])
+    np.testing.assert_array_equal(columns["pos"], positions[40:60])
+    kind = trajectory.modifier_kinds.index("SpeedModifier")
+    assert not columns["modifiers"][9, 1] & (1 << kind)
+    assert columns["modifiers"][10, 1] & (1 << kind)
+    start = 0
+    for i, end in enumerate(columns["boost_end"]):
+        assert columns["boost_pos"][start:end].tolist() == boosts[40 + i]
+        start = end
+    assert trajectory.boosts(99)["boost_pos"].tolist() == boosts[99]
+
+    # Only the updates of an ongoing game are ticks
+    game = Game(Entity(EntityType.PACMAN), Entity(EntityType.GHOST), Entity(EntityType.GHOST))
+    recorder = TrajectoryRecorder(game, str(tmp_path / "ended"))
+    map = MapPacman(game)
+    map.all_pairs_paths = False
+    game.start(map)
+    game.update(1)
+    game.entities[2].kill()
+    game.ghosts = 1
+    for i in range(3):
+        game.update(1)
+    recorder.close()
+    assert len(Trajectory(str(tmp_path / "ended"))) == 2
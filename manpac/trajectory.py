@@ -0,0 +1,318 @@
+from manpac.utils import export
+from manpac.direction import Direction
+
+import numpy as np
+import json
+import os
+import queue
+import threading
+
+
+# Size of the header of the columns, large enough for any length so that it is rewritten in place
+_HEADER_SIZE_ = 128
+_METADATA_ = "metadata.json"
+
+
+def _write_header_(file, dtype, shape):
+    header = "{{'descr': {!r}, 'fortran_order': False, 'shape': {!r}, }}".format(
+        np.lib.format.dtype_to_descr(dtype), tuple(shape))
+    magic = np.lib.format.magic(1, 0)
+    length = _HEADER_SIZE_ - len(magic) - 2
+    header = header.ljust(length - 1) + "\n"
+    file.seek(0)
+    file.write(magic + np.uint16(length).tobytes() + header.encode("latin1"))
+
+
+class _Column_():
+    """
+    A .npy file whose length grows as rows are appended, through a memory map of the space allocated so far.
+    """
+
+    def __init__(self, path, dtype, shape, capacity):
+        self.dtype = np.dtype(dtype)
+        self.shape = tuple(shape)
+        self.length = 0
+        self.capacity = 0
+        self.memmap = None
+        self.file = open(path, "w+b")
+        _write_header_(self.file, self.dtype, (0,) + self.shape)
+        self._allocate_(capacity)
+
+    def _allocate_(self, capacity):
+        self.memmap = None
+        row = self.dtype.itemsize * int(np.prod(self.shape, dtype=np.int64))
+        self.file.truncate(_HEADER_SIZE_ + capacity * row)
+        self.capacity = capacity
+        if capacity * row > 0:
+            self.memmap = np.memmap(self.file, dtype=self.dtype, mode="r+", offset=_HEADER_SIZE_,
+                                    shape=(capacity,) + self.shape)
+
+    def append(self, rows):
+        if self.length + len(rows) > self.capacity:
+            self._allocate_(max(2 * self.capacity, self.length + len(rows)))
+        if len(rows):
+            self.memmap[self.length:self.length + len(rows)] = rows
+        self.length += len(rows)
+
+    def flush(self):
+        # Readers only see the rows written
+        if self.memmap is not None:
+            self.memmap.flush()
+        _write_header_(self.file, self.dtype, (self.length,) + self.shape)
+        self.file.flush()
+
+    def close(self):
+        self.flush()
+        self.memmap = None
+        self.file.truncate(_HEADER_SIZE_ + self.length * self.dtype.itemsize * int(np.prod(self.shape, dtype=np.int64)))
+        self.file.close()
+
+
+@export
+class TrajectoryRecorder():
+    """
+    Record the state of a game at each tick into columns of memory mapped .npy files of a directory.
+    The state is buffered in chunks of ticks that a background thread writes to the files.
+    The columns by tick are:
+    - *ticks*: the duration of the game
+    - *pos*: the position of each entity
+    - *direction*: the index of the direction of each entity in Direction
+    - *alive*, *moving*: the flags of each entity
+    - *holding*: the index of the kind of modifier each entity holds, -1 for none
+    - *modifiers*: the bit mask of the kinds of the active modifiers of each entity
+    - *boost_end*: the end of the boosts of the tick in the boost columns, they start at the end of the previous tick
+    The columns by boost are *boost_pos*, *boost_duration* (the remaining duration of ghost boosts)
+    and *boost_pacman* (whether it is a pacman boost).
+    The kinds of modifiers are the names of their classes, in the order they were first recorded.
+
+    Parameters
+    -----------
+    - *game*: (**Game**)
+        the game to record, each update of it while it is ongoing records a tick
+    - *directory*: (**str**)
+        the directory where the columns are written, it is created if needed
+    - *chunk_size*: (**int**)
+        the number of ticks written at once (default: 4096)
+    """
+
+    def __init__(self, game, directory, chunk_size=4096):
+        self.game = game
+        self.directory = directory
+        self.chunk_size = chunk_size
+        os.makedirs(directory, exist_ok=True)
+        entities = len(game.entities)
+        layout = {
+            "ticks": (np.float64, ()),
+            "pos": (np.float64, (entities, 2)),
+            "direction": (np.int8, (entities,)),
+            "alive": (np.bool_, (entities,)),
+            "moving": (np.bool_, (entities,)),
+            "holding": (np.int8, (entities,)),
+            "modifiers": (np.uint32, (entities,)),
+            "boost_end": (np.int64, ()),
+            "boost_pos": (np.int32, (2,)),
+            "boost_duration": (np.float64, ()),
+            "boost_pacman": (np.bool_, ())
+        }
+        self.columns = {name: _Column_(os.path.join(directory, name + ".npy"), dtype, shape, chunk_size)
+                        for name, (dtype, shape) in layout.items()}
+        self.modifier_kinds = []
+        self._kind_codes = {}
+        self._directions = {direction: code for code, direction in enumerate(Direction)}
+        self._boosts = 0
+        self._chunk = None
+        self._new_chunk_()
+        game.tick_listeners.append(self._on_tick_)
+
+        # Full chunks go through a bounded queue so that a slow disk slows down the game rather than filling the memory
+        self._queue = queue.Queue(4)
+        self._error = None
+        self._thread = threading.Thread(target=self._write_, daemon=True)
+        self._thread.start()
+
+    def _new_chunk_(self):
+        self._chunk = {name: np.empty((self.chunk_size,) + column.shape, dtype=column.dtype)
+                       for name, column in self.columns.items() if not name.startswith("boost_")}
+        self._chunk["boost_end"] = np.empty(self.chunk_size, dtype=np.int64)
+        self._chunk_boosts = []
+        self._chunk_length = 0
+
+    def _on_tick_(self, ticks):
+        self.record()
+
+    def _kind_(self, modifier):
+        name = type(modifier).__name__
+        code = self._kind_codes.get(name)
+        if code is None:
+            if len(self.modifier_kinds) == 32:
+                raise ValueError("more than 32 kinds of modifiers can not be recorded")
+            code = self._kind_codes[name] = len(self.modifier_kinds)
+            self.modifier_kinds.append(name)
+        return code
+
+    def record(self):
+        """
+        Record the current state of the game as a tick.
+        """
+        if self._error:
+            raise self._error
+        chunk = self._chunk
+        i = self._chunk_length
+        chunk["ticks"][i] = self.game.duration
+        for j, entity in enumerate(self.game.entities):
+            chunk["pos"][i, j] = entity.pos
+            chunk["direction"][i, j] = self._directions[entity.direction]
+            chunk["alive"][i, j] = entity.alive
+            chunk["moving"][i, j] = entity.moving
+            chunk["holding"][i, j] = self._kind_(entity.holding) if entity.holding else -1
+            mask = 0
+            for modifier in entity.modifiers:
+                mask |= 1 << self._kind_(modifier)
+            chunk["modifiers"][i, j] = mask
+        map = self.game.map
+        boosts = self._chunk_boosts
+        for boost in map.ghost_boosts:
+            boosts.append((boost.loc[0], boost.loc[1], boost.remaining_duration, False))
+        for boost in map.pacman_boosts:
+            boosts.append((boost.loc[0], boost.loc[1], boost.remaining_duration, True))
+        self._boosts += len(map.ghost_boosts) + len(map.pacman_boosts)
+        chunk["boost_end"][i] = self._boosts
+        self._chunk_length += 1
+        if self._chunk_length == self.chunk_size:
+            self._push_chunk_()
+
+    def _push_chunk_(self):
+        chunk = {name: array[:self._chunk_length] for name, array in self._chunk.items()}
+        boosts = np.array(self._chunk_boosts, dtype=np.float64).reshape((-1, 4))
+        chunk["boost_pos"] = boosts[:, :2]
+        chunk["boost_duration"] = boosts[:, 2]
+        chunk["boost_pacman"] = boosts[:, 3]
+        self._queue.put(chunk)
+        self._new_chunk_()
+
+    def _write_(self):
+        while True:
+            chunk = self._queue.get()
+            try:
+                if chunk is None:
+                    return
+                if self._error is None:
+                    for name, rows in chunk.items():
+                        self.columns[name].append(rows)
+                    for column in self.columns.values():
+                        column.flush()
+            except Exception as error:
+                self._error = error
+            finally:
+                self._queue.task_done()
+
+    def flush(self):
+        """
+        Write the ticks recorded so far, the files can be read once it returns.
+        """
+        if self._chunk_length:
+            self._push_chunk_()
+        self._queue.join()
+        self._write_metadata_()
+        if self._error:
+            raise self._error
+
+    def _write_metadata_(self):
+        metadata = {
+            "types": [entity.type.name for entity in self.game.entities],
+            "directions": [direction.name for direction in Direction],
+            "modifier_kinds": self.modifier_kinds
+        }
+        with open(os.path.join(self.directory, _METADATA_), "w") as file:
+            json.dump(metadata, file)
+
+    def close(self):
+        """
+        Write the ticks recorded, stop the writing thread and stop recording the game.
+        """
+        try:
+            self.flush()
+        finally:
+            self._queue.put(None)
+            self._thread.join()
+            for column in self.columns.values():
+                column.close()
+            if self._on_tick_ in self.game.tick_listeners:
+                self.game.tick_listeners.remove(self._on_tick_)
+
+
+@export
+class Trajectory():
+    """
+    The ticks recorded by a TrajectoryRecorder, read through memory maps: slices of them are views of the files
+    so that they can be much larger than the memory.
+
+    Parameters
+    -----------
+    - *directory*: (**str**)
+        the directory of the recording
+    """
+
+    def __init__(self, directory):
+        with open(os.path.join(directory, _METADATA_)) as file:
+            metadata = json.load(file)
+        self.types = metadata["types"]
+        self.directions = [Direction[name] for name in metadata["directions"]]
+        self.modifier_kinds = metadata["modifier_kinds"]
+        self.columns = {}
+        for name in os.listdir(directory):
+            if name.endswith(".npy"):
+                self.columns[name[:-len(".npy")]] = np.load(os.path.join(directory, name), mmap_mode="r")
+
+    def __len__(self):
+        return len(self.columns["ticks"])
+
+    def __getitem__(self, name):
+        return self.columns[name]
+
+    def ticks(self, start, stop):
+        """
+        Return the columns of the specified range of ticks.
+
+        Parameters
+        -----------
+        - *start*, *stop*: (**int**)
+            the range of ticks
+
+        Return
+        -----------
+        The views of the columns by name, the boost columns hold the boosts of these ticks
+        and boost_end is relative to the first of them.
+        type: **Dict[str, numpy.ndarray]**
+        """
+        start, stop, _ = slice(start, stop).indices(len(self))
+        boost_end = self.columns["boost_end"]
+        first = boost_end[start - 1] if start > 0 else 0
+        last = boost_end[stop - 1] if stop > start else first
+        columns = {}
+        for name, column in self.columns.items():
+            if name.startswith("boost_"):
+                columns[name] = column[first:last]
+            else:
+                columns[name] = column[start:stop]
+        columns["boost_end"] = columns["boost_end"] - first
+        return columns
+
+    def boosts(self, tick):
+        """
+        Return the boosts of the specified tick.
+
+        Parameters
+        -----------
+        - *tick*: (**int**)
+            the tick
+
+        Return
+        -----------
+        The views of the boost columns of this tick by name.
+        type: **Dict[str, numpy.ndarray]**
+        """
+        boost_end = self.columns["boost_end"]
+        first = boost_end[tick - 1] if tick > 0 else 0
+        return {name: column[first:boost_end[tick]] for name, column in self.columns.items()
+                if name.startswith("boost_") and name != "boost_end"}
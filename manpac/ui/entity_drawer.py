@@ -8,8 +8,10 @@ import manpac.ui.draw_modifier as modifier_drawer
 import pygame
 
 DEBUG_COLLISION_BOX = False
-BLINK_RATE = 4  # Number of frames before it changes state
+BLINK_RATE = 4  # Number of ticks before it changes state
 BORDER_SIZE = 5
+# Pixels around the sprite of an entity redrawn with it
+DIRTY_MARGIN = 3
 
 _IMAGE_SET_ = {
     EntityType.GHOST: ["b1", "b2", "d1", "d2", "g1", "g2", "h1", "h2"],
@@ -66,29 +68,69 @@ class EntityDrawer():
         self.last_direction = entity.direction
 
     def draw_icon(self, display):
+        """
+        Draw the icons of this entity and its boosts on the left of the display.
+
+        Return
+        -----------
+        The area drawn, None if nothing was.
+        type: **pygame.Rect**
+        """
         if not self.entity.alive:
-            return
+            return None
         cell_size = self.scale
         if self.entity.type is EntityType.GHOST:
             nb_boost = 1
             display.blit(self.icon_sprite, (0, self.number * cell_size * 2))
             display.blit(self.holding_boost, (cell_size + BORDER_SIZE, self.number * cell_size * 2))
             modifier_drawer.draw_modifier_icon(display, self.entity.holding, nb_boost, self.number, self.scale, BORDER_SIZE)
-            # Update mdofifier blink state
-            self.blink_counter += 1
-            if self.blink_counter >= BLINK_RATE:
-                self.blink_counter = 0
-                self.blink_state = not self.blink_state
             # Draw if currently visible
             if self.blink_state:
                 for boost in self.entity.modifiers:
                     nb_boost += 1
                     modifier_drawer.draw_modifier_icon(display, boost, nb_boost, self.number, self.scale, BORDER_SIZE)
-
-    def draw(self, display):
+            # The holding boost has a border of 1 pixel
+            width = (len(self.entity.modifiers) + 2) * (cell_size + BORDER_SIZE)
+            return pygame.Rect(0, self.number * cell_size * 2, width, cell_size + 2)
+        return None
+
+    def update(self):
+        """
+        Advance the animations of this entity by one tick.
+        """
         if not self.entity.alive:
             return
-        pos = (self.entity.pos - self.entity.size) * self.scale
+        # Update mdofifier blink state
+        self.blink_counter += 1
+        if self.blink_counter >= BLINK_RATE:
+            self.blink_counter = 0
+            self.blink_state = not self.blink_state
+        if self.entity.direction != self.last_direction:
+            self.last_direction = self.entity.direction
+        else:
+            self.sprite_index += 1
+            self.sprite_index %= 4
+
+    def draw(self, display, pos=None):
+        """
+        Draw this entity on the display.
+
+        Parameters
+        -----------
+        - *display*: (**pygame.Surface**)
+            the surface to draw on
+        - *pos*: (**numpy.ndarray**)
+            the position to draw it at, None for its position (default: None)
+
+        Return
+        -----------
+        The area drawn, None if nothing was.
+        type: **pygame.Rect**
+        """
+        if not self.entity.alive:
+            return None
+        center = self.entity.pos if pos is None else pos
+        pos = (center - self.entity.size) * self.scale
         current_sprite = self.sprites[self.last_direction][self.sprite_index]
         if self.entity.type is EntityType.GHOST:
             modifier_drawer.draw_effect(display, current_sprite, pos, self.entity.modifiers)
@@ -97,16 +139,13 @@ class EntityDrawer():
 
         # Draw debug collision
         if DEBUG_COLLISION_BOX:
-            pos = self.entity.pos
             cell_size = self.scale
             pygame.draw.circle(display, (255, 0, 0),
-                               (round(pos[0] * cell_size), round(pos[1] * cell_size)), round(cell_size * self.entity.size))
-
-        if self.entity.direction != self.last_direction:
-            self.last_direction = self.entity.direction
-        else:
-            self.sprite_index += 1
-            self.sprite_index %= 4
+                               (round(center[0] * cell_size), round(center[1] * cell_size)),
+                               round(cell_size * self.entity.size))
+        # Leave room for the rounding, the border of the block effect and the collision box
+        size = max(current_sprite.get_width(), round(2 * self.scale * self.entity.size))
+        return pygame.Rect(int(pos[0]), int(pos[1]), size, size).inflate(2 * DIRTY_MARGIN, 2 * DIRTY_MARGIN)
 
     def draw_winner_icon(self, display, x, y):
         display.blit(self.winner_sprite, (round(x - 1.5 * self.scale), round(y - 3 * self.scale)))
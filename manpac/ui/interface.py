@@ -2,6 +2,7 @@ import sys
 import pygame
 from pygame.locals import QUIT
 import time
+import numpy as np
 
 from manpac.utils import export
 from manpac.cell import Cell
@@ -12,7 +13,19 @@ from manpac.controllers.net.net_server_controller import NetServerController
 import manpac.ui.draw_modifier as modifier_drawer
 
 
+# Duration in ms of a tick of the simulation
 REFRESH_DELAY = 25
+# Maximum number of ticks simulated before a frame is drawn, the time left is dropped
+MAX_CATCH_UP_TICKS = 5
+# Maximum number of frames drawn per second
+FRAME_RATE = 60
+# An entity that moved further in one tick was teleported and is not interpolated
+MAX_INTERPOLATION_STEP = 1
+
+# Color of each cell in the terrain layer, DEBUG_ONCE cells are drawn over it for one frame
+_CELL_COLORS_ = np.zeros((len(Cell), 3), dtype=np.uint8)
+_CELL_COLORS_[Cell.WALL] = (0, 0, 255)
+_CELL_COLORS_[Cell.DEBUG] = (255, 0, 0)
 
 
 @export
@@ -21,42 +34,135 @@ class Interface():
     def __init__(self, game):
         self.game = game
         self.scale = 0
+        # The terrain rendered once, the terrain array and the version it was rendered from
+        self.terrain = None
+        self._rendered = (None, -1)
+        # The map drawn with the boosts and the entities, the screen shows it at the offset
+        self.canvas = None
+        # Areas of the canvas drawn over the terrain and of the screen drawn over the canvas in the last frame
+        self._dirty = []
+        self._icons = []
+        # Positions of the entities before the last tick
+        self._previous = None
+
+    def _render_terrain_(self):
+        """
+        Render the walls and the DEBUG cells of the map into the terrain layer.
+        """
+        pixels = np.repeat(np.repeat(_CELL_COLORS_[self.map.terrain], self.scale, axis=0), self.scale, axis=1)
+        self.terrain = pygame.surfarray.make_surface(pixels).convert()
+        self.canvas = self.terrain.copy()
+        self._rendered = (self.map.terrain, self.map.terrain_version)
 
     def _draw_map_(self):
+        """
+        Restore the areas of the canvas drawn in the last frame from the terrain layer,
+        the whole canvas if the terrain has changed since it was rendered.
+
+        Return
+        -----------
+        True if the whole canvas was redrawn.
+        type: **bool**
+        """
+        terrain, version = self._rendered
+        if terrain is not self.map.terrain or version != self.map.terrain_version:
+            self._render_terrain_()
+            return True
+        for rect in self._dirty:
+            self.canvas.blit(self.terrain, rect, rect)
+        return False
+
+    def _draw_debug_cells_(self):
         cell_size = self.scale
-        for i in range(self.game.map.width):
-            for j in range(self.game.map.height):
-                cell = self.game.map[i, j]
-                if cell == Cell.WALL:
-                    pygame.draw.rect(self.screen, (0, 0, 255),
-                                     (i*cell_size, j*cell_size, cell_size, cell_size))
-                elif cell == Cell.DEBUG:
-                    pygame.draw.rect(self.screen, (255, 0, 0),
-                                     (i*cell_size, j*cell_size, cell_size, cell_size))
-                elif cell == Cell.DEBUG_ONCE:
-                    pygame.draw.rect(self.screen, (0, 255, 0),
-                                     (i*cell_size, j*cell_size, cell_size, cell_size))
-                    self.game.map[i, j] = Cell.EMPTY
+        rects = []
+        for i, j in np.argwhere(self.map.terrain == Cell.DEBUG_ONCE):
+            rect = pygame.Rect(i*cell_size, j*cell_size, cell_size, cell_size)
+            pygame.draw.rect(self.canvas, (0, 255, 0), rect)
+            rects.append(rect)
+            # Neither a wall nor a DEBUG cell, the terrain layer is still valid
+            self.map.terrain[i, j] = Cell.EMPTY
+        return rects
 
     def draw_boost(self):
-        for loc, duration in self.map.ghost_boosts:
-            self.screen.blit(self.ghost_boost,
-                             (loc[0]*self.scale, loc[1]*self.scale))
-        for loc, duration in self.map.pacman_boosts:
-            self.screen.blit(self.pacman_boost,
-                             (loc[0]*self.scale, loc[1]*self.scale))
-
-    def draw(self):
-        self.screen.fill((0, 0, 0))
-        self._draw_map_()
-        self.draw_boost()
+        """
+        Draw the boosts on the canvas.
+
+        Return
+        -----------
+        The areas drawn.
+        type: **List[pygame.Rect]**
+        """
+        rects = []
+        for boost in self.map.ghost_boosts:
+            loc = boost.loc
+            rects.append(self.canvas.blit(self.ghost_boost,
+                                          (loc[0]*self.scale, loc[1]*self.scale)))
+        for boost in self.map.pacman_boosts:
+            loc = boost.loc
+            rects.append(self.canvas.blit(self.pacman_boost,
+                                          (loc[0]*self.scale, loc[1]*self.scale)))
+        return rects
+
+    def _show_(self, rect):
+        # Show the canvas in the specified area of the screen
+        self.screen.fill((0, 0, 0), rect)
+        area = rect.move(-self.tx, -self.ty).clip(self.canvas.get_rect())
+        self.screen.blit(self.canvas, (area.x + self.tx, area.y + self.ty), area)
+
+    def step(self):
+        """
+        Update the game for one tick, and the animations of the entities.
+        """
+        self._previous = [entity.pos.copy() for entity in self.game.entities]
+        self.game.update(1)
         for entity_drawer in self.entities_drawer:
-            entity_drawer.draw(self.screen)
-        copy = self.screen.copy()
-        self.screen.fill((0, 0, 0))
-        self.screen.blit(copy, (self.tx, self.ty))
+            entity_drawer.update()
+
+    def _interpolate_(self, entity, previous, alpha):
+        if previous is None or np.max(np.abs(entity.pos - previous)) > MAX_INTERPOLATION_STEP:
+            return entity.pos
+        return previous + alpha * (entity.pos - previous)
+
+    def draw(self, alpha=1):
+        """
+        Draw the next frame on the screen.
+        The terrain is only rendered again when it changes, the areas where the boosts and the entities
+        were and are now are redrawn from it.
+
+        Parameters
+        -----------
+        - *alpha*: (**float**)
+            the fraction of the time between the last two ticks elapsed, the entities are drawn between
+            their positions at these ticks (default: 1)
+
+        Return
+        -----------
+        The areas of the screen that changed, to be given to pygame.display.update.
+        type: **List[pygame.Rect]**
+        """
+        full = self._draw_map_()
+        dirty = self._draw_debug_cells_()
+        dirty += self.draw_boost()
+        previous = self._previous or [None] * len(self.entities_drawer)
+        for entity_drawer, pos in zip(self.entities_drawer, previous):
+            rect = entity_drawer.draw(self.canvas, self._interpolate_(entity_drawer.entity, pos, alpha))
+            if rect is not None:
+                dirty.append(rect)
+        if full:
+            updates = [self.screen.get_rect()]
+            self._show_(updates[0])
+        else:
+            canvas = self.canvas.get_rect()
+            updates = [rect.clip(canvas).move(self.tx, self.ty) for rect in self._dirty + dirty] + self._icons
+            for rect in updates:
+                self._show_(rect)
+        self._dirty = dirty
+        self._icons = []
         for entity_drawer in self.entities_drawer:
-            entity_drawer.draw_icon(self.screen)
+            rect = entity_drawer.draw_icon(self.screen)
+            if rect is not None:
+                self._icons.append(rect)
+        return updates + self._icons
 
     def __pygame_init__(self, map):
         pygame.init()
@@ -116,29 +222,35 @@ class Interface():
                 has_server = True
                 break
 
-        self.draw()
-        pygame.display.update()
+        pygame.display.update(self.draw())
         if has_server:
             time.sleep(3)
 
         while self.game.status is GameStatus.NOT_STARTED:
-            self.draw()
-            pygame.display.update()
+            pygame.display.update(self.draw())
             time.sleep(REFRESH_DELAY / 1000.)
 
-        # Loop
+        # Loop: the game is updated by fixed ticks for the time elapsed, frames are drawn in between
+        clock = pygame.time.Clock()
         self.last_updated = pygame.time.get_ticks()
+        accumulator = 0
         while self.game.status is GameStatus.ONGOING:
             for event in pygame.event.get():
                 if event.type == QUIT or (event.type == pygame.KEYDOWN and event.key == pygame.K_ESCAPE):
                     pygame.quit()
                     sys.exit()
-            dt = pygame.time.get_ticks() - self.last_updated
-            if dt >= REFRESH_DELAY:
-                self.game.update(dt / REFRESH_DELAY)
-                self.draw()
-                pygame.display.update()
-                self.last_updated = pygame.time.get_ticks()
+            now = pygame.time.get_ticks()
+            accumulator += now - self.last_updated
+            self.last_updated = now
+            ticks = 0
+            while accumulator >= REFRESH_DELAY and ticks < MAX_CATCH_UP_TICKS:
+                self.step()
+                accumulator -= REFRESH_DELAY
+                ticks += 1
+            # Too slow to keep up, the game slows down rather than spending ever more time catching up
+            accumulator = min(accumulator, REFRESH_DELAY)
+            pygame.display.update(self.draw(accumulator / REFRESH_DELAY))
+            clock.tick(FRAME_RATE)
 
         # End of the game
         self.draw_end_screen()
@@ -3,26 +3,107 @@ from manpac.utils import export
 import numpy as np
 
 
+@export
+class AliasTable():
+    """
+    Fixed odds prepared for drawing with the alias method: a draw costs one random number whatever the number of odds.
+    It is built once for odds that are drawn from many times.
+
+    Parameters
+    -----------
+    - *odds*: (**float list**)
+        the odds of each element being selected
+    """
+
+    def __init__(self, odds):
+        odds = np.asarray(odds, dtype=np.float64)
+        assert odds.size and np.sum(odds) > 0
+        n = odds.size
+        # Each column holds the probability of its own element and the element that fills the rest of it
+        self.probability = np.ones(n, dtype=np.float64)
+        self.alias = np.arange(n)
+        scaled = odds * n / np.sum(odds)
+        small = [i for i in range(n) if scaled[i] < 1]
+        large = [i for i in range(n) if scaled[i] >= 1]
+        while small and large:
+            i, j = small.pop(), large[-1]
+            self.probability[i] = scaled[i]
+            self.alias[i] = j
+            scaled[j] -= 1 - scaled[i]
+            if scaled[j] < 1:
+                small.append(large.pop())
+        # The columns left are full, up to rounding errors
+        # The columns as (probability, alias) for single draws, faster to index than the arrays
+        self.columns = list(zip(self.probability.tolist(), self.alias.tolist()))
+
+    def __len__(self):
+        return self.probability.size
+
+    def pick(self, u):
+        """
+        Return the indices picked by the specified random numbers.
+
+        Parameters
+        -----------
+        - *u*: (**numpy.ndarray**)
+            random numbers in [0; 1) from a uniform distribution
+
+        Return
+        -----------
+        The index picked by each random number.
+        type: **numpy.ndarray**
+        """
+        u = u * self.probability.size
+        # u < 1 may still round to the number of columns
+        columns = np.minimum(u.astype(np.int64), self.probability.size - 1)
+        return np.where(u - columns < self.probability[columns], columns, self.alias[columns])
+
+
 @export
 class BufferedRandom():
     """
     A PRNG that uses a buffer to store random numbers as to avoid overhead when generating a lot of numbers one at a time.
+    Numbers can also be drawn by batches, those larger than the buffer are drawn straight from the generator.
 
     Parameters
     -----------
     - *buffer_size*: (**int**)
-        the number of numbers it can hold at one time
+        the number of numbers drawn at each refill of the buffer, it can be changed at any time
+    - *rng*: (**numpy.random.Generator**)
+        the generator the numbers are drawn from, None for a new one seeded at random (default: None)
     """
 
-    def __init__(self, buffer_size=50):
+    def __init__(self, buffer_size=50, rng=None):
         self.buffer_size = buffer_size
-        self.buffer = None
-        self.consumed = self.buffer_size + 1
+        self.rng = rng if rng is not None else np.random.default_rng()
+        self.buffer = np.empty(0)
+        # The buffer as floats for single draws, faster to compute with than numpy scalars
+        self._values = []
+        self.consumed = 0
 
-    def _refresh_(self):
-        if self.consumed >= self.buffer_size:
-            self.consumed = 0
-            self.buffer = np.random.random((self.buffer_size))
+    def _refill_(self, size):
+        self.buffer = self.rng.random(size)
+        self._values = self.buffer.tolist()
+
+    def _take_(self, n):
+        """
+        Return the next n random numbers in [0; 1) of the buffer, refilling it when needed.
+        type: **numpy.ndarray**
+        """
+        available = self.buffer.size - self.consumed
+        if n <= available:
+            out = self.buffer[self.consumed:self.consumed + n]
+            self.consumed += n
+            return out
+        missing = n - available
+        out = self.buffer[self.consumed:]
+        if missing >= self.buffer_size:
+            # The numbers of the generator follow one another however they are drawn, no need to buffer them
+            self.consumed = self.buffer.size
+            return np.concatenate([out, self.rng.random(missing)])
+        self._refill_(self.buffer_size)
+        self.consumed = missing
+        return np.concatenate([out, self.buffer[:missing]])
 
     def uniform(self, lb=0, ub=1):
         """
@@ -40,11 +121,33 @@ class BufferedRandom():
         A random number in [lb; ub) from a uniform distribution.
         type: **float**
         """
-        self._refresh_()
-        out = self.buffer[self.consumed] * (ub - lb) + lb
+        if self.consumed >= self.buffer.size:
+            self.consumed = 0
+            self._refill_(self.buffer_size)
+        out = self._values[self.consumed] * (ub - lb) + lb
         self.consumed += 1
         return out
 
+    def uniform_batch(self, n, lb=0, ub=1):
+        """
+        Batch version of uniform: the numbers are the same as n calls to uniform would return.
+
+        Parameters
+        -----------
+        - *n*: (**int**)
+            the number of random numbers
+        - *lb*: (**float**)
+            the lower bound the random numbers can take
+        - *ub*: (**float**)
+            the upper bound the random numbers can take
+
+        Return
+        -----------
+        Random numbers in [lb; ub) from a uniform distribution.
+        type: **numpy.ndarray**
+        """
+        return self._take_(n) * (ub - lb) + lb
+
     def randint(self, lb=0, ub=1):
         """
         Return a random number in [|lb; ub|] from a uniform distribution.
@@ -61,8 +164,28 @@ class BufferedRandom():
         A random number in [|lb; ub|] from a uniform distribution.
         type: **int**
         """
-        out = self.uniform(lb, ub)
-        return int(np.round(out))
+        # Rounds half to even as numpy does, without its overhead on a single number
+        return round(self.uniform(lb, ub))
+
+    def randint_batch(self, n, lb=0, ub=1):
+        """
+        Batch version of randint: the numbers are the same as n calls to randint would return.
+
+        Parameters
+        -----------
+        - *n*: (**int**)
+            the number of random numbers
+        - *lb*: (**int**)
+            the lower bound the random numbers can take
+        - *ub*: (**int**)
+            the upper bound the random numbers can take
+
+        Return
+        -----------
+        Random numbers in [|lb; ub|] from a uniform distribution.
+        type: **numpy.ndarray**
+        """
+        return np.round(self.uniform_batch(n, lb, ub)).astype(np.int64)
 
     def choice(self, sequence, odds):
         """
@@ -72,14 +195,20 @@ class BufferedRandom():
         -----------
         - *sequence*: (**T list**)
             the sequence from which a random element will be selected
-        - *odds*: (**float list**)
-            the odds of each element being selected
+        - *odds*: (**float list** or **AliasTable**)
+            the odds of each element being selected, an AliasTable of them when they are drawn from many times
 
         Return
         -----------
         A random element from sequence.
         type: **T**
         """
+        if isinstance(odds, AliasTable):
+            columns = odds.columns
+            column = self.uniform(0, len(columns))
+            i = min(int(column), len(columns) - 1)
+            probability, alias = columns[i]
+            return sequence[i if column - i < probability else alias]
         assert sequence and odds
         total_odds = sum(odds)
         assert total_odds > 0
@@ -89,3 +218,26 @@ class BufferedRandom():
             n -= odds[i]
             i += 1
         return sequence[i]
+
+    def choice_batch(self, sequence, odds, n):
+        """
+        Batch version of choice with the alias method, it takes one random number per element.
+
+        Parameters
+        -----------
+        - *sequence*: (**numpy.ndarray**)
+            the sequence from which random elements will be selected
+        - *odds*: (**float list** or **AliasTable**)
+            the odds of each element being selected, an AliasTable of them when they are drawn from many times
+        - *n*: (**int**)
+            the number of random elements
+
+        Return
+        -----------
+        Random elements from sequence.
+        type: **numpy.ndarray**
+        """
+        if not isinstance(odds, AliasTable):
+            odds = AliasTable(odds)
+        assert len(sequence) == len(odds)
+        return np.asarray(sequence)[odds.pick(self._take_(n))]
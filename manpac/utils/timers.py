@@ -0,0 +1,83 @@
+from manpac.utils import export
+
+import heapq
+import itertools
+
+
+@export
+class Timers():
+    """
+    Items that expire at a tick of a clock.
+    The timers are kept in a heap by expiry so that advancing the clock only costs the items that expire.
+    """
+
+    def __init__(self):
+        # The current tick
+        self.clock = 0
+        self._heap = []
+        # Breaks the ties between the timers that expire at the same tick in the order they were scheduled
+        self._counter = itertools.count()
+
+    def __len__(self):
+        return len(self._heap)
+
+    def schedule(self, duration, item):
+        """
+        Schedule the expiry of the specified item.
+
+        Parameters
+        -----------
+        - *duration*: (**float**)
+            the number of ticks before the item expires
+        - *item*: (**object**)
+            the item, not None
+
+        Return
+        -----------
+        The timer as [expiry tick, number, item], to cancel it.
+        type: **list**
+        """
+        timer = [self.clock + duration, next(self._counter), item]
+        heapq.heappush(self._heap, timer)
+        return timer
+
+    def cancel(self, timer):
+        """
+        Cancel the specified timer, its item no longer expires.
+
+        Parameters
+        -----------
+        - *timer*: (**list**)
+            the timer (see schedule)
+        """
+        # It stays in the heap until its expiry
+        timer[2] = None
+
+    def remaining(self, timer):
+        """
+        Return the number of ticks before the specified timer expires.
+        type: **float**
+        """
+        return timer[0] - self.clock
+
+    def advance(self, ticks):
+        """
+        Advance the clock by the specified number of ticks.
+
+        Parameters
+        -----------
+        - *ticks*: (**float**)
+            the number of ticks elapsed
+
+        Return
+        -----------
+        The items that expired, in the order of their expiry.
+        type: **list**
+        """
+        self.clock += ticks
+        expired = []
+        while self._heap and self._heap[0][0] <= self.clock:
+            item = heapq.heappop(self._heap)[2]
+            if item is not None:
+                expired.append(item)
+        return expired
@@ -20,6 +20,10 @@ setup(
         "numpy"
     ],
 
+    entry_points={
+        "console_scripts": ["manpac-server=manpac.server:main"]
+    },
+
     include_package_data=True,
     url='https://github.com/Theomat/manpac',
     license="Creative Commons 3",